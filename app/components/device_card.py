@@ -208,6 +208,9 @@ class DeviceCard(QFrame):
             tooltip += f": {ui_info.error_message}"
         if ui_info.queue_length > 0:
             tooltip += f"，队列中还有 {ui_info.queue_length} 个任务"
+        if ui_info.queue_position > 0:
+            waiting_text = "模拟器启动名额" if ui_info.waiting_for == "boot" else "运行名额"
+            tooltip += f"，正在排队等待{waiting_text}（第 {ui_info.queue_position} 位）"
         self.status_value.setToolTip(tooltip)
 
         # 更新进度显示
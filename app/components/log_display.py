@@ -1,30 +1,58 @@
 # -*- coding: UTF-8 -*-
 """
 日志显示组件 - 重构版
-使用增量追加更新，优化实时性和流畅性
+使用 QListView + 日志列表模型，只渲染可见行，支持十万行级别的日志回溯；
+搜索框通过日志全文索引检索当前与已存档的日志
 """
 
-from PySide6.QtCore import QTimer
-from PySide6.QtGui import QFont, QColor, QTextCursor
+import time
+
+from PySide6.QtCore import Qt, QThread, QTimer, Signal
+from PySide6.QtGui import QFont, QColor
 from PySide6.QtWidgets import (
-    QVBoxLayout, QHBoxLayout, QTextEdit,
-    QLabel, QFrame
+    QVBoxLayout, QHBoxLayout, QListView, QAbstractItemView,
+    QLabel, QFrame, QLineEdit
 )
 from datetime import datetime
 from typing import List, Optional
 
+from app.components.log_list_model import LogListModel, LogSearchModel
+from app.models.logging.log_delivery import level_value
+from app.models.logging.log_index import ALL_DEVICES
 from app.models.logging.log_manager import log_manager, LogRecord
 from app.components.no_wheel_ComboBox import NoWheelComboBox
 
 
+class LogSearchWorker(QThread):
+    """后台日志检索线程：第一次检索时索引会先回填历史日志"""
+    finished_search = Signal(int, list, float)  # 检索序号, 结果, 耗时（秒）
+    error = Signal(int, str)
+
+    def __init__(self, search_id: int, query: dict):
+        super().__init__()
+        self.search_id = search_id
+        self.query = query
+
+    def run(self):
+        try:
+            started = time.perf_counter()
+            hits = log_manager.index.search(**self.query)
+            self.finished_search.emit(self.search_id, hits, time.perf_counter() - started)
+        except Exception as e:
+            self.error.emit(self.search_id, str(e))
+
+
 class LogDisplay(QFrame):
     """
     日志显示组件 - 重构版
-    - 使用新的LogRecord信号，无需从文件读取
-    - 增量追加更新，提高性能
-    - 批量处理日志，保持UI流畅
+    - 通过日志投递中心订阅，按当前设备与级别在投递前过滤，每个投递周期只收到一批记录
+    - 新日志在模型末尾插入，收紧过滤条件时只删除不匹配的行，不重建整个显示
+    - 模型只保存日志管理器内存缓冲区中记录的引用，组件自身不保存日志副本
     """
-    MAX_DISPLAY_LOGS = 100  # UI中显示的最大日志条数
+    MAX_DISPLAY_LOGS = 100_000  # UI中保留的最大日志条数
+    MAX_BATCH_LOGS = 5000  # 单个投递周期接收的最大条数，超过时从缓冲区重新加载
+    MAX_SEARCH_RESULTS = 2000  # 单次检索返回的最大条数
+    SEARCH_RANGES = [("最近1天", 1), ("最近3天", 3), ("最近7天", 7), ("全部", 0)]
 
     def __init__(self, parent=None, enable_log_level_filter=False, show_device_selector=True):
         super().__init__(parent)
@@ -51,20 +79,8 @@ class LogDisplay(QFrame):
         self.handle_to_device = {}
         self.device_to_handle = {}
 
-        # 当前会话的日志记录（使用LogRecord对象）
-        self.session_logs: List[LogRecord] = []
-
-        # 待处理的新日志（用于批量更新）
-        self._pending_logs: List[LogRecord] = []
-
-        # 批量更新定时器
-        self._batch_timer: Optional[QTimer] = None
-
-        # 是否需要完全重绘
-        self._needs_full_refresh = False
-
-        # 当前显示的日志数量
-        self._displayed_log_count = 0
+        # 日志订阅（在 _connect_signals 中创建）
+        self._subscription = None
 
         # 日志颜色配置
         self.log_colors = {
@@ -74,9 +90,20 @@ class LogDisplay(QFrame):
             "DEBUG": QColor("#4CAF50")    # 绿色
         }
 
+        self.log_model = LogListModel(log_manager.log_buffer, self.MAX_DISPLAY_LOGS, self.log_colors, self)
+        self.search_model = LogSearchModel(self.log_colors, self)
+
+        # 检索状态：输入停顿后再检索，只采用最后一次检索的结果
+        self._search_id = 0
+        self._search_workers = set()
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(300)
+        self._search_timer.timeout.connect(self._start_search)
+
         self.init_ui()
-        self._setup_batch_timer()
         self._connect_signals()
+        self.refresh_display()
 
     def init_ui(self):
         """初始化UI"""
@@ -93,6 +120,22 @@ class LogDisplay(QFrame):
 
         header_layout.addStretch()
 
+        # 搜索框：检索当前与已存档的日志，设备与级别沿用右侧的选择
+        self.search_input = QLineEdit()
+        self.search_input.setObjectName("logSearchInput")
+        self.search_input.setPlaceholderText("搜索日志（含历史存档）")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.on_search_text_changed)
+        header_layout.addWidget(self.search_input)
+
+        self.search_range_selector = NoWheelComboBox()
+        for label, days in self.SEARCH_RANGES:
+            self.search_range_selector.addItem(label, days)
+        self.search_range_selector.setCurrentIndex(1)
+        self.search_range_selector.currentIndexChanged.connect(self._schedule_search)
+        header_layout.addWidget(self.search_range_selector)
+        header_layout.addSpacing(10)
+
         # 日志级别选择器
         self.log_level_selector = NoWheelComboBox()
         self.log_level_selector.addItem("INFO", "INFO")
@@ -122,190 +165,176 @@ class LogDisplay(QFrame):
 
         main_layout.addLayout(header_layout)
 
-        # 日志显示区域
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
-        self.log_text.setFont(QFont("Consolas", 10))
-        self.log_text.setMinimumHeight(150)
-        self.log_text.setPlaceholderText("暂无日志记录")
-        self.log_text.document().setDocumentMargin(8)
-        self.log_text.setObjectName("log_text")
-
-        main_layout.addWidget(self.log_text)
-
-    def _setup_batch_timer(self):
-        """设置批量更新定时器"""
-        self._batch_timer = QTimer()
-        self._batch_timer.setSingleShot(True)
-        self._batch_timer.timeout.connect(self._process_pending_logs)
+        # 日志显示区域：统一行高让视图无需逐行测量，只为可见行取数据
+        self.log_view = QListView()
+        self.log_view.setObjectName("log_view")
+        self.log_view.setModel(self.log_model)
+        self.log_view.setFont(QFont("Consolas", 10))
+        self.log_view.setMinimumHeight(150)
+        self.log_view.setUniformItemSizes(True)
+        self.log_view.setSpacing(4)
+        self.log_view.setWordWrap(False)
+        self.log_view.setTextElideMode(Qt.ElideRight)
+        self.log_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.log_view.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.log_view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+
+        self.empty_label = QLabel("暂无日志记录")
+        self.empty_label.setAlignment(Qt.AlignCenter)
+        self.empty_label.setObjectName("log_empty_label")
+
+        self.search_status = QLabel()
+        self.search_status.setObjectName("log_search_status")
+        self.search_status.setVisible(False)
+
+        main_layout.addWidget(self.search_status)
+        main_layout.addWidget(self.log_view)
+        main_layout.addWidget(self.empty_label)
+        self.log_model.modelReset.connect(self._update_empty_state)
+        self.log_model.rowsInserted.connect(self._update_empty_state)
+        self.log_model.rowsRemoved.connect(self._update_empty_state)
 
     def _connect_signals(self):
-        """连接日志管理器的信号"""
-        # 连接新信号（携带LogRecord）
-        log_manager.app_log_added.connect(self._on_app_log_added)
-        log_manager.device_log_added.connect(self._on_device_log_added)
-
-    def _on_app_log_added(self, record: LogRecord):
-        """处理应用日志添加信号"""
-        # 添加到会话日志
-        self.session_logs.append(record)
-
-        # 裁剪会话日志以防止内存溢出
-        if len(self.session_logs) > 2000:
-            self.session_logs = self.session_logs[-2000:]
-            self._needs_full_refresh = True
-
-        # 检查是否需要显示
-        if self._should_display_log(record):
-            self._pending_logs.append(record)
-            self._schedule_batch_update()
-
-    def _on_device_log_added(self, device_name: str, record: LogRecord):
-        """处理设备日志添加信号"""
-        # 添加到会话日志
-        self.session_logs.append(record)
-
-        # 裁剪会话日志
-        if len(self.session_logs) > 2000:
-            self.session_logs = self.session_logs[-2000:]
-            self._needs_full_refresh = True
-
-        # 检查是否需要显示
-        if self._should_display_log(record):
-            self._pending_logs.append(record)
-            self._schedule_batch_update()
-
-    def _should_display_log(self, record: LogRecord) -> bool:
-        """判断日志是否应该显示"""
-        # 检查设备过滤
-        if self.current_device != "all":
-            if record.device_name != self.current_device:
-                return False
-
-        # 检查日志级别过滤
-        try:
-            record_level_index = self.log_level_hierarchy.index(record.level)
-        except ValueError:
-            record_level_index = 1  # 默认INFO
+        """订阅日志投递中心，订阅随组件销毁"""
+        self._subscription = log_manager.delivery.subscribe(
+            device=self._subscription_device(),
+            min_level=self._subscription_level(),
+            max_batch=self.MAX_BATCH_LOGS,
+            parent=self
+        )
+        self._subscription.records_ready.connect(self._on_records_ready)
 
-        if self.enable_log_level_filter:
-            selected_level_index = self.log_level_hierarchy.index(self.current_log_level)
-            return record_level_index >= selected_level_index
-        else:
-            # 默认显示INFO及以上级别
-            info_level_index = self.log_level_hierarchy.index("INFO")
-            return record_level_index >= info_level_index
-
-    def _schedule_batch_update(self):
-        """调度批量更新"""
-        if not self._batch_timer.isActive():
-            self._batch_timer.start(50)  # 50ms延迟，收集更多日志
-
-    def _process_pending_logs(self):
-        """处理待显示的日志"""
-        if not self._pending_logs and not self._needs_full_refresh:
-            return
+    def _subscription_device(self) -> Optional[str]:
+        return None if self.current_device == "all" else self.current_device
 
-        # 如果需要完全刷新，则重建整个显示
-        if self._needs_full_refresh:
-            self._needs_full_refresh = False
-            self._pending_logs.clear()
-            self.refresh_display()
-            return
+    def _subscription_level(self) -> int:
+        return level_value(self._effective_level())
 
-        # 增量追加模式
-        scrollbar = self.log_text.verticalScrollBar()
-        was_at_bottom = scrollbar.value() >= scrollbar.maximum() - 10
+    def _effective_level(self) -> str:
+        return self.current_log_level if self.enable_log_level_filter else "INFO"
 
-        # 检查是否需要裁剪显示
-        total_after_append = self._displayed_log_count + len(self._pending_logs)
-        if total_after_append > self.MAX_DISPLAY_LOGS:
-            # 超过最大显示数量，进行完全刷新
-            self._pending_logs.clear()
+    def _on_records_ready(self, records: List[LogRecord], omitted: int):
+        """处理一个投递周期内匹配的日志，omitted 为超过单批上限而未投递的条数"""
+        if omitted:
             self.refresh_display()
             return
+        was_at_bottom = self._is_at_bottom()
+        self.log_model.append_records(records)
+        if was_at_bottom:
+            self.log_view.scrollToBottom()
 
-        # 追加新日志
-        for record in self._pending_logs:
-            self._append_log_to_display(record)
-            self._displayed_log_count += 1
+    def _is_at_bottom(self) -> bool:
+        scrollbar = self.log_view.verticalScrollBar()
+        return scrollbar.value() >= scrollbar.maximum() - 10
 
-        self._pending_logs.clear()
+    def _update_empty_state(self, *args):
+        empty = self.log_view.model().rowCount() == 0
+        self.empty_label.setText("没有匹配的日志" if self.is_searching() else "暂无日志记录")
+        self.empty_label.setVisible(empty)
+        self.log_view.setVisible(not empty)
 
-        # 如果之前在底部，滚动到底部
-        if was_at_bottom:
-            scrollbar.setValue(scrollbar.maximum())
-
-    def _append_log_to_display(self, record: LogRecord):
-        """追加单条日志到显示区域"""
-        # 移动光标到末尾
-        cursor = self.log_text.textCursor()
-        cursor.movePosition(QTextCursor.End)
-        self.log_text.setTextCursor(cursor)
-
-        # 设置颜色
-        color = self.log_colors.get(record.level, QColor("#888888"))
-        self.log_text.setTextColor(color)
-
-        # 格式化并追加
-        display_text = record.to_display_string()
-        if not self.log_text.document().isEmpty():
-            # 添加更大的间隔：两行空行
-            self.log_text.append("")
-            self.log_text.append("")
-        self.log_text.insertPlainText(display_text)
+    # ========== 日志检索 ==========
 
-    def refresh_display(self):
-        """完全刷新日志显示"""
-        # 过滤日志
-        filtered_logs = [
-            record for record in self.session_logs
-            if self._should_display_log(record)
-        ]
-
-        # 存储滚动位置
-        scrollbar = self.log_text.verticalScrollBar()
-        was_at_bottom = scrollbar.value() >= scrollbar.maximum() - 10
-
-        # 清空显示
-        self.log_text.clear()
-        self._displayed_log_count = 0
-
-        # 限制显示数量
-        displayable_logs = filtered_logs[-self.MAX_DISPLAY_LOGS:]
-
-        if not displayable_logs:
-            self.log_text.setPlainText("暂无日志记录")
-            return
+    def is_searching(self) -> bool:
+        return bool(self.search_input.text().strip())
 
-        # 如果日志被截断，显示提示
-        if len(filtered_logs) > self.MAX_DISPLAY_LOGS:
-            self.log_text.setTextColor(QColor("#888888"))
-            self.log_text.append(f"--- 日志过多，仅显示最新的 {self.MAX_DISPLAY_LOGS} 条 ---")
-            self.log_text.append("")
-
-        # 显示日志
-        for record in displayable_logs:
-            self._append_log_to_display(record)
-            self._displayed_log_count += 1
+    def on_search_text_changed(self, text: str):
+        if text.strip():
+            self._schedule_search()
+            return
+        # 清空搜索框后回到实时日志
+        self._search_id += 1
+        self._search_timer.stop()
+        self.search_status.setVisible(False)
+        if self.log_view.model() is not self.log_model:
+            self.log_view.setModel(self.log_model)
+            self.log_view.scrollToBottom()
+        self._update_empty_state()
+
+    def _schedule_search(self, *args):
+        if self.is_searching():
+            self._search_timer.start()
+
+    def _start_search(self):
+        if not self.is_searching():
+            return
+        days = self.search_range_selector.currentData()
+        query = {
+            'text': self.search_input.text(),
+            'device': ALL_DEVICES if self.current_device == "all" else self.current_device,
+            'min_level': self._subscription_level(),
+            'since': time.time() - days * 86400 if days else None,
+            'limit': self.MAX_SEARCH_RESULTS,
+        }
+        self._search_id += 1
+        worker = LogSearchWorker(self._search_id, query)
+        worker.finished_search.connect(self._on_search_finished)
+        worker.error.connect(self._on_search_error)
+        worker.finished.connect(lambda w=worker: self._search_workers.discard(w))
+        self._search_workers.add(worker)
+        self.search_status.setText("正在检索...")
+        self.search_status.setVisible(True)
+        worker.start()
+
+    def _on_search_finished(self, search_id: int, hits: list, seconds: float):
+        if search_id != self._search_id or not self.is_searching():
+            return  # 已有更新的检索
+        self.search_model.set_hits(hits)
+        if self.log_view.model() is not self.search_model:
+            self.log_view.setModel(self.search_model)
+        self.log_view.scrollToTop()
+        limited = "（仅显示最新的部分）" if len(hits) >= self.MAX_SEARCH_RESULTS else ""
+        self.search_status.setText(f"找到 {len(hits)} 条{limited}，耗时 {seconds * 1000:.0f} ms")
+        self._update_empty_state()
+
+    def _on_search_error(self, search_id: int, message: str):
+        if search_id == self._search_id:
+            self.search_status.setText(f"检索失败: {message}")
+
+    def _apply_filter(self, device: str, level: str):
+        """
+        更新设备与级别过滤条件。
+        条件只收紧（同一设备提高级别，或从全部日志切换到单个设备）时在模型中删除不匹配的行，
+        否则从缓冲区重新筛选日志序号。
+        """
+        old_device, old_level = self.current_device, self._effective_level()
+        self.current_device = device
+        self.current_log_level = level
+        if self._subscription is not None:
+            self._subscription.set_filter(self._subscription_device(), self._subscription_level())
+
+        new_level = self._effective_level()
+        if old_device == device and old_level == new_level:
+            return
+        hierarchy = self.log_level_hierarchy
+        narrowing = (old_device in ("all", device)
+                     and hierarchy.index(new_level) >= hierarchy.index(old_level))
+        if narrowing:
+            self.log_model.narrow(self.current_device, self._subscription_level())
+        else:
+            self.refresh_display()
+        self._schedule_search()
 
-        # 恢复滚动位置
-        if was_at_bottom:
-            scrollbar.setValue(scrollbar.maximum())
+    def refresh_display(self):
+        """从日志管理器的内存缓冲区重新筛选当前过滤条件下的日志序号"""
+        # 筛选结果可能包含仍在投递中心排队的日志，以筛选时的 next_seq 为边界，之后投递到达时不再重复追加
+        seqs, floor = log_manager.log_buffer.select_snapshot(
+            device=self.current_device,
+            min_level=self._subscription_level(),
+            limit=self.MAX_DISPLAY_LOGS
+        )
+        self.log_model.reset_seqs(seqs, floor)
+        self.log_view.scrollToBottom()
 
     def on_device_changed(self, index):
         """设备选择变更处理"""
         if index >= 0:
-            self.current_device = self.device_selector.currentData()
-            self._needs_full_refresh = True
-            self._schedule_batch_update()
+            self._apply_filter(self.device_selector.currentData(), self.current_log_level)
 
     def on_log_level_changed(self, index):
         """日志级别选择变更处理"""
         if index >= 0:
-            self.current_log_level = self.log_level_selector.currentData()
-            self._needs_full_refresh = True
-            self._schedule_batch_update()
+            self._apply_filter(self.current_device, self.log_level_selector.currentData())
 
     def update_device_list(self, devices):
         """更新设备下拉列表"""
@@ -330,9 +359,7 @@ class LogDisplay(QFrame):
     def show_device_logs(self, device_name):
         """显示特定设备的日志"""
         if not self.show_device_selector:
-            self.current_device = device_name
-            self._needs_full_refresh = True
-            self._schedule_batch_update()
+            self._apply_filter(device_name, self.current_log_level)
             return
 
         index = self.device_selector.findData(device_name)
@@ -370,7 +397,7 @@ class LogDisplay(QFrame):
     # ========== 废弃的方法（保留以兼容，但不再使用）==========
 
     def add_session_log(self, log_entry, device_name=None):
-        """添加会话日志（向后兼容，不再推荐使用）"""
+        """添加会话日志（向后兼容，不再推荐使用），记录写入日志管理器的内存缓冲区并经投递中心显示"""
         # 解析日志条目并创建LogRecord
         try:
             parts = log_entry.split(' - ', 2)
@@ -394,11 +421,7 @@ class LogDisplay(QFrame):
             message=message,
             device_name=device_name
         )
-        self.session_logs.append(record)
-
-        if self._should_display_log(record):
-            self._pending_logs.append(record)
-            self._schedule_batch_update()
+        log_manager.publish(record)
 
     def parse_log_timestamp(self, log_line):
         """解析日志时间戳（向后兼容）"""
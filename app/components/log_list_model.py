@@ -0,0 +1,165 @@
+# -*- coding: UTF-8 -*-
+"""
+日志列表模型
+模型只保存日志在共享缓冲区中的序号（array('q')，每行 8 字节），显示文本与颜色在视图请求时
+才从缓冲区读取，QListView 只为可见行调用 data()，十万行级别的日志也只渲染屏幕上的几十行。
+"""
+
+import logging
+from array import array
+from typing import List, Optional
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt
+from PySide6.QtGui import QColor
+
+from app.models.logging.log_buffer import ALL_DEVICES, LogBuffer, LogRecord
+from app.models.logging.log_index import LogSearchHit
+
+
+class LogListModel(QAbstractListModel):
+    """
+    日志列表模型
+    - append_records: 新日志在末尾插入，超过行数上限或日志已被缓冲区覆盖时成块删除最旧的行
+    - narrow: 过滤条件收紧时只删除不再匹配的行
+    - reset_seqs: 过滤条件放宽或需要补回日志时从缓冲区重新筛选序号
+    缓冲区先写入、投递中心后投递，重置时筛选到的日志可能稍后再次投递；
+    append_records 只接受不小于重置时序号边界的序号。多个线程同时写日志时投递顺序可能与序号不同，
+    因此不按模型最后一行过滤。
+    """
+
+    RecordRole = Qt.UserRole + 1
+    MAX_INCREMENTAL_RUNS = 64  # 收紧过滤时连续删除段超过该数量则改为重置模型
+
+    def __init__(self, buffer: LogBuffer, max_rows: int, level_colors: dict, parent=None):
+        super().__init__(parent)
+        self.buffer = buffer
+        self.max_rows = max_rows
+        self.level_colors = level_colors
+        self._default_color = QColor("#888888")
+        self._seqs = array('q')
+        self._floor = 0  # 重置时缓冲区的 next_seq，更小的序号已由重置结果覆盖
+
+    # === QAbstractListModel ===
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._seqs)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.record_at(index.row())
+        if record is None:
+            return None  # 已被缓冲区覆盖，下一次追加时删除
+        if role == Qt.DisplayRole:
+            return record.to_display_string()
+        if role == Qt.ForegroundRole:
+            return self.level_colors.get(record.level, self._default_color)
+        if role == Qt.ToolTipRole:
+            return record.to_formatted_string()
+        if role == self.RecordRole:
+            return record
+        return None
+
+    # === 增量更新 ===
+
+    def record_at(self, row: int) -> Optional[LogRecord]:
+        if 0 <= row < len(self._seqs):
+            return self.buffer.record(self._seqs[row])
+        return None
+
+    def append_records(self, records: List[LogRecord]):
+        floor = self._floor
+        seqs = [record.seq for record in records[-self.max_rows:] if record.seq >= floor]
+        if seqs:
+            first = len(self._seqs)
+            self.beginInsertRows(QModelIndex(), first, first + len(seqs) - 1)
+            self._seqs.extend(seqs)
+            self.endInsertRows()
+        self._trim()
+
+    def _trim(self):
+        # 删除已被缓冲区覆盖的行，以及超出上限一成后的最旧行，避免每批新日志都移动整个数组
+        seqs = self._seqs
+        first_live = self.buffer.first_seq
+        evicted = 0
+        while evicted < len(seqs) and seqs[evicted] < first_live:
+            evicted += 1
+        overflow = len(seqs) - self.max_rows
+        if overflow < max(1, self.max_rows // 10):
+            overflow = 0
+        count = max(evicted, overflow)
+        if count <= 0:
+            return
+        self.beginRemoveRows(QModelIndex(), 0, count - 1)
+        del seqs[:count]
+        self.endRemoveRows()
+
+    def narrow(self, device: str = ALL_DEVICES, min_level: int = logging.NOTSET):
+        """删除不满足条件的行，保留行的相对顺序不变"""
+        matches = self.buffer.matches
+        runs = []  # (起始行, 结束行)，按行号升序
+        start = None
+        for row, seq in enumerate(self._seqs):
+            if matches(seq, device, min_level):
+                if start is not None:
+                    runs.append((start, row - 1))
+                    start = None
+            elif start is None:
+                start = row
+        if start is not None:
+            runs.append((start, len(self._seqs) - 1))
+        if not runs:
+            return
+        if len(runs) > self.MAX_INCREMENTAL_RUNS:
+            # 保留原来的序号边界，仍在投递中的日志照常追加
+            self.reset_seqs(array('q', (seq for seq in self._seqs if matches(seq, device, min_level))), self._floor)
+            return
+        # 从后往前删除，前面的行号不受影响
+        for first, last in reversed(runs):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            del self._seqs[first:last + 1]
+            self.endRemoveRows()
+
+    def reset_seqs(self, seqs: array, floor: Optional[int] = None):
+        """floor 为筛选时的缓冲区 next_seq（LogBuffer.select_snapshot），省略时取当前值"""
+        self.beginResetModel()
+        self._seqs = array('q', seqs[-self.max_rows:])
+        self._floor = self.buffer.next_seq if floor is None else floor
+        self.endResetModel()
+
+    def clear(self):
+        self.reset_seqs(array('q'))
+
+
+class LogSearchModel(QAbstractListModel):
+    """日志检索结果模型，结果按时间倒序，行内容由 LogSearchHit 生成"""
+
+    def __init__(self, level_colors: dict, parent=None):
+        super().__init__(parent)
+        self.level_colors = level_colors
+        self._default_color = QColor("#888888")
+        self._hits: List[LogSearchHit] = []
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._hits)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        hit = self._hits[index.row()]
+        if role == Qt.DisplayRole:
+            return hit.to_display_string()
+        if role == Qt.ForegroundRole:
+            return self.level_colors.get(hit.level, self._default_color)
+        if role == Qt.ToolTipRole:
+            return hit.message
+        return None
+
+    def set_hits(self, hits: List[LogSearchHit]):
+        self.beginResetModel()
+        self._hits = list(hits)
+        self.endResetModel()
@@ -39,7 +39,9 @@ def load_resources_directory():
             os.makedirs(resource_dir)
             logger.info(f"创建资源目录: {resource_dir}")
 
-        global_config.load_all_resources_from_directory(resource_dir)
+        # 解析结果缓存放在用户配置目录，资源目录只读时也能使用
+        cache_file = os.path.join(get_config_directory(), "cache", "resource_configs.pickle")
+        global_config.load_all_resources_from_directory(resource_dir, cache_file=cache_file)
         logger.info(f"资源目录加载完成: {resource_dir}")
     except OSError as e:
         logger.error(f"创建或访问资源目录时发生操作系统错误: {e}")
@@ -7,6 +7,7 @@
 import asyncio
 import os
 
+from app.models.config.global_config import global_config
 from core.tasker_manager import task_manager
 from app.utils.until import kill_processes
 from app.utils.global_logger import get_logger
@@ -15,6 +16,15 @@ from app.utils.global_logger import get_logger
 logger = get_logger()
 
 
+def flush_config_writes(timeout: float = 3.0):
+    """os._exit 不会执行 atexit，退出前显式写入延迟保存的配置"""
+    try:
+        if not global_config.flush_pending_writes(timeout):
+            logger.warning("配置写入超时，部分修改可能未保存")
+    except Exception as e:
+        logger.error(f"写入配置时出错: {e}")
+
+
 async def force_exit_cleanup():
     """强制退出清理函数"""
     logger.info("开始强制退出清理...")
@@ -36,6 +46,8 @@ async def force_exit_cleanup():
     except Exception as e:
         logger.error(f"清理子进程时出错: {e}")
 
+    flush_config_writes()
+
     logger.info("强制退出进程...")
     os._exit(1)
 
@@ -68,13 +80,16 @@ async def perform_graceful_shutdown(loop, app, window):
     except Exception:
         pass
 
-    # 4️⃣ 停止事件循环
+    # 4️⃣ 写入尚未落盘的配置修改
+    flush_config_writes()
+
+    # 5️⃣ 停止事件循环
     try:
         loop.stop()
     except Exception:
         pass
 
-    # 5️⃣ Qt quit + OS 级强退（双保险）
+    # 6️⃣ Qt quit + OS 级强退（双保险）
     logger.info("💀 Forcing process exit.")
     try:
         if app:
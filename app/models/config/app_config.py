@@ -5,10 +5,33 @@ import os
 import uuid
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Any, Dict, List, Union, Optional, Type
+from functools import lru_cache
+from typing import Any, Dict, List, Union, Optional, Type, Tuple
 
 from cryptography.fernet import Fernet
 
+from app.models.config.config_index import ListIndex
+from app.models.config.lazy_list import LazyShardList
+
+
+@lru_cache(maxsize=4)
+def _derive_encryption_key(env_key: Optional[str]) -> bytes:
+    """按环境变量的取值缓存派生出的密钥，保存配置时不再重复计算"""
+    if env_key:
+        try:
+            key_bytes = base64.urlsafe_b64decode(env_key + '=' * (-len(env_key) % 4))
+            if len(key_bytes) == 32:
+                return env_key.encode()
+        except Exception:
+            pass
+    default_phrase = "app-config-default-encryption-key"
+    hash_object = hashlib.sha256(default_phrase.encode())
+    return base64.urlsafe_b64encode(hash_object.digest())
+
+
+# 字段名 -> (密钥, 明文, 密文)，每个敏感字段只保留当前值
+_ciphertext_cache: Dict[str, Tuple[bytes, str, str]] = {}
+
 
 class DeviceType(Enum):
     """设备控制器类型的枚举。"""
@@ -213,6 +236,7 @@ class DeviceConfig:
     start_command: str = ""
     auto_start_emulator: bool = False  # 是否自动启动模拟器
     auto_close_emulator: bool = False  # 是否自动关闭模拟器
+    agent_log_level: str = "DEBUG"  # Agent 输出写入设备日志的最低级别
     # emulator_start_wait_time 已从此移除
 
 
@@ -238,7 +262,72 @@ class AppConfig:
     window_position: str = field(default="center")
     debug_model: bool = False
     minimize_to_tray_on_close: Optional[bool] = False
-    emulator_start_wait_time: int = 30  # 通用参数：模拟器启动等待时间（秒）
+    emulator_start_wait_time: int = 30  # 通用参数：模拟器启动等待时间（秒），ADB 设备改为就绪探测，仅作为无历史时的预计启动耗时
+    device_session_idle_timeout: int = 300  # 设备会话空闲多久后断开（秒），0表示每批次结束即断开
+    resource_cache_max_entries: int = 8  # 进程级资源缓存最多保留的已加载资源数量
+    resource_cache_memory_mb: int = 1024  # 资源缓存内存预算（MB，按资源文件大小估算），0表示不限制
+    agent_pool_size: int = 1  # 每个资源/设备保持的预热Agent进程数，0表示不预热
+    agent_pool_max_idle: int = 600  # 资源最近一次使用后保持预热Agent的时间（秒）
+    agent_pool_max_lifetime: int = 3600  # 预热Agent进程的最长存活时间（秒），超过后替换
+    max_concurrent_boots: int = 2  # 同时冷启动的模拟器数量上限，0表示不限制
+    max_running_devices: int = 0  # 同时运行任务的设备数量上限，0表示不限制
+    adaptive_admission: bool = False  # 是否根据CPU/内存/磁盘压力自动收紧上述上限
+    subtask_max_attempts: int = 1  # 子任务最大尝试次数（含第一次），可被资源任务的 retry 覆盖
+    subtask_retry_backoff: float = 3.0  # 子任务第一次重试前的等待时间（秒），之后按倍数递增
+    subtask_retry_reconnect: bool = False  # 子任务重试前是否重新连接控制器
+    subtask_continue_on_failure: bool = False  # 子任务失败后是否继续执行剩余子任务
+    config_layout: str = "single"  # 配置文件布局："single" 单个文件，"sharded" 清单 + 按设备/配置方案/定时任务分片
+    log_max_file_mb: int = 10  # 单个日志文件超过该大小（MB）时轮转并压缩存档，0表示不按大小轮转
+    log_rotate_daily: bool = True  # 日志文件跨天时轮转
+    log_retention_days: int = 30  # 日志存档最长保留天数，0表示不限制
+    log_retention_total_mb: int = 200  # 日志存档总大小上限（MB），超过时删除最旧的存档，0表示不限制
+    log_structured: bool = False  # 是否同时写入结构化日志（每个日志文件旁的 .ndjson 文件）
+
+    # 二级索引（不参与序列化）：设备按名称、配置方案按 (资源, 名称)、定时任务按 schedule_id
+    _device_index: ListIndex = field(default_factory=lambda: ListIndex(lambda d: d.device_name),
+                                     init=False, repr=False, compare=False)
+    _settings_index: ListIndex = field(default_factory=lambda: ListIndex(lambda s: (s.resource_name, s.name)),
+                                       init=False, repr=False, compare=False)
+    _schedule_index: ListIndex = field(default_factory=lambda: ListIndex(lambda t: t.schedule_id),
+                                       init=False, repr=False, compare=False)
+
+    def get_device(self, device_name: str) -> Optional[DeviceConfig]:
+        return self._device_index.get(self.devices, device_name)
+
+    def get_resource_setting(self, resource_name: str, settings_name: str) -> Optional[ResourceSettings]:
+        settings = self.resource_settings
+        if isinstance(settings, LazyShardList) and not settings.materialized:
+            return settings.peek((resource_name, settings_name))  # 分片布局：只加载这一个配置方案
+        return self._settings_index.get(settings, (resource_name, settings_name))
+
+    def get_schedule_task(self, schedule_id: str) -> Optional[ScheduleTask]:
+        return self._schedule_index.get(self.schedule_tasks, schedule_id)
+
+    def replace_schedule_task(self, task: ScheduleTask) -> bool:
+        """用同一 schedule_id 的新对象替换现有定时任务，未找到时返回 False"""
+        position = self._schedule_index.position(self.schedule_tasks, task.schedule_id)
+        if position is None:
+            return False
+        self.schedule_tasks[position] = task
+        return True
+
+    def add_device(self, device: DeviceConfig):
+        self.devices.append(device)
+        for resource in device.resources:
+            resource.set_app_config(self)
+
+    def remove_device(self, device_name: str) -> bool:
+        """删除指定名称的设备（包括同名的重复项），返回是否有设备被删除"""
+        remaining = [device for device in self.devices if device.device_name != device_name]
+        removed = len(remaining) != len(self.devices)
+        self.devices[:] = remaining
+        return removed
+
+    def check_index_consistency(self) -> List[str]:
+        """调试用：逐项核对二级索引与列表内容，返回发现的不一致"""
+        return (self._device_index.verify(self.devices, "devices") +
+                self._settings_index.verify(self.resource_settings, "resource_settings") +
+                self._schedule_index.verify(self.schedule_tasks, "schedule_tasks"))
 
     def add_or_update_resource_setting(self, setting_data: Dict[str, Any]):
         """
@@ -255,14 +344,14 @@ class AppConfig:
         if not new_setting.resource_name or not new_setting.name:
             return
 
-        # 遍历现有列表，查找匹配项
-        for i, existing_setting in enumerate(self.resource_settings):
-            if (existing_setting.resource_name == new_setting.resource_name and
-                    existing_setting.name == new_setting.name):
-                self.resource_settings[i] = new_setting  # 找到了，直接覆盖
-                return  # 完成操作，退出方法
+        # 通过索引查找匹配项，找到了直接覆盖（键不变，索引仍然有效）
+        position = self._settings_index.position(self.resource_settings,
+                                                 (new_setting.resource_name, new_setting.name))
+        if position is not None:
+            self.resource_settings[position] = new_setting
+            return
 
-        # 如果循环结束都没有找到，说明是新的，添加到列表末尾
+        # 没有找到，说明是新的，添加到列表末尾
         self.resource_settings.append(new_setting)
 
     def add_or_update_schedule_task(self, task_data: Dict[str, Any]):
@@ -282,14 +371,9 @@ class AppConfig:
         if not new_task.schedule_id:
             new_task.schedule_id = uuid.uuid4().hex[:8]
 
-        # 遍历现有列表，查找匹配项
-        for i, existing_task in enumerate(self.schedule_tasks):
-            if hasattr(existing_task, 'schedule_id') and existing_task.schedule_id == new_task.schedule_id:
-                self.schedule_tasks[i] = new_task  # 找到了，直接覆盖
-                return  # 完成操作，退出方法
-
-        # 如果循环结束都没有找到，说明是新的，添加到列表末尾
-        self.schedule_tasks.append(new_task)
+        # 通过索引查找匹配项，找到了直接覆盖；没有找到说明是新的，添加到列表末尾
+        if not self.replace_schedule_task(new_task):
+            self.schedule_tasks.append(new_task)
 
     def get_resource_update_method(self, resource_name: str) -> str:
         specific_config = self.resource_update_methods.get(resource_name)
@@ -325,41 +409,47 @@ class AppConfig:
 
     @staticmethod
     def _get_encryption_key() -> bytes:
-        env_key = os.environ.get('APP_CONFIG_ENCRYPTION_KEY')
-        if env_key:
-            try:
-                key_bytes = base64.urlsafe_b64decode(env_key + '=' * (-len(env_key) % 4))
-                if len(key_bytes) == 32:
-                    return env_key.encode()
-            except Exception:
-                pass
-        default_phrase = "app-config-default-encryption-key"
-        hash_object = hashlib.sha256(default_phrase.encode())
-        key = base64.urlsafe_b64encode(hash_object.digest())
-        return key
+        return _derive_encryption_key(os.environ.get('APP_CONFIG_ENCRYPTION_KEY'))
+
+    @classmethod
+    def _encrypt_secret(cls, field_name: str, plaintext: str) -> str:
+        """
+        Fernet 每次加密的结果都不同，字段值未变化时复用已有的密文，
+        保证未修改的配置序列化结果不变（写入去重依赖这一点）。
+        """
+        key = cls._get_encryption_key()
+        cached = _ciphertext_cache.get(field_name)
+        if cached is not None and cached[0] == key and cached[1] == plaintext:
+            return cached[2]
+        encrypted = Fernet(key).encrypt(plaintext.encode('utf-8'))
+        ciphertext = base64.urlsafe_b64encode(encrypted).decode('utf-8')
+        _ciphertext_cache[field_name] = (key, plaintext, ciphertext)
+        return ciphertext
+
+    @classmethod
+    def _decrypt_secret(cls, field_name: str, encrypted_text: str) -> str:
+        key = cls._get_encryption_key()
+        decrypted = Fernet(key).decrypt(base64.urlsafe_b64decode(encrypted_text)).decode('utf-8')
+        _ciphertext_cache[field_name] = (key, decrypted, encrypted_text)  # 再次保存时沿用文件中的密文
+        return decrypted
 
     def _encrypt_cdk(self) -> str:
-        if not self.CDK: return ""
-        key = self._get_encryption_key()
-        f = Fernet(key)
-        encrypted = f.encrypt(self.CDK.encode('utf-8'))
-        return base64.urlsafe_b64encode(encrypted).decode('utf-8')
+        if not self.CDK:
+            _ciphertext_cache.pop('cdk', None)
+            return ""
+        return self._encrypt_secret('cdk', self.CDK)
 
     def _encrypt_github_token(self) -> str:
-        if not self.github_token: return ""
-        key = self._get_encryption_key()
-        f = Fernet(key)
-        encrypted = f.encrypt(self.github_token.encode('utf-8'))
-        return base64.urlsafe_b64encode(encrypted).decode('utf-8')
+        if not self.github_token:
+            _ciphertext_cache.pop('github_token', None)
+            return ""
+        return self._encrypt_secret('github_token', self.github_token)
 
     @classmethod
     def _decrypt_cdk(cls, encrypted_cdk: str) -> str:
         if not encrypted_cdk: return ""
-        key = cls._get_encryption_key()
-        f = Fernet(key)
         try:
-            decrypted = f.decrypt(base64.urlsafe_b64decode(encrypted_cdk))
-            return decrypted.decode('utf-8')
+            return cls._decrypt_secret('cdk', encrypted_cdk)
         except Exception as e:
             print(f"解密CDK失败: {e}")
             return ""
@@ -367,11 +457,8 @@ class AppConfig:
     @classmethod
     def _decrypt_github_token(cls, encrypted_token: str) -> str:
         if not encrypted_token: return ""
-        key = cls._get_encryption_key()
-        f = Fernet(key)
         try:
-            decrypted = f.decrypt(base64.urlsafe_b64decode(encrypted_token))
-            return decrypted.decode('utf-8')
+            return cls._decrypt_secret('github_token', encrypted_token)
         except Exception as e:
             print(f"解密 GitHub Token 失败: {e}")
             return ""
@@ -390,7 +477,10 @@ class AppConfig:
                 raise ValueError("未提供保存路径且未记录原始文件路径。")
             file_path = self.source_file
         with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(self.to_dict(), f, indent=indent, ensure_ascii=False)
+            f.write(self.to_json_text(indent))
+
+    def to_json_text(self, indent=4) -> str:
+        return json.dumps(self.to_dict(), indent=indent, ensure_ascii=False)
 
     @staticmethod
     def _filter_kwargs_for_class(target_class: Type, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -399,6 +489,31 @@ class AppConfig:
         valid_keys = target_class.__dataclass_fields__.keys()
         return {key: value for key, value in data.items() if key in valid_keys}
 
+    @classmethod
+    def device_from_dict(cls, device_data: Dict[str, Any]) -> DeviceConfig:
+        device_type_str = device_data.get('device_type', 'adb')
+        try:
+            device_type = DeviceType(device_type_str)
+        except ValueError:
+            device_type = DeviceType.ADB
+        if device_type == DeviceType.ADB:
+            controller_config_data = device_data.get('controller_config', device_data.get('adb_config', {}))
+            controller_config = AdbDevice(**cls._filter_kwargs_for_class(AdbDevice, controller_config_data))
+        else:
+            controller_config_data = device_data.get('controller_config', {})
+            controller_config = Win32Device(**cls._filter_kwargs_for_class(Win32Device, controller_config_data))
+        resources_data = device_data.get('resources', [])
+        resources = [Resource(**cls._filter_kwargs_for_class(Resource, res_data)) for res_data in resources_data]
+        device_kwargs = {k: v for k, v in device_data.items() if
+                         k not in ('controller_config', 'adb_config', 'resources', 'device_type')}
+        filtered_device_kwargs = cls._filter_kwargs_for_class(DeviceConfig, device_kwargs)
+        return DeviceConfig(**filtered_device_kwargs, device_type=device_type, controller_config=controller_config,
+                            resources=resources)
+
+    @classmethod
+    def schedule_task_from_dict(cls, task_data: Dict[str, Any]) -> ScheduleTask:
+        return ScheduleTask(**cls._filter_kwargs_for_class(ScheduleTask, task_data))
+
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'AppConfig':
         config_version = data.get('config_version', 1)
@@ -430,32 +545,8 @@ class AppConfig:
                 resource_settings.append(ResourceSettings(**settings_kwargs))
             else:
                 resource_settings.append(ResourceSettings.from_dict(settings_data))
-        devices_data = data.get('devices', [])
-        device_configs = []
-        for device_data in devices_data:
-            device_type_str = device_data.get('device_type', 'adb')
-            try:
-                device_type = DeviceType(device_type_str)
-            except ValueError:
-                device_type = DeviceType.ADB
-            if device_type == DeviceType.ADB:
-                controller_config_data = device_data.get('controller_config', device_data.get('adb_config', {}))
-                controller_config = AdbDevice(**cls._filter_kwargs_for_class(AdbDevice, controller_config_data))
-            else:
-                controller_config_data = device_data.get('controller_config', {})
-                controller_config = Win32Device(**cls._filter_kwargs_for_class(Win32Device, controller_config_data))
-            resources_data = device_data.get('resources', [])
-            resources = [Resource(**cls._filter_kwargs_for_class(Resource, res_data)) for res_data in resources_data]
-            device_kwargs = {k: v for k, v in device_data.items() if
-                             k not in ('controller_config', 'adb_config', 'resources', 'device_type')}
-            filtered_device_kwargs = cls._filter_kwargs_for_class(DeviceConfig, device_kwargs)
-            device_configs.append(
-                DeviceConfig(**filtered_device_kwargs, device_type=device_type, controller_config=controller_config,
-                             resources=resources))
-
-        schedule_tasks_data = data.get('schedule_tasks', [])
-        schedule_tasks = [ScheduleTask(**cls._filter_kwargs_for_class(ScheduleTask, task_data)) for task_data in
-                          schedule_tasks_data]
+        device_configs = [cls.device_from_dict(device_data) for device_data in data.get('devices', [])]
+        schedule_tasks = [cls.schedule_task_from_dict(task_data) for task_data in data.get('schedule_tasks', [])]
         config = AppConfig(
             devices=device_configs,
             resource_settings=resource_settings,
@@ -493,14 +584,36 @@ class AppConfig:
         config.minimize_to_tray_on_close = data.get('minimize_to_tray_on_close', False)
         # 从配置字典中读取通用等待时间，如果不存在则默认为 30
         config.emulator_start_wait_time = data.get('emulator_start_wait_time', 30)
+        config.device_session_idle_timeout = data.get('device_session_idle_timeout', 300)
+        config.resource_cache_max_entries = data.get('resource_cache_max_entries', 8)
+        config.resource_cache_memory_mb = data.get('resource_cache_memory_mb', 1024)
+        config.agent_pool_size = data.get('agent_pool_size', 1)
+        config.agent_pool_max_idle = data.get('agent_pool_max_idle', 600)
+        config.agent_pool_max_lifetime = data.get('agent_pool_max_lifetime', 3600)
+        config.max_concurrent_boots = data.get('max_concurrent_boots', 2)
+        config.max_running_devices = data.get('max_running_devices', 0)
+        config.adaptive_admission = data.get('adaptive_admission', False)
+        config.subtask_max_attempts = data.get('subtask_max_attempts', 1)
+        config.subtask_retry_backoff = data.get('subtask_retry_backoff', 3.0)
+        config.subtask_retry_reconnect = data.get('subtask_retry_reconnect', False)
+        config.subtask_continue_on_failure = data.get('subtask_continue_on_failure', False)
+        config.config_layout = data.get('config_layout', 'single')
+        config.log_max_file_mb = data.get('log_max_file_mb', 10)
+        config.log_rotate_daily = data.get('log_rotate_daily', True)
+        config.log_retention_days = data.get('log_retention_days', 30)
+        config.log_retention_total_mb = data.get('log_retention_total_mb', 200)
+        config.log_structured = data.get('log_structured', False)
 
         config.link_resources_to_config()
         return config
 
-    def to_dict(self) -> Dict[str, Any]:
+    def to_dict(self, include_collections: bool = True) -> Dict[str, Any]:
+        """include_collections 为 False 时不序列化设备、配置方案与定时任务（分片布局中它们各自写入分片文件）"""
         result = {"config_version": self.config_version}
-        if self.CDK: result["encrypted_cdk"] = self._encrypt_cdk()
-        if self.github_token: result["encrypted_github_token"] = self._encrypt_github_token()
+        encrypted_cdk = self._encrypt_cdk()
+        if encrypted_cdk: result["encrypted_cdk"] = encrypted_cdk
+        encrypted_github_token = self._encrypt_github_token()
+        if encrypted_github_token: result["encrypted_github_token"] = encrypted_github_token
         result["resource_update_methods"] = {
             name: resource_update_config_to_dict(config)
             for name, config in self.resource_update_methods.items()
@@ -508,15 +621,35 @@ class AppConfig:
         if self.update_method: result["update_method"] = self.update_method
         result["receive_beta_update"] = getattr(self, "receive_beta_update", False)
         result["auto_check_update"] = getattr(self, "auto_check_update", False)
-        result["devices"] = [device_config_to_dict(device) for device in self.devices]
-        result["resource_settings"] = [resource_settings_to_dict(settings) for settings in self.resource_settings]
-        result["schedule_tasks"] = [schedule_task_to_dict(task) for task in self.schedule_tasks]
+        if include_collections:
+            result["devices"] = [device_config_to_dict(device) for device in self.devices]
+            result["resource_settings"] = [resource_settings_to_dict(settings) for settings in self.resource_settings]
+            result["schedule_tasks"] = [schedule_task_to_dict(task) for task in self.schedule_tasks]
         result["window_size"] = self.window_size
         result["window_position"] = self.window_position
         result["debug_model"] = self.debug_model
         result["minimize_to_tray_on_close"] = self.minimize_to_tray_on_close
         # 将通用等待时间写入配置字典
         result["emulator_start_wait_time"] = self.emulator_start_wait_time
+        result["device_session_idle_timeout"] = self.device_session_idle_timeout
+        result["resource_cache_max_entries"] = self.resource_cache_max_entries
+        result["resource_cache_memory_mb"] = self.resource_cache_memory_mb
+        result["agent_pool_size"] = self.agent_pool_size
+        result["agent_pool_max_idle"] = self.agent_pool_max_idle
+        result["agent_pool_max_lifetime"] = self.agent_pool_max_lifetime
+        result["max_concurrent_boots"] = self.max_concurrent_boots
+        result["max_running_devices"] = self.max_running_devices
+        result["adaptive_admission"] = self.adaptive_admission
+        result["subtask_max_attempts"] = self.subtask_max_attempts
+        result["subtask_retry_backoff"] = self.subtask_retry_backoff
+        result["subtask_retry_reconnect"] = self.subtask_retry_reconnect
+        result["subtask_continue_on_failure"] = self.subtask_continue_on_failure
+        result["config_layout"] = self.config_layout
+        result["log_max_file_mb"] = self.log_max_file_mb
+        result["log_rotate_daily"] = self.log_rotate_daily
+        result["log_retention_days"] = self.log_retention_days
+        result["log_retention_total_mb"] = self.log_retention_total_mb
+        result["log_structured"] = self.log_structured
         return result
 
 
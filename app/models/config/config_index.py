@@ -0,0 +1,68 @@
+"""
+配置对象的二级索引
+- 索引记录 键 -> 列表中的位置，查找为 O(1)。
+- 自校验: 命中时检查该位置上的对象的键仍然一致，列表被整体替换、增删或重命名导致不一致时自动重建，
+  因此界面代码直接修改列表时索引也不会返回过期的对象。
+- 未命中时线性确认一次（与原来的查找成本相同），对象被原地重命名或新加入时重建索引。
+- verify 用于调试模式下的一致性检查。
+"""
+
+from typing import Callable, Dict, Generic, Hashable, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+class ListIndex(Generic[T]):
+    """列表的自校验哈希索引，键相同时保留列表中第一个对象（与线性查找的结果一致）"""
+
+    __slots__ = ('_key_func', '_items', '_positions', 'stats')
+
+    def __init__(self, key_func: Callable[[T], Hashable]):
+        self._key_func = key_func
+        self._items: Optional[List[T]] = None
+        self._positions: Dict[Hashable, int] = {}
+        self.stats = {'hits': 0, 'rebuilds': 0}
+
+    def get(self, items: List[T], key: Hashable) -> Optional[T]:
+        position = self.position(items, key)
+        return items[position] if position is not None else None
+
+    def position(self, items: List[T], key: Hashable) -> Optional[int]:
+        if items is self._items:
+            position = self._positions.get(key)
+            if position is not None and position < len(items) and self._key_func(items[position]) == key:
+                self.stats['hits'] += 1
+                return position
+            if position is None:
+                # 未命中时线性确认一次：对象可能被原地重命名，找到时说明索引已过期
+                if not any(self._key_func(item) == key for item in items):
+                    return None
+        self.rebuild(items)
+        return self._positions.get(key)
+
+    def rebuild(self, items: List[T]):
+        positions: Dict[Hashable, int] = {}
+        for i, item in enumerate(items):
+            positions.setdefault(self._key_func(item), i)
+        self._items = items
+        self._positions = positions
+        self.stats['rebuilds'] += 1
+
+    def invalidate(self):
+        self._items = None
+        self._positions = {}
+
+    def verify(self, items: List[T], name: str) -> List[str]:
+        """与线性查找的结果逐项比较，返回发现的不一致"""
+        problems = []
+        if items is not self._items:
+            return problems  # 尚未基于当前列表建立索引，下次查找时会重建
+        expected: Dict[Hashable, int] = {}
+        for i, item in enumerate(items):
+            expected.setdefault(self._key_func(item), i)
+        for key, position in expected.items():
+            if self._positions.get(key) != position:
+                problems.append(f"{name}: 键 {key!r} 的索引位置为 {self._positions.get(key)}，实际为 {position}")
+        for key in self._positions.keys() - expected.keys():
+            problems.append(f"{name}: 索引中存在已不在列表中的键 {key!r}")
+        return problems
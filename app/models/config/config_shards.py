@@ -0,0 +1,277 @@
+"""
+分片配置布局
+AppConfig.config_layout 为 "sharded" 时，原配置文件改为一个小的清单，设备、配置方案与定时任务
+分别写入同目录下 <配置文件名>.shards/ 中的分片文件:
+    devices/<设备>.json          每个设备一个文件
+    settings/<资源>_<方案>.json   每个配置方案一个文件
+    schedules/<设备>.json        每个设备的定时任务一个文件
+清单保存全局设置以及各分片的相对路径（决定加载后的顺序）。
+
+- 加载: 设备在加载清单时读取；配置方案按 (资源, 名称) 查找时只加载对应分片，
+  定时任务与其它列表操作在第一次访问时加载全部分片（见 LazyShardList）。
+- 写入: 每次保存为每个分片生成内容，由配置写入服务按内容哈希去重，只有变化的分片会落盘；
+  尚未加载的配置方案与定时任务分片不会被序列化，清单中沿用原来的路径。
+- 迁移: 两种布局之间的切换在下一次保存时完成，旧布局遗留的文件会被删除，
+  加载时根据文件内容自动识别布局，load_and_migrate_config 无需区分。
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+from app.models.config.app_config import (AppConfig, ResourceSettings, device_config_to_dict,
+                                          resource_settings_to_dict, schedule_task_to_dict)
+from app.models.config.config_writer import config_writer
+from app.models.config.lazy_list import LazyShardList
+from app.models.logging.log_manager import app_logger
+
+LAYOUT_SINGLE = "single"
+LAYOUT_SHARDED = "sharded"
+MANIFEST_KEY = "shards"
+MANIFEST_VERSION = 1
+
+_UNSAFE_CHARS = re.compile(r'[^\w\-.]+')
+
+
+def shard_directory(manifest_path: str) -> str:
+    return os.path.splitext(manifest_path)[0] + ".shards"
+
+
+def shard_file_name(category: str, key: Hashable, used: Set[str]) -> str:
+    """由分片的键生成稳定的文件名：可读部分 + 键的哈希，同一次保存中重名时追加序号"""
+    parts = key if isinstance(key, tuple) else (key,)
+    readable = _UNSAFE_CHARS.sub('_', "_".join(str(p) for p in parts)).strip('._')[:40] or "shard"
+    digest = hashlib.sha1(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()[:8]
+    name = f"{category}/{readable}-{digest}.json"
+    n = 1
+    while name in used:
+        n += 1
+        name = f"{category}/{readable}-{digest}-{n}.json"
+    used.add(name)
+    return name
+
+
+def is_manifest(data: Dict[str, Any]) -> bool:
+    return isinstance(data, dict) and isinstance(data.get(MANIFEST_KEY), dict)
+
+
+def _dump(data: Any) -> str:
+    return json.dumps(data, indent=4, ensure_ascii=False)
+
+
+class ConfigShardStore:
+    """分片布局的加载与快照，记录每个清单当前引用的分片文件以便清理"""
+
+    def __init__(self):
+        # 清单路径 -> 上次加载或保存时引用的分片相对路径
+        self._files: Dict[str, Set[str]] = {}
+        # 清单路径 -> {类别: {分片键: 相对路径}}，用于尚未加载的分片
+        self._entries: Dict[str, Dict[str, Dict[Hashable, str]]] = {}
+
+    # === 加载 ===
+
+    def load(self, manifest_path: str, manifest: Dict[str, Any]) -> AppConfig:
+        manifest_path = os.path.abspath(manifest_path)
+        shards = manifest.get(MANIFEST_KEY, {})
+        base = shard_directory(manifest_path)
+        entries: Dict[str, Dict[Hashable, str]] = {'settings': {}, 'schedules': {}}
+        files: Set[str] = set()
+
+        config = AppConfig.from_dict({k: v for k, v in manifest.items() if k != MANIFEST_KEY})
+        config.config_layout = LAYOUT_SHARDED
+
+        for rel in shards.get('devices', []):
+            files.add(rel)
+            data = self._read(base, rel)
+            if data is not None:
+                config.devices.append(AppConfig.device_from_dict(data))
+        config.link_resources_to_config()
+
+        settings_loaders = []
+        for entry in shards.get('resource_settings', []):
+            key = (entry.get('resource_name', ''), entry.get('name', ''))
+            rel = entry.get('file', '')
+            files.add(rel)
+            entries['settings'][key] = rel
+            settings_loaders.append((key, self._settings_loader(base, rel)))
+        config.resource_settings = LazyShardList(settings_loaders)
+
+        schedule_loaders = []
+        for rel in shards.get('schedule_tasks', []):
+            files.add(rel)
+            entries['schedules'][rel] = rel
+            schedule_loaders.append((rel, self._schedule_loader(base, rel)))
+        config.schedule_tasks = _FlatteningShardList(schedule_loaders)
+
+        self._files[manifest_path] = files
+        self._entries[manifest_path] = entries
+        app_logger.info(f"已加载分片配置清单: {len(shards.get('devices', []))} 个设备分片，"
+                        f"{len(settings_loaders)} 个配置方案分片，{len(schedule_loaders)} 个定时任务分片")
+        return config
+
+    def _settings_loader(self, base: str, rel: str):
+        def load() -> Optional[ResourceSettings]:
+            data = self._read(base, rel)
+            return ResourceSettings.from_dict(data) if data is not None else None
+        return load
+
+    def _schedule_loader(self, base: str, rel: str):
+        def load() -> Optional[list]:
+            data = self._read(base, rel)
+            if data is None:
+                return None
+            return [AppConfig.schedule_task_from_dict(task_data) for task_data in data.get('schedule_tasks', [])]
+        return load
+
+    @staticmethod
+    def _read(base: str, rel: str) -> Optional[Dict[str, Any]]:
+        path = os.path.join(base, rel)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            data = json.loads(text)
+        except (OSError, ValueError) as e:
+            app_logger.warning(f"读取配置分片失败，已跳过 {path}: {e}")
+            return None
+        config_writer.remember(path, text)
+        return data
+
+    # === 快照 ===
+
+    def snapshot(self, app_config: AppConfig, manifest_path: str) -> Dict[str, Optional[str]]:
+        """按配置的布局生成待写入的文件，不再引用的分片文件内容为 None（删除）"""
+        manifest_path = os.path.abspath(manifest_path)
+        if app_config.config_layout == LAYOUT_SHARDED:
+            files = self._sharded_files(app_config, manifest_path)
+        else:
+            # 先写入完整的单文件配置，再删除原有的分片
+            files = {manifest_path: app_config.to_json_text()}
+            previous = self._files.pop(manifest_path, set())
+            self._entries.pop(manifest_path, None)
+            if previous:
+                app_logger.info("配置布局已切换为单文件，将删除原有的分片文件")
+            base = shard_directory(manifest_path)
+            for rel in previous:
+                files[os.path.join(base, rel)] = None
+        return files
+
+    def reset(self, manifest_path: str):
+        """加载单文件配置时调用，丢弃之前记录的分片"""
+        manifest_path = os.path.abspath(manifest_path)
+        self._files.pop(manifest_path, None)
+        self._entries.pop(manifest_path, None)
+
+    def _sharded_files(self, app_config: AppConfig, manifest_path: str) -> Dict[str, Optional[str]]:
+        base = shard_directory(manifest_path)
+        entries = self._entries.get(manifest_path, {'settings': {}, 'schedules': {}})
+        used: Set[str] = set()
+        files: Dict[str, Optional[str]] = {}
+
+        device_refs = []
+        for device in app_config.devices:
+            rel = shard_file_name("devices", device.device_name, used)
+            device_refs.append(rel)
+            files[os.path.join(base, rel)] = _dump(device_config_to_dict(device))
+
+        settings_refs, settings_entries = self._settings_refs(app_config.resource_settings, entries['settings'],
+                                                              base, used, files)
+        schedule_refs, schedule_entries = self._schedule_refs(app_config.schedule_tasks, entries['schedules'],
+                                                              base, used, files)
+
+        manifest = app_config.to_dict(include_collections=False)
+        manifest[MANIFEST_KEY] = {
+            'manifest_version': MANIFEST_VERSION,
+            'devices': device_refs,
+            'resource_settings': settings_refs,
+            'schedule_tasks': schedule_refs,
+        }
+        if manifest_path not in self._files:
+            app_logger.info("配置布局已切换为分片，清单写入原配置文件位置")
+
+        # 清单最后写入：写入中途退出时，清单仍然只引用已经存在的分片
+        files[manifest_path] = _dump(manifest)
+        for rel in self._files.get(manifest_path, set()) - used:
+            files[os.path.join(base, rel)] = None
+
+        self._files[manifest_path] = used
+        self._entries[manifest_path] = {'settings': settings_entries, 'schedules': schedule_entries}
+        return files
+
+    @staticmethod
+    def _settings_refs(settings_list: list, known: Dict[Hashable, str], base: str, used: Set[str],
+                       files: Dict[str, Optional[str]]) -> Tuple[List[Dict[str, str]], Dict[Hashable, str]]:
+        refs: List[Dict[str, str]] = []
+        entries: Dict[Hashable, str] = {}
+        if isinstance(settings_list, LazyShardList) and not settings_list.materialized:
+            loaded = settings_list.loaded_items()
+            for key in settings_list.keys():
+                settings = loaded.get(key)
+                rel = known.get(key)
+                if settings is None and rel is not None and rel not in used:
+                    # 未加载的分片内容不变，沿用清单中的路径
+                    used.add(rel)
+                    refs.append({'resource_name': key[0], 'name': key[1], 'file': rel})
+                    entries[key] = rel
+                    continue
+                if settings is None:
+                    # 路径与本次保存的其它分片冲突（或未记录）时，加载后重新写入
+                    settings = settings_list.peek(key)
+                    if settings is None:
+                        continue
+                _append_settings(settings, base, used, files, refs, entries)
+        else:
+            for settings in settings_list:
+                _append_settings(settings, base, used, files, refs, entries)
+        return refs, entries
+
+    @staticmethod
+    def _schedule_refs(tasks: list, known: Dict[Hashable, str], base: str, used: Set[str],
+                       files: Dict[str, Optional[str]]) -> Tuple[List[str], Dict[Hashable, str]]:
+        if isinstance(tasks, LazyShardList) and not tasks.materialized:
+            # 定时任务尚未被访问，分片原样保留
+            refs = [rel for rel in tasks.keys() if rel in known.values()]
+            used.update(refs)
+            return refs, {rel: rel for rel in refs}
+
+        # 按设备分组，组的顺序为设备在列表中第一次出现的顺序
+        groups: Dict[str, list] = {}
+        for task in tasks:
+            groups.setdefault(task.device_name, []).append(schedule_task_to_dict(task))
+        refs = []
+        for device_name, task_dicts in groups.items():
+            rel = shard_file_name("schedules", device_name, used)
+            refs.append(rel)
+            files[os.path.join(base, rel)] = _dump({'device_name': device_name, 'schedule_tasks': task_dicts})
+        return refs, {rel: rel for rel in refs}
+
+
+def _append_settings(settings: ResourceSettings, base: str, used: Set[str], files: Dict[str, Optional[str]],
+                     refs: List[Dict[str, str]], entries: Dict[Hashable, str]):
+    key = (settings.resource_name, settings.name)
+    rel = shard_file_name("settings", key, used)
+    files[os.path.join(base, rel)] = _dump(resource_settings_to_dict(settings))
+    refs.append({'resource_name': settings.resource_name, 'name': settings.name, 'file': rel})
+    entries.setdefault(key, rel)
+
+
+class _FlatteningShardList(LazyShardList):
+    """每个分片包含多个元素（一个设备的全部定时任务），加载时展开"""
+
+    def materialize(self):
+        if self.materialized:
+            return
+        self.materialized = True
+        items = []
+        for _, loader in self._loaders:
+            group = loader()
+            if group:
+                items.extend(group)
+        list.extend(self, items)
+        self._loaders = []
+        self._loaded = {}
+
+
+# 创建全局实例
+config_shards = ConfigShardStore()
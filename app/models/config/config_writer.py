@@ -0,0 +1,226 @@
+"""
+配置文件后台写入
+- 合并: 窗口期内的多次保存请求只序列化、写入一次（每次请求顺延窗口，但不超过最长延迟）。
+- 去重: 按文件记录最近一次写入内容的哈希，序列化结果未变化时跳过写入。
+- 原子写入: 在写入线程中写临时文件、fsync 后用 os.replace 替换目标文件，写入中途退出不会留下半个文件。
+- 顺序: 同一次保存中的文件按给出的顺序写入（分片布局先写分片、最后写清单），内容为 None 的文件会被删除。
+- 序列化在事件循环线程中进行，与界面对配置对象的修改不会并发；只有磁盘 IO 在写入线程中执行。
+- 退出前调用 flush，立即写入尚未落盘的修改。
+"""
+
+import asyncio
+import atexit
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from app.models.logging.log_manager import app_logger
+
+# 生成待写入内容的函数：返回 {文件路径: 文件内容}，内容为 None 表示删除该文件
+Snapshot = Callable[[], Dict[str, Optional[str]]]
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ConfigWriter:
+    """配置文件的合并、去重与原子写入服务"""
+
+    DEBOUNCE_SECONDS = 0.5  # 最后一次保存请求后等待的时间
+    MAX_DELAY_SECONDS = 3.0  # 第一次保存请求后最长等待的时间
+
+    def __init__(self):
+        self._lock = threading.Condition()
+        self._snapshot: Optional[Snapshot] = None  # 尚未序列化的保存请求
+        self._first_request = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: Dict[str, Optional[str]] = {}  # 已序列化、等待写入线程写入的内容（按写入顺序）
+        self._writing = False
+        self._hashes: Dict[str, str] = {}  # 文件路径 -> 最近一次写入（或加载）内容的哈希
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'requests': 0, 'snapshots': 0, 'writes': 0, 'skipped': 0, 'errors': 0}
+
+    # === 公开接口 ===
+
+    def schedule(self, snapshot: Snapshot):
+        """请求保存。可以在任意线程调用；没有运行中的事件循环时同步写入"""
+        with self._lock:
+            self.stats['requests'] += 1
+            self._snapshot = snapshot
+
+        loop = self._current_loop()
+        if loop is not None:
+            self._loop = loop
+            self._arm_timer()
+            return
+        loop = self._loop
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            loop.call_soon_threadsafe(self._arm_timer)
+            return
+        self.flush()
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """立即序列化尚未处理的保存请求，并等待写入线程完成，返回是否在超时前完成"""
+        timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self._take_snapshot()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                # 写入线程尚未启动（或已退出）时在当前线程写入
+                self._write_pending_locked()
+                return True
+            return self._lock.wait_for(lambda: not self._pending and not self._writing, timeout)
+
+    def remember(self, file_path: str, text: str):
+        """记录从磁盘加载的文件内容，未修改的配置在第一次保存时不会重写文件"""
+        with self._lock:
+            self._hashes[os.path.abspath(file_path)] = content_hash(text)
+
+    def forget(self, file_path: str):
+        with self._lock:
+            self._hashes.pop(os.path.abspath(file_path), None)
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return self._snapshot is not None or bool(self._pending) or self._writing
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+    # === 事件循环线程 ===
+
+    @staticmethod
+    def _current_loop() -> Optional[asyncio.AbstractEventLoop]:
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        if threading.current_thread() is threading.main_thread():
+            # Qt 槽函数由 qasync 事件循环调度，但不一定处于协程上下文中
+            try:
+                loop = asyncio.get_event_loop()
+            except RuntimeError:
+                return None
+            if loop.is_running():
+                return loop
+        return None
+
+    def _arm_timer(self):
+        now = time.monotonic()
+        if self._timer is None:
+            self._first_request = now
+        else:
+            self._timer.cancel()
+        deadline = min(now + self.DEBOUNCE_SECONDS, self._first_request + self.MAX_DELAY_SECONDS)
+        self._timer = self._loop.call_later(max(0.0, deadline - now), self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        try:
+            self._take_snapshot()
+        except Exception as e:
+            app_logger.error(f"序列化配置失败: {e}", exc_info=True)
+
+    def _take_snapshot(self):
+        """序列化配置并交给写入线程，内容未变化的文件不写入"""
+        with self._lock:
+            snapshot, self._snapshot = self._snapshot, None
+        if snapshot is None:
+            return
+        files = snapshot()
+        self.stats['snapshots'] += 1
+        with self._lock:
+            changed = False
+            for file_path, text in files.items():
+                key = os.path.abspath(file_path)
+                if text is None:
+                    if key not in self._hashes and key not in self._pending and not os.path.exists(key):
+                        continue
+                elif self._hashes.get(key) == content_hash(text) and key not in self._pending:
+                    self.stats['skipped'] += 1
+                    continue
+                self._pending.pop(key, None)  # 重新排到队尾，保持本次保存给出的写入顺序
+                self._pending[key] = text
+                changed = True
+            if changed:
+                self._ensure_thread_locked()
+                self._lock.notify_all()
+
+    # === 写入线程 ===
+
+    def _ensure_thread_locked(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._worker, name="ConfigWriter", daemon=True)
+            self._thread.start()
+
+    def _worker(self):
+        with self._lock:
+            while True:
+                self._lock.wait_for(lambda: bool(self._pending))
+                self._write_pending_locked()
+
+    def _write_pending_locked(self):
+        """写入所有待写入的文件。调用方持有锁，磁盘 IO 期间释放锁"""
+        while self._pending:
+            file_path = next(iter(self._pending))
+            text = self._pending.pop(file_path)
+            self._writing = True
+            self._lock.release()
+            try:
+                ok = self._remove(file_path) if text is None else self._write_atomic(file_path, text)
+            finally:
+                self._lock.acquire()
+                self._writing = False
+            if ok and text is not None and file_path not in self._pending:
+                self._hashes[file_path] = content_hash(text)
+            else:
+                self._hashes.pop(file_path, None)  # 已删除，或写入失败时下次保存必定重试
+        self._lock.notify_all()
+
+    def _remove(self, file_path: str) -> bool:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.stats['errors'] += 1
+            app_logger.error(f"删除配置文件失败 {file_path}: {e}")
+            return False
+        return True
+
+    def _write_atomic(self, file_path: str, text: str) -> bool:
+        directory = os.path.dirname(file_path) or '.'
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(file_path) + '.', suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, file_path)
+            tmp_path = None
+            self.stats['writes'] += 1
+            return True
+        except OSError as e:
+            self.stats['errors'] += 1
+            app_logger.error(f"写入配置文件失败 {file_path}: {e}")
+            return False
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+
+# 创建全局实例
+config_writer = ConfigWriter()
+# 正常退出时写入尚未落盘的修改；os._exit 不会触发 atexit，退出流程中需显式调用 flush
+atexit.register(config_writer.flush)
@@ -0,0 +1,74 @@
+"""
+按需加载的列表
+配置分片加载后以列表的形式挂在 AppConfig 上，界面代码可以像普通列表一样使用；
+按键查找（peek）只加载对应的分片，其它任何列表操作都会先加载全部分片。
+"""
+
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+Loader = Callable[[], Optional[object]]
+
+
+class LazyShardList(list):
+    """分片列表，元素在第一次被访问时加载，已经通过 peek 加载的元素在全部加载时复用同一对象"""
+
+    def __init__(self, loaders: List[Tuple[Hashable, Loader]]):
+        super().__init__()
+        self._loaders = list(loaders)
+        self._loaded: Dict[Hashable, Optional[object]] = {}
+        self.materialized = not self._loaders
+
+    def keys(self) -> List[Hashable]:
+        """全部分片的键（加载前即可获得）"""
+        return [key for key, _ in self._loaders]
+
+    def loaded_items(self) -> Dict[Hashable, object]:
+        """已经通过 peek 加载的元素"""
+        return {key: item for key, item in self._loaded.items() if item is not None}
+
+    def peek(self, key: Hashable) -> Optional[object]:
+        """只加载指定键的分片；全部加载后应改用列表本身查找"""
+        if key in self._loaded:
+            return self._loaded[key]
+        for loader_key, loader in self._loaders:
+            if loader_key == key:
+                item = self._loaded[key] = loader()
+                return item
+        return None
+
+    def materialize(self):
+        if self.materialized:
+            return
+        self.materialized = True
+        items = []
+        for key, loader in self._loaders:
+            item = self._loaded[key] if key in self._loaded else loader()
+            if item is not None:
+                items.append(item)
+        list.extend(self, items)
+        self._loaders = []
+        self._loaded = {}
+
+    def __reduce_ex__(self, protocol):
+        self.materialize()
+        return list, (list(self),)
+
+
+def _materializing(name: str):
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        if not self.materialized:
+            self.materialize()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in ('__iter__', '__len__', '__getitem__', '__setitem__', '__delitem__', '__contains__',
+              '__reversed__', '__iadd__', '__imul__', '__add__', '__mul__', '__rmul__', '__eq__', '__ne__',
+              '__lt__', '__le__', '__gt__', '__ge__', '__repr__',
+              'append', 'extend', 'insert', 'remove', 'pop', 'index', 'count', 'sort', 'reverse', 'clear', 'copy'):
+    setattr(LazyShardList, _name, _materializing(_name))
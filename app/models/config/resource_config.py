@@ -2,6 +2,8 @@ import json
 from dataclasses import dataclass, field
 from typing import List, Dict, Any, Literal, Optional
 
+from app.models.config.config_index import ListIndex
+
 __all__ = ['Choice', 'Option', 'SelectOption', 'BoolOption', 'InputOption', 'SettingsGroupOption', 'Task',
            'Agent', 'ResourceConfig']
 
@@ -60,6 +62,14 @@ class Task:
     task_name: str
     task_entry: str
     option: List[str] = field(default_factory=list)
+    # 子任务重试策略覆盖项: max_attempts / backoff / backoff_factor / max_backoff / reconnect / continue_on_failure
+    retry: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {"task_name": self.task_name, "task_entry": self.task_entry, "option": self.option}
+        if self.retry:
+            result["retry"] = self.retry
+        return result
 
 
 @dataclass
@@ -73,6 +83,15 @@ class Agent:
     use_venv: bool = True
 
 
+# 索引键函数定义在模块级，ResourceConfig 可以被 pickle（解析结果缓存依赖这一点）
+def _task_name_key(task: Task) -> str:
+    return task.task_name
+
+
+def _option_name_key(option: Option) -> str:
+    return option.name
+
+
 @dataclass
 class ResourceConfig:
     """Main resource configuration dataclass."""
@@ -90,6 +109,31 @@ class ResourceConfig:
     resource_tasks: List[Task] = field(default_factory=list)
     options: List[Option] = field(default_factory=list)
     source_file: str = ""  # 用于记录加载的文件路径，但不保存到输出 JSON 中
+    # 二级索引（不参与序列化）：任务定义按名称、顶层选项按名称
+    _task_index: ListIndex = field(default_factory=lambda: ListIndex(_task_name_key),
+                                   init=False, repr=False, compare=False)
+    _option_index: ListIndex = field(default_factory=lambda: ListIndex(_option_name_key),
+                                     init=False, repr=False, compare=False)
+
+    def get_task(self, task_name: str) -> Optional[Task]:
+        return self._task_index.get(self.resource_tasks, task_name)
+
+    def get_option(self, qualified_name: str) -> Optional[Option]:
+        """按名称查找选项，"组名.子选项名" 形式的名称查找设置组中的子选项"""
+        option = self._option_index.get(self.options, qualified_name)
+        if option is not None or '.' not in qualified_name:
+            return option
+        group_name, sub_name = qualified_name.split('.', 1)
+        group = self._option_index.get(self.options, group_name)
+        if isinstance(group, SettingsGroupOption):
+            return next((sub for sub in group.settings if sub.name == sub_name), None)
+        return None
+
+    def check_index_consistency(self) -> List[str]:
+        """调试用：逐项核对二级索引与列表内容，返回发现的不一致"""
+        prefix = f"{self.resource_name}."
+        return (self._task_index.verify(self.resource_tasks, prefix + "resource_tasks") +
+                self._option_index.verify(self.options, prefix + "options"))
 
     @classmethod
     def from_json_file(cls, file_path: str) -> 'ResourceConfig':
@@ -205,7 +249,7 @@ class ResourceConfig:
                 "requirements_path":self.agent.requirements_path,
                 "use_venv": self.agent.use_venv,
             },
-            "resource_tasks": [task.__dict__ for task in self.resource_tasks],
+            "resource_tasks": [task.to_dict() for task in self.resource_tasks],
             "options": [option_to_dict(option) for option in self.options],
         }
 
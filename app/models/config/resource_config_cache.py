@@ -0,0 +1,316 @@
+"""
+resource_config.json 解析结果的持久化缓存
+- 校验: 按文件大小与修改时间判断缓存是否有效；修改时间变化但大小相同时比较内容哈希，
+  内容未变（例如 git 检出只更新了时间戳）时沿用缓存。
+- 版本: 缓存文件记录缓存格式版本与资源配置数据类的字段签名，任一变化时整个缓存作废。
+- 冷启动: 缓存未命中的文件数量较多时交给线程池，只有读取文件与计算哈希可以与其它文件重叠，
+  JSON 解析与构建数据类仍受 GIL 限制；解析结果直接返回给调用方，不再反序列化。
+  不使用进程池：Windows 与打包版本以 spawn 方式启动子进程，子进程会重新执行主程序的导入，
+  创建日志管理器与界面模块。
+- 延迟加载: 命中缓存的资源返回 LazyResourceConfig，只保存名称与版本，
+  第一次访问其它属性时才反序列化完整的 ResourceConfig。
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from app.models.config import resource_config as _resource_config_module
+from app.models.config.resource_config import ResourceConfig
+
+CACHE_VERSION = 1
+
+
+def schema_signature() -> str:
+    """资源配置数据类的字段签名，数据类增删字段后旧缓存自动作废"""
+    parts = []
+    for name in sorted(_resource_config_module.__all__):
+        cls = getattr(_resource_config_module, name)
+        if dataclasses.is_dataclass(cls):
+            parts.append(name + ":" + ",".join(f.name for f in dataclasses.fields(cls)))
+    return hashlib.sha256(f"{CACHE_VERSION}|{'|'.join(parts)}".encode('utf-8')).hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    size: int
+    mtime_ns: int
+    sha256: str
+    resource_name: str
+    resource_version: str
+    payload: bytes  # pickle 后的 ResourceConfig
+
+
+def parse_resource_file(file_path: str) -> Tuple[CacheEntry, ResourceConfig]:
+    """解析 resource_config.json，返回缓存项与解析结果"""
+    with open(file_path, 'rb') as f:
+        stat = os.fstat(f.fileno())
+        raw = f.read()
+    config = ResourceConfig.from_dict(json.loads(raw.decode('utf-8')))
+    config.source_file = file_path
+    entry = CacheEntry(
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        sha256=hashlib.sha256(raw).hexdigest(),
+        resource_name=config.resource_name,
+        resource_version=config.resource_version,
+        payload=pickle.dumps(config, protocol=pickle.HIGHEST_PROTOCOL),
+    )
+    return entry, config
+
+
+def _parse_in_worker(file_path: str) -> Tuple[str, Optional[CacheEntry], Optional[ResourceConfig], Optional[str]]:
+    """线程池中执行：返回缓存项与解析结果"""
+    try:
+        entry, config = parse_resource_file(file_path)
+        return file_path, entry, config, None
+    except Exception as e:
+        return file_path, None, None, f"{type(e).__name__}: {e}"
+
+
+def _file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LazyResourceConfig:
+    """
+    ResourceConfig 的延迟加载代理。
+    resource_name / resource_version / source_file 直接保存在代理上，访问其它属性或方法时
+    才反序列化完整的配置，之后所有访问都转发给同一个 ResourceConfig 对象。
+    """
+
+    _EAGER_FIELDS = ('resource_name', 'resource_version', 'source_file')
+    _lock = threading.Lock()
+
+    def __init__(self, resource_name: str, resource_version: str, source_file: str,
+                 loader: Callable[[], ResourceConfig]):
+        object.__setattr__(self, '_loader', loader)
+        object.__setattr__(self, '_target', None)
+        object.__setattr__(self, 'resource_name', resource_name)
+        object.__setattr__(self, 'resource_version', resource_version)
+        object.__setattr__(self, 'source_file', source_file)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._target is not None
+
+    def resolve(self) -> ResourceConfig:
+        target = self._target
+        if target is not None:
+            return target
+        with self._lock:
+            if self._target is None:
+                target = self._loader()
+                # 加载前对代理字段的修改（例如更新后写入的新版本号）以代理为准
+                for name in self._EAGER_FIELDS:
+                    setattr(target, name, object.__getattribute__(self, name))
+                object.__setattr__(self, '_target', target)
+                object.__setattr__(self, '_loader', None)
+            return self._target
+
+    def __getattr__(self, name):
+        # 只有代理自身没有的属性才会进入这里
+        if name.startswith('__') and name.endswith('__'):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __setattr__(self, name, value):
+        if name in self._EAGER_FIELDS:
+            object.__setattr__(self, name, value)
+            if self._target is not None:
+                setattr(self._target, name, value)
+        else:
+            setattr(self.resolve(), name, value)
+
+    def __repr__(self):
+        state = "已加载" if self.is_loaded else "未加载"
+        return f"LazyResourceConfig({self.resource_name!r}, {self.resource_version!r}, {state})"
+
+
+class ResourceConfigCache:
+    """resource_config.json 解析结果缓存，缓存文件位于用户配置目录"""
+
+    PARALLEL_MIN_FILES = 4  # 未命中的文件达到该数量时使用线程池并行解析
+    MAX_WORKERS = 4
+
+    def __init__(self):
+        self.cache_file: Optional[str] = None
+        self._entries: Dict[str, CacheEntry] = {}
+        self._loaded = False
+        self._dirty = False
+        self.stats = {'hits': 0, 'rehashed': 0, 'parsed': 0, 'parallel': 0, 'errors': 0}
+
+    def configure(self, cache_file: Optional[str]):
+        if cache_file != self.cache_file:
+            self.cache_file = cache_file
+            self._entries = {}
+            self._loaded = False
+
+    # === 公开接口 ===
+
+    def load_files(self, file_paths: List[str]) -> Tuple[List[Union[ResourceConfig, LazyResourceConfig]],
+                                                          List[Tuple[str, str]]]:
+        """
+        按顺序返回 (资源配置列表, [(文件路径, 错误信息)])。
+        命中缓存的资源为延迟加载代理，重新解析的资源为完整的 ResourceConfig。
+        """
+        self._load_cache_file()
+        results: Dict[str, Union[ResourceConfig, LazyResourceConfig]] = {}
+        errors: List[Tuple[str, str]] = []
+        cold: List[str] = []
+        seen = set()
+
+        for file_path in file_paths:
+            key = os.path.abspath(file_path)
+            seen.add(key)
+            entry = self._entries.get(key)
+            if entry is not None and self._is_valid(key, entry):
+                self.stats['hits'] += 1
+                results[file_path] = self._lazy(entry, file_path)
+            else:
+                cold.append(file_path)
+
+        for file_path, config, error in self._parse(cold):
+            if error is not None:
+                self.stats['errors'] += 1
+                self._entries.pop(os.path.abspath(file_path), None)
+                errors.append((file_path, error))
+            else:
+                results[file_path] = config
+
+        for key in [k for k in self._entries if k not in seen]:
+            del self._entries[key]  # 已删除的资源
+            self._dirty = True
+
+        if self._dirty:
+            self.save()
+        return [results[p] for p in file_paths if p in results], errors
+
+    def invalidate(self, file_path: str):
+        if self._entries.pop(os.path.abspath(file_path), None) is not None:
+            self._dirty = True
+
+    def save(self):
+        """原子写入缓存文件；写入失败只影响下次启动的速度"""
+        if not self.cache_file:
+            return
+        data = {'signature': schema_signature(), 'entries': self._entries}
+        directory = os.path.dirname(self.cache_file) or '.'
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix='resource_configs.', suffix='.tmp', dir=directory)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_file)
+            tmp_path = None
+            self._dirty = False
+        except OSError:
+            pass
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'entries': len(self._entries)}
+
+    # === 内部实现 ===
+
+    def _load_cache_file(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('signature') == schema_signature():
+                self._entries = dict(data.get('entries', {}))
+            else:
+                self._dirty = True  # 格式或数据类已变化，丢弃旧缓存
+        except Exception:
+            # 缓存损坏或由不兼容的版本写入，全部重新解析
+            self._entries = {}
+            self._dirty = True
+
+    def _is_valid(self, key: str, entry: CacheEntry) -> bool:
+        try:
+            stat = os.stat(key)
+        except OSError:
+            return False
+        if stat.st_size != entry.size:
+            return False
+        if stat.st_mtime_ns == entry.mtime_ns:
+            return True
+        try:
+            same = _file_sha256(key) == entry.sha256
+        except OSError:
+            return False
+        if same:
+            entry.mtime_ns = stat.st_mtime_ns
+            self.stats['rehashed'] += 1
+            self._dirty = True
+        return same
+
+    @staticmethod
+    def _lazy(entry: CacheEntry, file_path: str) -> LazyResourceConfig:
+        payload = entry.payload
+        return LazyResourceConfig(entry.resource_name, entry.resource_version, file_path,
+                                  lambda: pickle.loads(payload))
+
+    def _parse(self, file_paths: List[str]):
+        """解析未命中的文件，产出 (文件路径, 配置, 错误信息)"""
+        if len(file_paths) >= self.PARALLEL_MIN_FILES:
+            parsed = self._parse_parallel(file_paths)
+            if parsed is not None:
+                for file_path, entry, config, error in parsed:
+                    if entry is None:
+                        yield file_path, None, error
+                        continue
+                    self._remember(file_path, entry)
+                    yield file_path, config, None
+                return
+        for file_path in file_paths:
+            try:
+                entry, config = parse_resource_file(file_path)
+            except Exception as e:
+                yield file_path, None, f"{type(e).__name__}: {e}"
+                continue
+            self._remember(file_path, entry)
+            yield file_path, config, None
+
+    def _parse_parallel(self, file_paths: List[str]) -> Optional[list]:
+        workers = min(len(file_paths), os.cpu_count() or 1, self.MAX_WORKERS)
+        if workers < 2:
+            return None
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ResourceParse") as pool:
+                results = list(pool.map(_parse_in_worker, file_paths))
+        except Exception:
+            return None  # 线程池不可用时退回当前线程解析
+        self.stats['parallel'] += len(file_paths)
+        return results
+
+    def _remember(self, file_path: str, entry: CacheEntry):
+        self._entries[os.path.abspath(file_path)] = entry
+        self.stats['parsed'] += 1
+        self._dirty = True
+
+
+# 创建全局实例
+resource_config_cache = ResourceConfigCache()
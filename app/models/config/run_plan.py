@@ -0,0 +1,397 @@
+"""
+运行计划编译与缓存
+- 选项模板编译: 每个选项的 pipeline_override 只解析一次，编译为占位符槽位树，
+  不含占位符的子树直接共享，渲染时只重建含占位符的路径。
+- 覆盖参数缓存: 按 (资源, 任务, 选项取值) 缓存任务实例的 pipeline_override，未变化的实例不再重新计算。
+- 运行计划缓存: 按 (设备, 资源, 配置方案) 缓存完整的 RunTimeConfigs，并记录其依赖的签名
+  （资源配置、设备上的资源绑定、任务顺序以及各任务实例的启用状态与选项取值）。
+  只有依赖发生变化的计划会被重新生成，返回给调用方的是计划的浅拷贝。
+"""
+
+import json
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Hashable
+
+from app.models.config.app_config import OptionConfig, ResourceSettings, TaskInstance
+from app.models.config.resource_config import ResourceConfig, SelectOption, BoolOption, InputOption, \
+    SettingsGroupOption, Option, Task
+
+
+@dataclass
+class RunTimeConfig:
+    task_name: str
+    task_entry: str
+    pipeline_override: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    retry: Dict[str, Any] = field(default_factory=dict)  # 资源任务定义中的重试策略覆盖项
+
+
+@dataclass
+class RunTimeConfigs:
+    task_list: List[RunTimeConfig] = field(default_factory=list)
+    resource_pack: Dict[str, Any] = field(default_factory=dict)
+    resource_path: str = field(default_factory=Path)
+    resource_name: str = field(default_factory=str)
+    resource_version: str = field(default_factory=str)
+    settings_name: str = field(default_factory=str)  # 生成该配置时使用的配置方案名称
+    force_rerun: bool = False  # 忽略当天的子任务检查点，从第一个子任务完整执行
+
+
+def parse_bool_value(value: Any) -> bool:
+    if isinstance(value, bool): return value
+    if isinstance(value, str): return value.lower() in ('true', 'yes', 'y', '1', 'on', 'enabled', '启用', '开启')
+    if isinstance(value, (int, float)): return value != 0
+    return bool(value)
+
+
+def merge_override(target: Dict[str, Any], override: Dict[str, Any]):
+    """
+    将 override 合并到 target。
+    合并时先复制被修改的嵌套字典，编译模板中共享的子树（以及资源配置本身）不会被改写。
+    """
+    for key, value in override.items():
+        current = target.get(key)
+        if isinstance(value, dict) and isinstance(current, dict):
+            merged = dict(current)
+            merge_override(merged, value)
+            target[key] = merged
+        else:
+            target[key] = value
+
+
+# === 占位符模板 ===
+
+_STATIC, _DICT, _LIST, _BOOL, _BOOLE_TEXT, _VALUE_TEXT, _MIXED_TEXT = range(7)
+
+
+def _compile_node(pipeline: Any) -> tuple:
+    """编译 pipeline 结构，规则与占位符替换保持一致：字典值与字典中列表的字符串项会被替换"""
+    if isinstance(pipeline, dict):
+        children = []
+        for k, v in pipeline.items():
+            if isinstance(v, str):
+                if v == "{boole}":
+                    node = (_BOOL,)
+                elif "{boole}" in v:
+                    node = (_BOOLE_TEXT, v)
+                elif "{value}" in v:
+                    node = (_VALUE_TEXT, v)
+                else:
+                    node = (_STATIC, v)
+            elif isinstance(v, dict):
+                node = _compile_node(v)
+            elif isinstance(v, list):
+                items = []
+                for item in v:
+                    if isinstance(item, (dict, list)):
+                        items.append(_compile_node(item))
+                    elif item == "{boole}":
+                        items.append((_BOOL,))
+                    elif isinstance(item, str) and ("{boole}" in item or "{value}" in item):
+                        items.append((_MIXED_TEXT, item))
+                    else:
+                        items.append((_STATIC, item))
+                node = _collapse(_LIST, items, v)
+            else:
+                node = (_STATIC, v)
+            children.append((k, node))
+        return _collapse(_DICT, children, pipeline)
+    if isinstance(pipeline, list):
+        return _collapse(_LIST, [_compile_node(item) for item in pipeline], pipeline)
+    return _STATIC, pipeline
+
+
+def _collapse(tag: int, children: list, original: Any) -> tuple:
+    """不含占位符的子树直接共享原对象"""
+    nodes = [c[1] if tag == _DICT else c for c in children]
+    if all(node[0] == _STATIC for node in nodes):
+        return _STATIC, original
+    return tag, children
+
+
+def _render(node: tuple, value: str, bool_value: bool, bool_text: str) -> Any:
+    tag = node[0]
+    if tag == _STATIC:
+        return node[1]
+    if tag == _DICT:
+        return {k: _render(child, value, bool_value, bool_text) for k, child in node[1]}
+    if tag == _LIST:
+        return [_render(child, value, bool_value, bool_text) for child in node[1]]
+    if tag == _BOOL:
+        return bool_value
+    if tag == _BOOLE_TEXT:
+        return node[1].replace("{boole}", bool_text)
+    if tag == _VALUE_TEXT:
+        return node[1].replace("{value}", value)
+    return node[1].replace("{boole}", bool_text).replace("{value}", value)
+
+
+class CompiledTemplate:
+    """编译后的 pipeline_override 模板"""
+
+    __slots__ = ('_root', 'is_static')
+
+    def __init__(self, pipeline: Any):
+        self._root = _compile_node(pipeline)
+        self.is_static = self._root[0] == _STATIC
+
+    def render(self, value: str, bool_value: Optional[bool] = None) -> Any:
+        if bool_value is None: bool_value = parse_bool_value(value)
+        return _render(self._root, value, bool_value, str(bool_value).lower())
+
+
+class CompiledOption:
+    """编译后的单个选项定义"""
+
+    def __init__(self, definition: Option, name: str):
+        self.name = name
+        self.definition = definition
+        self.default = definition.default
+        self.template = CompiledTemplate(definition.pipeline_override) if definition.pipeline_override else None
+        self.choice_values: Dict[Any, Any] = {}
+        self.sub_options: List['CompiledOption'] = []
+        if isinstance(definition, SelectOption):
+            for choice in definition.choices:
+                self.choice_values.setdefault(choice.name, choice.value)
+        elif isinstance(definition, SettingsGroupOption):
+            self.sub_options = [CompiledOption(sub, f"{name}.{sub.name}") for sub in definition.settings
+                                if isinstance(sub, (SelectOption, BoolOption, InputOption))]
+
+    def apply(self, target: Dict[str, Any], option_values: Dict[str, Any]):
+        definition = self.definition
+        option_value = option_values.get(self.name, self.default)
+
+        if isinstance(definition, SelectOption):
+            if definition.pipeline_override:
+                try:
+                    choice_value = self.choice_values.get(option_value, option_value)
+                    merge_override(target, definition.pipeline_override.get(choice_value, {}))
+                except TypeError:
+                    pass  # 不可哈希的取值不会匹配任何选项
+
+        elif isinstance(definition, BoolOption):
+            if self.template:
+                merge_override(target, self.template.render(str(option_value), parse_bool_value(option_value)))
+
+        elif isinstance(definition, InputOption):
+            if option_value and self.template:
+                merge_override(target, self.template.render(str(option_value)))
+
+        elif isinstance(definition, SettingsGroupOption):
+            group_enabled = parse_bool_value(option_value)
+            if group_enabled:
+                if self.template:
+                    merge_override(target, self.template.render(str(group_enabled), group_enabled))
+                for sub_option in self.sub_options:
+                    sub_option.apply(target, option_values)
+
+
+class CompiledTask:
+    """编译后的资源任务：按任务定义中的顺序排列的选项"""
+
+    def __init__(self, task: Task, resource_config: ResourceConfig):
+        self.task = task
+        self.options = []
+        for name in task.option:
+            definition = resource_config.get_option(name)
+            if definition is not None:
+                self.options.append(CompiledOption(definition, name))
+
+    def build_override(self, instance_options: List[OptionConfig]) -> Dict[str, Any]:
+        option_values = {opt.option_name: opt.value for opt in instance_options}
+        result: Dict[str, Any] = {}
+        for option in self.options:
+            option.apply(result, option_values)
+        return result
+
+
+class _CompiledResource:
+    """单个资源配置的编译结果，任务按需编译"""
+
+    def __init__(self, resource_config: ResourceConfig):
+        self.config = resource_config
+        self.compiled_tasks: Dict[str, CompiledTask] = {}
+
+    def task(self, task_name: str) -> Optional[CompiledTask]:
+        compiled = self.compiled_tasks.get(task_name)
+        if compiled is None:
+            task = self.config.get_task(task_name)
+            if task is None:
+                return None
+            compiled = self.compiled_tasks[task_name] = CompiledTask(task, self.config)
+        return compiled
+
+
+def _freeze(value: Any) -> Hashable:
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def options_signature(options: List[OptionConfig]) -> tuple:
+    return tuple((opt.option_name, type(opt.value).__name__, _freeze(opt.value)) for opt in options)
+
+
+PlanKey = Tuple[str, str, str]
+
+
+class RunPlanCompiler:
+    """
+    运行计划编译器。
+    只在事件循环线程中使用（调度、手动运行与命令行启动都在同一线程生成运行配置）。
+    """
+
+    MAX_CACHED_OVERRIDES = 4096
+
+    def __init__(self):
+        self._resources: Dict[str, _CompiledResource] = {}
+        self._overrides: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._plans: Dict[PlanKey, Tuple[tuple, RunTimeConfigs]] = {}
+        self.stats = {'plan_hits': 0, 'plan_builds': 0, 'override_hits': 0, 'override_builds': 0,
+                      'resource_compiles': 0}
+
+    # === 公开接口 ===
+
+    def get_plan(self, device_name: str, resource_config: ResourceConfig, device_resource,
+                 settings: Optional[ResourceSettings]) -> RunTimeConfigs:
+        """返回运行计划的浅拷贝：任务列表为新列表，调用方可以修改 RunTimeConfigs 本身的字段"""
+        key = (device_name or "", resource_config.resource_name, settings.name if settings else "")
+        signature = self._plan_signature(resource_config, device_resource, settings)
+        cached = self._plans.get(key)
+        if cached is not None and cached[0] == signature:
+            self.stats['plan_hits'] += 1
+            plan = cached[1]
+        else:
+            self.stats['plan_builds'] += 1
+            plan = self._build_plan(resource_config, device_resource, settings)
+            self._plans[key] = (signature, plan)
+        return replace(plan, task_list=list(plan.task_list))
+
+    def get_task_override(self, resource_config: ResourceConfig, task_name: str,
+                          instance_options: List[OptionConfig]) -> Optional[Dict[str, Any]]:
+        """返回任务实例的 pipeline_override，任务未定义时返回 None。结果可能被多个计划共享，调用方不应修改"""
+        compiled_resource = self._compiled_resource(resource_config)
+        cache_key = (resource_config.resource_name, task_name, options_signature(instance_options))
+        override = self._overrides.get(cache_key)
+        if override is not None:
+            self._overrides.move_to_end(cache_key)
+            self.stats['override_hits'] += 1
+            return override
+        compiled_task = compiled_resource.task(task_name)
+        if compiled_task is None:
+            return None
+        override = compiled_task.build_override(instance_options)
+        self.stats['override_builds'] += 1
+        self._overrides[cache_key] = override
+        while len(self._overrides) > self.MAX_CACHED_OVERRIDES:
+            self._overrides.popitem(last=False)
+        return override
+
+    def get_task_definition(self, resource_config: ResourceConfig, task_name: str) -> Optional[Task]:
+        return resource_config.get_task(task_name)
+
+    def invalidate_resource(self, resource_name: str):
+        """资源配置重新加载后，丢弃该资源的编译结果、覆盖参数与运行计划"""
+        self._resources.pop(resource_name, None)
+        for key in [k for k in self._overrides if k[0] == resource_name]:
+            del self._overrides[key]
+        for key in [k for k in self._plans if k[1] == resource_name]:
+            del self._plans[key]
+
+    def clear(self):
+        self._resources.clear()
+        self._overrides.clear()
+        self._plans.clear()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'plans': len(self._plans), 'overrides': len(self._overrides),
+                'resources': len(self._resources)}
+
+    # === 内部实现 ===
+
+    def _compiled_resource(self, resource_config: ResourceConfig) -> _CompiledResource:
+        compiled = self._resources.get(resource_config.resource_name)
+        if compiled is None or compiled.config is not resource_config:
+            if compiled is not None:
+                self.invalidate_resource(resource_config.resource_name)
+            compiled = self._resources[resource_config.resource_name] = _CompiledResource(resource_config)
+            self.stats['resource_compiles'] += 1
+        return compiled
+
+    @staticmethod
+    def _plan_signature(resource_config: ResourceConfig, device_resource,
+                        settings: Optional[ResourceSettings]) -> tuple:
+        """计划依赖的输入签名，只包含标量与元组，计算成本与任务实例数量成正比"""
+        binding = None
+        if device_resource is not None:
+            binding = (device_resource.enable, device_resource.settings_name,
+                       getattr(device_resource, 'resource_pack', ''))
+        instances = None
+        if settings is not None:
+            entries = []
+            for instance_id in settings.task_order:
+                instance: Optional[TaskInstance] = settings.task_instances.get(instance_id)
+                if instance is None or not instance.enabled:
+                    entries.append((instance_id, None))
+                else:
+                    entries.append((instance_id, instance.task_name, options_signature(instance.options)))
+            instances = (settings.name, tuple(entries))
+        return id(resource_config), resource_config.resource_version, resource_config.source_file, binding, instances
+
+    def _build_plan(self, resource_config: ResourceConfig, device_resource,
+                    settings: Optional[ResourceSettings]) -> RunTimeConfigs:
+        # 获取选定的资源包配置
+        selected_pack_config = {}
+        if device_resource:
+            selected_pack_name = getattr(device_resource, 'resource_pack', '')
+            if selected_pack_name and hasattr(resource_config, 'resource_pack'):
+                pack_object = next((pack for pack in resource_config.resource_pack
+                                    if pack.get('name') == selected_pack_name), None)
+                if pack_object:
+                    selected_pack_config = pack_object
+
+        resource_path = Path(resource_config.source_file).parent if resource_config.source_file else Path()
+
+        if not settings:
+            return RunTimeConfigs(
+                task_list=[],
+                resource_path=resource_path,
+                resource_name=resource_config.resource_name,
+                resource_version=resource_config.resource_version,
+                resource_pack=selected_pack_config,
+                settings_name=device_resource.settings_name if device_resource else ""
+            )
+
+        runtime_configs = []
+        # 按照 task_order 中定义的顺序遍历已启用的任务实例
+        for instance_id in settings.task_order:
+            task_instance = settings.task_instances.get(instance_id)
+            if not task_instance or not task_instance.enabled:
+                continue
+            task_definition = self.get_task_definition(resource_config, task_instance.task_name)
+            if task_definition is None:
+                continue
+            pipeline_override = self.get_task_override(resource_config, task_instance.task_name,
+                                                       task_instance.options)
+            runtime_configs.append(RunTimeConfig(
+                task_name=task_definition.task_name,
+                task_entry=task_definition.task_entry,
+                pipeline_override=pipeline_override,
+                retry=task_definition.retry
+            ))
+
+        return RunTimeConfigs(
+            task_list=runtime_configs,
+            resource_path=resource_path,
+            resource_name=resource_config.resource_name,
+            resource_version=resource_config.resource_version,
+            resource_pack=selected_pack_config,
+            settings_name=settings.name
+        )
+
+
+# 创建全局实例
+run_plan_compiler = RunPlanCompiler()
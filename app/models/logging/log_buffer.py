@@ -0,0 +1,253 @@
+# -*- coding: UTF-8 -*-
+"""
+列式日志环形缓冲区
+当前会话的界面日志保存在一组定长的列中，而不是每条日志一个对象:
+    时间戳   array('d')    浮点秒
+    级别     bytearray     级别名称的编号
+    设备     array('H')    设备名称的编号，0 为应用日志
+    消息     list          消息字符串表
+每条日志分配一个递增的序号，序号对容量取模即为所在的槽位，容量写满后覆盖最旧的日志。
+追加为 O(1)；界面按序号引用日志，需要显示时才生成 LogRecord，多个界面共享同一份数据。
+"""
+
+import logging
+import threading
+from array import array
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+APP_DEVICE_ID = 0
+ALL_DEVICES = "all"
+
+_DEFAULT_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+
+@dataclass
+class LogRecord:
+    """日志记录数据类，用于界面显示与信号传递；缓冲区中的日志在读取时生成"""
+    timestamp: datetime
+    level: str
+    message: str
+    device_name: Optional[str] = None  # None表示app日志
+    seq: int = -1  # 在缓冲区中的序号，未写入缓冲区时为 -1
+
+    def to_formatted_string(self) -> str:
+        """转换为格式化的日志字符串"""
+        time_str = self.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        return f"{time_str} - {self.level} - {self.message}"
+
+    def to_display_string(self) -> str:
+        """转换为用于UI显示的简化字符串（仅时间和消息）"""
+        time_str = self.timestamp.strftime('%H:%M:%S')
+        return f"{time_str} {self.message}"
+
+
+class LogBuffer:
+    """
+    内存日志缓冲区
+    所有来源共用一个容量，写入可以来自任意线程；读取接口返回序号或按需生成的 LogRecord。
+    """
+
+    def __init__(self, capacity: int = 100_000):
+        self.capacity = capacity
+        self._times = array('d', [0.0]) * capacity
+        self._levels = bytearray(capacity)
+        self._devices = array('H', [APP_DEVICE_ID]) * capacity
+        self._messages: List[Optional[str]] = [None] * capacity
+
+        self._level_names: List[str] = list(_DEFAULT_LEVELS)
+        self._level_values: List[int] = [logging.getLevelName(name) for name in _DEFAULT_LEVELS]
+        self._level_codes: Dict[str, int] = {name: code for code, name in enumerate(self._level_names)}
+
+        self._device_names: List[Optional[str]] = [None]
+        self._device_ids: Dict[Optional[str], int] = {None: APP_DEVICE_ID}
+
+        self._next_seq = 0
+        self._cleared_seq = 0  # 小于该序号的日志已被 clear() 清除
+        self._device_cleared: Dict[int, int] = {}  # 设备编号 -> clear_device() 时的序号
+        self._lock = threading.Lock()
+
+    # === 写入 ===
+
+    def append(self, timestamp: float, level: str, message: str, device_name: Optional[str] = None) -> int:
+        """追加一条日志，返回序号"""
+        with self._lock:
+            level_code = self._level_codes.get(level)
+            if level_code is None:
+                level_code = self._intern_level(level)
+            device_id = self._device_ids.get(device_name)
+            if device_id is None:
+                device_id = self._intern_device(device_name)
+            seq = self._next_seq
+            slot = seq % self.capacity
+            self._times[slot] = timestamp
+            self._levels[slot] = level_code
+            self._devices[slot] = device_id
+            self._messages[slot] = message
+            self._next_seq = seq + 1
+            return seq
+
+    def append_record(self, record: LogRecord) -> int:
+        record.seq = self.append(record.timestamp.timestamp(), record.level, record.message, record.device_name)
+        return record.seq
+
+    def add_app_log(self, record: LogRecord) -> None:
+        """添加应用程序日志"""
+        record.device_name = None
+        self.append_record(record)
+
+    def add_device_log(self, device_name: str, record: LogRecord) -> None:
+        """添加设备日志"""
+        record.device_name = device_name
+        self.append_record(record)
+
+    def _intern_level(self, level: str) -> int:
+        if len(self._level_names) >= 256:
+            return self._level_codes['INFO']
+        value = logging.getLevelName(level)
+        self._level_codes[level] = code = len(self._level_names)
+        self._level_names.append(level)
+        self._level_values.append(value if isinstance(value, int) else logging.INFO)
+        return code
+
+    def _intern_device(self, device_name: str) -> int:
+        self._device_ids[device_name] = device_id = len(self._device_names)
+        self._device_names.append(device_name)
+        return device_id
+
+    # === 序号 ===
+
+    @property
+    def next_seq(self) -> int:
+        return self._next_seq
+
+    @property
+    def first_seq(self) -> int:
+        """仍保存在缓冲区中的最小序号"""
+        return max(self._next_seq - self.capacity, self._cleared_seq)
+
+    def __len__(self) -> int:
+        return self._next_seq - self.first_seq
+
+    def is_live(self, seq: int) -> bool:
+        if not self.first_seq <= seq < self._next_seq:
+            return False
+        cleared = self._device_cleared.get(self._devices[seq % self.capacity])
+        return cleared is None or seq >= cleared
+
+    # === 读取 ===
+
+    def record(self, seq: int) -> Optional[LogRecord]:
+        """生成指定序号的 LogRecord，日志已被覆盖或清除时返回 None"""
+        slot = seq % self.capacity
+        record = LogRecord(
+            timestamp=datetime.fromtimestamp(self._times[slot]),
+            level=self._level_names[self._levels[slot]],
+            message=self._messages[slot],
+            device_name=self._device_names[self._devices[slot]],
+            seq=seq,
+        )
+        # 读取期间槽位可能被写入线程覆盖，读取后再确认一次
+        return record if self.is_live(seq) else None
+
+    def records(self, seqs) -> List[LogRecord]:
+        result = []
+        for seq in seqs:
+            record = self.record(seq)
+            if record is not None:
+                result.append(record)
+        return result
+
+    def level_value(self, seq: int) -> int:
+        return self._level_values[self._levels[seq % self.capacity]]
+
+    def device_name(self, seq: int) -> Optional[str]:
+        return self._device_names[self._devices[seq % self.capacity]]
+
+    def select(self, device: Optional[str] = ALL_DEVICES, min_level: int = logging.NOTSET,
+               start: Optional[int] = None, limit: Optional[int] = None) -> array:
+        """
+        按条件筛选日志序号（按写入顺序）。
+        device 为 ALL_DEVICES 时包括应用与全部设备日志，为 None 时只有应用日志；
+        start 为起始序号，limit 只保留最新的 limit 条。
+        """
+        return self.select_snapshot(device, min_level, start, limit)[0]
+
+    def select_snapshot(self, device: Optional[str] = ALL_DEVICES, min_level: int = logging.NOTSET,
+                        start: Optional[int] = None, limit: Optional[int] = None) -> Tuple[array, int]:
+        """与 select 相同，另外返回筛选时的 next_seq：更小的序号都已包含在筛选范围内"""
+        with self._lock:
+            first = self.first_seq if start is None else max(start, self.first_seq)
+            stop = self._next_seq
+            if device == ALL_DEVICES:
+                device_id = None
+            else:
+                device_id = self._device_ids.get(device)
+                if device_id is None:
+                    return array('q'), stop
+            level_ok = bytes(value >= min_level for value in self._level_values)
+            cleared = self._device_cleared
+            result = array('q')
+            # 环形区间最多分为两段连续槽位，逐段切片后筛选，避免逐条取模
+            for seq_start, seq_stop in self._segments(first, stop):
+                slot_start = seq_start % self.capacity
+                slot_stop = slot_start + (seq_stop - seq_start)
+                levels = self._levels[slot_start:slot_stop]
+                devices = self._devices[slot_start:slot_stop]
+                if device_id is None:
+                    result.extend(seq_start + i for i, level in enumerate(levels) if level_ok[level])
+                else:
+                    result.extend(seq_start + i for i, (level, dev) in enumerate(zip(levels, devices))
+                                  if dev == device_id and level_ok[level])
+            if cleared:
+                result = array('q', (seq for seq in result
+                                     if seq >= cleared.get(self._devices[seq % self.capacity], 0)))
+        if limit is not None and len(result) > limit:
+            result = result[-limit:]
+        return result, stop
+
+    def _segments(self, first: int, stop: int):
+        """把序号区间 [first, stop) 按槽位是否回绕拆分为连续的区间"""
+        if first >= stop:
+            return []
+        wrap = (first // self.capacity + 1) * self.capacity
+        if stop <= wrap:
+            return [(first, stop)]
+        return [(first, wrap), (wrap, stop)]
+
+    def matches(self, seq: int, device: Optional[str] = ALL_DEVICES, min_level: int = logging.NOTSET) -> bool:
+        """指定序号的日志是否满足与 select 相同的条件"""
+        if not self.is_live(seq):
+            return False
+        slot = seq % self.capacity
+        if self._level_values[self._levels[slot]] < min_level:
+            return False
+        return device == ALL_DEVICES or self._device_names[self._devices[slot]] == device
+
+    # === 兼容接口 ===
+
+    def get_app_logs(self) -> List[LogRecord]:
+        """获取所有应用程序日志"""
+        return self.records(self.select(device=None))
+
+    def get_device_logs(self, device_name: str) -> List[LogRecord]:
+        """获取指定设备的所有日志"""
+        return self.records(self.select(device=device_name))
+
+    def get_all_logs(self) -> List[LogRecord]:
+        """获取所有日志（app + 所有设备），按写入顺序"""
+        return self.records(self.select())
+
+    def clear(self) -> None:
+        """清空所有日志"""
+        with self._lock:
+            self._cleared_seq = self._next_seq
+            self._device_cleared.clear()
+
+    def clear_device(self, device_name: str) -> None:
+        """清空指定设备的日志"""
+        with self._lock:
+            device_id = self._device_ids.get(device_name)
+            if device_id is not None:
+                self._device_cleared[device_id] = self._next_seq
@@ -0,0 +1,102 @@
+# -*- coding: UTF-8 -*-
+"""
+日志上下文与结构化日志
+- 设备上下文: 任务执行器在任务各阶段登记 task_id、资源、子任务与生命周期阶段，
+  记录提交给路由器时按设备取一份不可变的快照挂在记录上，maa 回调线程与调度线程中的日志同样带有上下文。
+- NDJSON: 路由线程把带上下文的记录格式化为一行 JSON，字段固定，便于日志聚合与分析脚本直接读取。
+"""
+
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+CONTEXT_FIELDS = ('task_id', 'resource', 'sub_task', 'stage')
+STRUCTURED_SUFFIX = ".ndjson"
+
+_EMPTY: Dict[str, Any] = {}
+
+
+class DeviceLogContext:
+    """
+    按设备保存的日志上下文
+    每次修改都生成新的字典替换旧的，读取方拿到的快照不会再被修改，读取时不需要加锁。
+    """
+
+    def __init__(self):
+        self._contexts: Dict[Optional[str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def bind(self, device_name: Optional[str], **fields):
+        """更新设备的上下文字段，值为 None 时删除该字段"""
+        unknown = set(fields) - set(CONTEXT_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的日志上下文字段: {', '.join(sorted(unknown))}")
+        with self._lock:
+            context = dict(self._contexts.get(device_name, _EMPTY))
+            for key, value in fields.items():
+                if value is None:
+                    context.pop(key, None)
+                else:
+                    context[key] = value
+            if context:
+                self._contexts[device_name] = context
+            else:
+                self._contexts.pop(device_name, None)
+
+    def clear(self, device_name: Optional[str]):
+        """清除设备的全部上下文字段"""
+        with self._lock:
+            self._contexts.pop(device_name, None)
+
+    def get(self, device_name: Optional[str]) -> Dict[str, Any]:
+        """返回设备当前上下文的快照，调用方不应修改"""
+        return self._contexts.get(device_name, _EMPTY)
+
+    @contextmanager
+    def scope(self, device_name: Optional[str], **fields):
+        """在 with 块内设置上下文字段，退出时恢复原来的值"""
+        previous = self.get(device_name)
+        self.bind(device_name, **fields)
+        try:
+            yield
+        finally:
+            self.bind(device_name, **{key: previous.get(key) for key in fields})
+
+
+def attach_context(record: logging.LogRecord, device_name: Optional[str], context: Dict[str, Any]):
+    """在提交日志的线程中把设备、上下文快照与单调时钟写入记录"""
+    record.device_name = device_name
+    record.log_context = context
+    record.task_id = context.get('task_id')
+    record.monotonic = time.monotonic()
+
+
+class NdjsonFormatter(logging.Formatter):
+    """把日志记录格式化为一行 JSON（UTF-8，不转义中文）"""
+
+    def __init__(self, session_id: str = ""):
+        super().__init__()
+        self.session_id = session_id
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 6),
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f".{int(record.msecs):03d}",
+            'mono': round(getattr(record, 'monotonic', 0.0), 6),
+            'level': record.levelname,
+            'logger': record.name,
+            'device': getattr(record, 'device_name', None),
+            'session': self.session_id,
+        }
+        context = getattr(record, 'log_context', _EMPTY)
+        for key in CONTEXT_FIELDS:
+            entry[key] = context.get(key)
+        entry['msg'] = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=str)
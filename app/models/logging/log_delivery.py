@@ -0,0 +1,172 @@
+# -*- coding: UTF-8 -*-
+"""
+日志投递中心
+- 日志处理器在产生日志的线程中只把记录放入 deque，不发 Qt 信号；
+  每个投递周期只向 GUI 线程发送一次唤醒事件，跨线程事件数量与日志量无关。
+- GUI 线程按固定间隔（约一帧）排空积压的记录，按订阅方的过滤条件（设备、最低级别）挑选，
+  每个订阅方每个周期只收到一次携带记录列表的信号，不需要的记录不会投递。
+- 单个周期超过订阅方上限的记录只投递最新的部分，并告知省略的条数。
+- 旧的逐条信号（*_log_added / *_log_updated）只在有连接时才在投递周期中发出。
+"""
+
+import logging
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from app.models.logging.qt_compat import QObject, Signal, QT_AVAILABLE, has_receivers
+
+if QT_AVAILABLE:
+    from PySide6.QtCore import QTimer, Qt
+
+_LEVELS: Dict[str, int] = {
+    'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING,
+    'ERROR': logging.ERROR, 'CRITICAL': logging.CRITICAL,
+}
+
+
+def level_value(level_name: str) -> int:
+    return _LEVELS.get(level_name, logging.INFO)
+
+
+class LogSubscription(QObject):
+    """
+    日志订阅。
+    device 为 None 表示所有设备与应用日志，为设备名时只接收该设备的日志；
+    include_app 为 False 时不接收应用日志（device 为 None 时生效）。
+    """
+
+    records_ready = Signal(list, int)  # 本周期匹配的记录, 因超过上限省略的条数
+
+    def __init__(self, device: Optional[str] = None, min_level: int = logging.INFO, include_app: bool = True,
+                 max_batch: int = 500, parent=None):
+        super().__init__(parent)
+        self.device = device
+        self.min_level = min_level
+        self.include_app = include_app
+        self.max_batch = max_batch
+        self.active = True
+
+    def set_filter(self, device: Optional[str] = None, min_level: Optional[int] = None):
+        self.device = device
+        if min_level is not None:
+            self.min_level = min_level
+
+    def accepts(self, record) -> bool:
+        if level_value(record.level) < self.min_level:
+            return False
+        if self.device is None:
+            return self.include_app or record.device_name is not None
+        return record.device_name == self.device
+
+
+class LogDeliveryHub(QObject):
+    """按投递周期合并日志记录并分发给订阅方，所有信号都在 GUI 线程中发出"""
+
+    INTERVAL_MS = 16  # 投递周期，约一帧
+    MAX_PENDING = 20000  # 积压上限，GUI 线程长时间阻塞时丢弃最旧的记录
+
+    _wake = Signal()
+
+    def __init__(self, log_manager):
+        super().__init__()
+        self.log_manager = log_manager
+        self._pending: Deque = deque(maxlen=self.MAX_PENDING)
+        self._scheduled = False
+        self._timer = None
+        self._subscriptions: List[LogSubscription] = []
+        self.stats = {'published': 0, 'batches': 0, 'delivered': 0}
+        if QT_AVAILABLE:
+            # 跨线程唤醒：排队到 hub 所在的 GUI 线程执行
+            self._wake.connect(self._start_timer, Qt.QueuedConnection)
+
+    # === 订阅 ===
+
+    def subscribe(self, device: Optional[str] = None, min_level: int = logging.INFO, include_app: bool = True,
+                  max_batch: int = 500, parent=None) -> LogSubscription:
+        """创建订阅，parent 销毁时订阅随之失效"""
+        subscription = LogSubscription(device, min_level, include_app, max_batch, parent)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LogSubscription):
+        subscription.active = False
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    # === 发布（任意线程） ===
+
+    def publish(self, record):
+        self._pending.append(record)  # deque.append 线程安全
+        self.stats['published'] += 1
+        if self._scheduled:
+            return
+        self._scheduled = True
+        if QT_AVAILABLE:
+            self._wake.emit()
+        else:
+            self.deliver()
+
+    # === 投递（GUI 线程） ===
+
+    def _start_timer(self):
+        if self._timer is None:
+            self._timer = QTimer(self)
+            self._timer.setSingleShot(True)
+            self._timer.timeout.connect(self.deliver)
+        if not self._timer.isActive():
+            self._timer.start(self.INTERVAL_MS)
+
+    def deliver(self):
+        """排空积压的记录并分发，返回本周期的记录数"""
+        # 先清除标记再排空：清除后到达的记录会重新唤醒，不会滞留
+        self._scheduled = False
+        pending = self._pending
+        records = []
+        while True:
+            try:
+                records.append(pending.popleft())
+            except IndexError:
+                break
+        if not records:
+            return 0
+        self.stats['batches'] += 1
+
+        for subscription in list(self._subscriptions):
+            if not subscription.active:
+                continue
+            matched = [record for record in records if subscription.accepts(record)]
+            if not matched:
+                continue
+            omitted = 0
+            if len(matched) > subscription.max_batch:
+                omitted = len(matched) - subscription.max_batch
+                matched = matched[-subscription.max_batch:]
+            try:
+                subscription.records_ready.emit(matched, omitted)
+                self.stats['delivered'] += len(matched)
+            except RuntimeError:
+                # 订阅方已被 Qt 销毁
+                self.unsubscribe(subscription)
+
+        self._emit_legacy(records)
+        return len(records)
+
+    def _emit_legacy(self, records: list):
+        """旧信号只在有连接时发出：*_log_added 逐条，*_log_updated 每个周期每个来源一次"""
+        manager = self.log_manager
+        app_added = has_receivers(manager, 'app_log_added')
+        device_added = has_receivers(manager, 'device_log_added')
+        if app_added or device_added:
+            for record in records:
+                if record.device_name is None:
+                    if app_added:
+                        manager.app_log_added.emit(record)
+                elif device_added:
+                    manager.device_log_added.emit(record.device_name, record)
+
+        if has_receivers(manager, 'app_log_updated'):
+            if any(record.device_name is None for record in records):
+                manager.app_log_updated.emit()
+        if has_receivers(manager, 'device_log_updated'):
+            for device_name in dict.fromkeys(r.device_name for r in records if r.device_name is not None):
+                manager.device_log_updated.emit(device_name)
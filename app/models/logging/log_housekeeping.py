@@ -0,0 +1,238 @@
+# -*- coding: UTF-8 -*-
+"""
+日志归档与保留
+- 轮转: 日志路由线程在刷新文件后检查大小与日期，超过上限或跨天时关闭并重命名为 *.rotated，
+  下一条日志写入新文件；重命名是路由线程中唯一的文件操作。
+- 压缩: 整理线程把 *.rotated 压缩为 backup/<名称>-<时间>.log.gz（结构化日志为 .ndjson.gz）后删除原文件。
+- 保留: 每次压缩后以及加载配置后，按存档的时间与总大小删除最旧的存档；
+  用户的保留策略设置之前只压缩、不删除存档。
+启动时不做任何同步的整理工作，上次退出时未压缩的 *.rotated 文件由整理线程补做。
+"""
+
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from queue import SimpleQueue, Empty
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROTATED_SUFFIX = ".rotated"
+ARCHIVE_SUFFIXES = (".log.gz", ".ndjson.gz", ".zip")  # .zip 为旧版本启动时打包的存档
+_LOG_EXTENSIONS = (".log", ".ndjson")
+
+_SWEEP = object()
+_FLUSH = object()
+
+
+@dataclass
+class LogRetentionPolicy:
+    """日志轮转与保留策略，0 表示不限制"""
+    max_file_mb: int = 10  # 单个日志文件超过该大小时轮转
+    rotate_daily: bool = True  # 跨天时轮转
+    retention_days: int = 30  # 存档最长保留天数
+    retention_total_mb: int = 200  # 存档总大小上限
+
+    @property
+    def max_file_bytes(self) -> int:
+        return max(0, int(self.max_file_mb)) * 1024 * 1024
+
+    @property
+    def retention_total_bytes(self) -> int:
+        return max(0, int(self.retention_total_mb)) * 1024 * 1024
+
+
+def sanitize_file_name(filename: str) -> str:
+    """清理文件名，确保其对文件系统有效"""
+    invalid_chars = ['<', '>', ':', '"', '/', '\\', '|', '?', '*', '\r', '\n']
+    sanitized = filename
+    for char in invalid_chars:
+        sanitized = sanitized.replace(char, '_')
+    return sanitized.strip().strip('.') or "unnamed_device.log"
+
+
+def rotated_name(path: str) -> str:
+    """轮转后的临时文件名：<原文件名>.<时间>.rotated，同一秒内重复轮转时追加序号"""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    candidate = f"{path}.{stamp}{ROTATED_SUFFIX}"
+    n = 1
+    while os.path.exists(candidate):
+        n += 1
+        candidate = f"{path}.{stamp}-{n}{ROTATED_SUFFIX}"
+    return candidate
+
+
+def archive_name(rotated_path: str) -> str:
+    """app.log.20240101_120000.rotated -> app-20240101_120000.log.gz，.ndjson 文件保留原扩展名"""
+    name = os.path.basename(rotated_path)[:-len(ROTATED_SUFFIX)]
+    base, _, stamp = name.rpartition('.')
+    extension = ".log"
+    for candidate in _LOG_EXTENSIONS:
+        if base.endswith(candidate):
+            base, extension = base[:-len(candidate)], candidate
+            break
+    return f"{base}-{stamp}{extension}.gz"
+
+
+class LogHousekeeper:
+    """日志整理线程：压缩轮转下来的文件并执行保留策略，队列为空时线程退出，需要时再启动"""
+
+    def __init__(self, log_dir: str, backup_dir: str, policy: Optional[LogRetentionPolicy] = None):
+        self.log_dir = log_dir
+        self.backup_dir = backup_dir
+        self.policy = policy or LogRetentionPolicy()
+        # 配置加载前使用的是默认策略，不能据此删除用户的存档
+        self._retention_ready = policy is not None
+        self._queue: SimpleQueue = SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._sweep_hooks: List[Callable[[], None]] = []
+        self.stats = {'compressed': 0, 'removed': 0, 'errors': 0}
+
+    # === 任意线程 ===
+
+    def compress(self, rotated_path: str):
+        """压缩轮转下来的文件，由日志路由线程在重命名后调用"""
+        self._submit(rotated_path)
+        self._submit(_SWEEP)
+
+    def sweep(self):
+        """补做未完成的压缩，已设置保留策略时一并执行保留策略"""
+        self._submit(_SWEEP)
+
+    def configure(self, policy: LogRetentionPolicy):
+        """设置保留策略（加载配置后调用），并在后台整理一次"""
+        self.policy = policy
+        self._retention_ready = True
+        self.sweep()
+
+    def add_sweep_hook(self, hook: Callable[[], None]):
+        """在整理线程中执行保留策略之后调用，用于日志索引等附加数据的清理"""
+        self._sweep_hooks.append(hook)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """等待已提交的整理工作完成"""
+        event = threading.Event()
+        self._submit((_FLUSH, event))
+        return event.wait(timeout)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+    def _submit(self, item):
+        self._queue.put(item)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="LogHousekeeper", daemon=True)
+                self._thread.start()
+
+    # === 整理线程 ===
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=1.0)
+            except Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+            try:
+                if item is _SWEEP:
+                    self._sweep()
+                elif isinstance(item, tuple) and item[0] is _FLUSH:
+                    item[1].set()
+                else:
+                    self._compress(item)
+            except Exception:
+                self.stats['errors'] += 1
+
+    def _compress(self, rotated_path: str):
+        if not os.path.exists(rotated_path):
+            return
+        os.makedirs(self.backup_dir, exist_ok=True)
+        name = archive_name(rotated_path)
+        target = os.path.join(self.backup_dir, name)
+        n = 1
+        while os.path.exists(target):
+            # 同一秒内多次轮转，前一个存档已经写入
+            n += 1
+            stem, extension = name[:-3].rsplit('.', 1)
+            target = os.path.join(self.backup_dir, f"{stem}-{n}.{extension}.gz")
+        fd, tmp_path = tempfile.mkstemp(prefix='.archive.', suffix='.tmp', dir=self.backup_dir)
+        try:
+            with open(rotated_path, 'rb') as src, os.fdopen(fd, 'wb') as raw, \
+                    gzip.GzipFile(filename=os.path.basename(target)[:-3], mode='wb', fileobj=raw) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(tmp_path, target)
+            tmp_path = None
+        finally:
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        os.remove(rotated_path)
+        self.stats['compressed'] += 1
+
+    def _sweep(self):
+        # 上次退出前没有压缩的轮转文件
+        if os.path.isdir(self.log_dir):
+            for name in os.listdir(self.log_dir):
+                if name.endswith(ROTATED_SUFFIX):
+                    try:
+                        self._compress(os.path.join(self.log_dir, name))
+                    except OSError:
+                        self.stats['errors'] += 1
+        if self._retention_ready:
+            self._apply_retention()
+            for hook in self._sweep_hooks:
+                try:
+                    hook()
+                except Exception:
+                    self.stats['errors'] += 1
+
+    def _archives(self) -> List[Tuple[float, int, str]]:
+        archives = []
+        if not os.path.isdir(self.backup_dir):
+            return archives
+        for entry in os.scandir(self.backup_dir):
+            if entry.is_file() and entry.name.endswith(ARCHIVE_SUFFIXES):
+                stat = entry.stat()
+                archives.append((stat.st_mtime, stat.st_size, entry.path))
+        archives.sort()
+        return archives
+
+    def _apply_retention(self):
+        policy = self.policy
+        archives = self._archives()
+        keep = []
+        if policy.retention_days > 0:
+            cutoff = time.time() - policy.retention_days * 86400
+            for archive in archives:
+                if archive[0] < cutoff:
+                    self._remove(archive[2])
+                else:
+                    keep.append(archive)
+        else:
+            keep = archives
+
+        limit = policy.retention_total_bytes
+        if limit > 0:
+            total = sum(size for _, size, _ in keep)
+            for _, size, path in keep:  # 从最旧的开始删除
+                if total <= limit:
+                    break
+                self._remove(path)
+                total -= size
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+            self.stats['removed'] += 1
+        except OSError:
+            self.stats['errors'] += 1
@@ -0,0 +1,480 @@
+# -*- coding: UTF-8 -*-
+"""
+日志全文索引
+日志保存在 SQLite 数据库中（FTS5 trigram 分词，支持中文子串检索），按时间、设备、级别与任务 ID 过滤。
+- 增量索引: 日志路由线程把每条记录交给索引（只入队），索引线程每隔片刻批量写入一次。
+- 延迟索引: 本次会话之前的日志（logs/*.log 与 backup 中的 .log.gz / .zip 存档）在第一次查询时
+  流式读取并写入索引，之后只处理新增或变化的文件；文件内容不会整体读入内存。
+- 去重: coverage 表记录每个设备已经索引过的时间段（本次会话由路由线程覆盖），
+  读取文件时跳过落在这些时间段内的行，同一条日志不会因为轮转或重复扫描被索引两次；
+  回填当前日志文件前先等待索引线程写完已入队的记录。
+- 设备名: 日志文件名经过清理（例如 ':' 替换为 '_'），索引线程写入记录时在 devices 表中记下
+  文件名对应的真实设备名，回填文件时据此还原；查询时同时匹配清理后的名称，覆盖尚未记录的旧存档。
+- 清理: 索引按存档的保留天数与总大小上限删除最旧的记录，在日志整理、索引线程定期写入后以及回填时执行；
+  删除的页面由 SQLite 复用，数据库文件不再增长。
+"""
+
+import gzip
+import io
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import zipfile
+from contextlib import closing
+from dataclasses import dataclass
+from datetime import datetime
+from queue import SimpleQueue, Empty
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.models.logging.log_housekeeping import sanitize_file_name
+
+SCHEMA_VERSION = 2
+APP_DEVICE = ""  # 应用日志在索引中的设备名
+ALL_DEVICES = "all"
+
+_LINE = re.compile(r'^(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2}) - ([A-Z]+) - (.*)$')
+_ARCHIVE_STAMP = re.compile(r'-\d{8}_\d{6}(?:-\d+)?$')
+_FLUSH = object()
+_LEVELS = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING,
+           'ERROR': logging.ERROR, 'CRITICAL': logging.CRITICAL}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    device TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    task_id TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_entries_device_ts ON entries(device, ts);
+CREATE INDEX IF NOT EXISTS ix_entries_ts ON entries(ts);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5(message, tokenize='trigram');
+CREATE TABLE IF NOT EXISTS sources (
+    name TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS devices (
+    file_device TEXT PRIMARY KEY,
+    device TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS coverage (
+    id INTEGER PRIMARY KEY,
+    device TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    end_ts REAL NOT NULL
+);
+"""
+
+
+@dataclass
+class LogSearchHit:
+    """一条检索结果"""
+    timestamp: float
+    device_name: Optional[str]  # None 表示应用日志
+    level: str
+    message: str
+    task_id: Optional[str] = None
+
+    def to_display_string(self) -> str:
+        time_str = datetime.fromtimestamp(self.timestamp).strftime('%m-%d %H:%M:%S')
+        source = self.device_name or "应用"
+        return f"{time_str} [{source}] {self.level} {self.message}"
+
+
+def device_from_file_name(file_name: str) -> str:
+    """由日志文件名得到设备名：app.log 为应用日志，存档去掉时间后缀"""
+    name = os.path.basename(file_name)
+    for suffix in ('.log.gz', '.log'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+            break
+    name = _ARCHIVE_STAMP.sub('', name)
+    return APP_DEVICE if name == "app" else name
+
+
+def file_device_name(device_name: str) -> str:
+    """设备名对应的日志文件名（去掉扩展名），与 LogManager 创建日志文件时的清理规则一致"""
+    if device_name == APP_DEVICE:
+        return APP_DEVICE
+    return device_from_file_name(sanitize_file_name(f"{device_name}.log"))
+
+
+def parse_lines(lines: Iterable[str]) -> Iterator[Tuple[float, int, str]]:
+    """解析日志文件的行，产出 (时间戳, 级别, 消息)；不以时间开头的行并入上一条消息（例如异常堆栈）"""
+    stamps: Dict[str, float] = {}
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        match = _LINE.match(line)
+        if match is None:
+            if current is not None and line:
+                current[2] = f"{current[2]}\n{line}"
+            continue
+        if current is not None:
+            yield current[0], current[1], current[2]
+        prefix = line[:19]
+        ts = stamps.get(prefix)
+        if ts is None:
+            if len(stamps) > 4096:
+                stamps.clear()
+            y, mo, d, h, mi, s = (int(g) for g in match.groups()[:6])
+            ts = stamps[prefix] = time.mktime((y, mo, d, h, mi, s, 0, 0, -1))
+        current = [ts, _LEVELS.get(match.group(7), logging.INFO), match.group(8)]
+    if current is not None:
+        yield current[0], current[1], current[2]
+
+
+class LogIndex:
+    """日志全文索引，写入在索引线程中进行，查询可以在任意线程调用"""
+
+    BATCH_SECONDS = 0.5
+    FILE_BATCH = 5000
+    PRUNE_INTERVAL = 600.0  # 索引线程两次清理的最小间隔（秒）
+
+    def __init__(self, db_path: str, log_dir: str, backup_dir: str):
+        self.db_path = db_path
+        self.log_dir = log_dir
+        self.backup_dir = backup_dir
+        self.retention_days = 0  # 超过该天数的索引被删除，0 表示不删除
+        self.max_bytes = 0  # 索引数据超过该大小时删除最旧的记录，0 表示不限制
+        self.session_start = float(int(time.time()))
+        self._queue: SimpleQueue = SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+        self._backfill_lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self._next_prune = 0.0
+        self._local = threading.local()
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+        self._session_coverage_id: Optional[int] = None
+        self._live_done = set()  # 本次会话已回填的当前日志文件，之后的内容由增量索引覆盖
+        self._mapped_devices = set()  # 已写入 devices 表的设备名
+        self.stats = {'indexed': 0, 'backfilled': 0, 'files': 0, 'queries': 0, 'pruned': 0, 'errors': 0}
+
+    # === 增量索引（日志路由线程） ===
+
+    def feed(self, device_name: Optional[str], record: logging.LogRecord):
+        message = record.getMessage()
+        if record.exc_text:
+            message = f"{message}\n{record.exc_text}"
+        self._queue.put((record.created, device_name or APP_DEVICE, record.levelno,
+                         getattr(record, 'task_id', None), message))
+        if self._thread is None:
+            self._start()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """等待此前入队的记录写入数据库"""
+        if self._thread is None:
+            return True
+        event = threading.Event()
+        self._queue.put((_FLUSH, event))
+        return event.wait(timeout)
+
+    def _start(self):
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="LogIndex", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        queue = self._queue
+        while True:
+            items = [queue.get()]
+            deadline = time.monotonic() + self.BATCH_SECONDS
+            while items[-1][0] is not _FLUSH:  # 收到 flush 请求时立即写入
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(queue.get(timeout=remaining))
+                except Empty:
+                    break
+            rows = [item for item in items if item[0] is not _FLUSH]
+            try:
+                if rows:
+                    self._write_session_rows(rows)
+                    if time.monotonic() >= self._next_prune:
+                        self._next_prune = time.monotonic() + self.PRUNE_INTERVAL
+                        self.prune(self._connection())
+            except Exception:
+                self.stats['errors'] += 1
+            for item in items:
+                if item[0] is _FLUSH:
+                    item[1].set()
+
+    def _write_session_rows(self, rows: List[Tuple]):
+        conn = self._connection()
+        with conn:
+            self._insert(conn, rows)
+            self._map_devices(conn, {row[1] for row in rows} - self._mapped_devices)
+            # 本次会话覆盖的时间段随写入延长，延迟索引时跳过这些行
+            end = max(row[0] for row in rows)
+            if self._session_coverage_id is None:
+                cursor = conn.execute("INSERT INTO coverage (device, start_ts, end_ts) VALUES ('*', ?, ?)",
+                                      (self.session_start, end))
+                self._session_coverage_id = cursor.lastrowid
+            else:
+                conn.execute("UPDATE coverage SET end_ts = MAX(end_ts, ?) WHERE id = ?",
+                             (end, self._session_coverage_id))
+        self.stats['indexed'] += len(rows)
+
+    def _map_devices(self, conn: sqlite3.Connection, devices):
+        """记录日志文件名对应的真实设备名，只在文件名经过清理时需要"""
+        for device in devices:
+            file_device = file_device_name(device)
+            if file_device != device:
+                conn.execute("INSERT OR REPLACE INTO devices (file_device, device) VALUES (?, ?)",
+                             (file_device, device))
+            self._mapped_devices.add(device)
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, rows: List[Tuple]):
+        for ts, device, level, task_id, message in rows:
+            cursor = conn.execute("INSERT INTO entries (ts, device, level, task_id) VALUES (?, ?, ?, ?)",
+                                  (ts, device, level, task_id))
+            conn.execute("INSERT INTO entries_fts (rowid, message) VALUES (?, ?)", (cursor.lastrowid, message))
+
+    # === 连接与结构 ===
+
+    def _connection(self) -> sqlite3.Connection:
+        """索引线程的长连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        return conn
+
+    def _open(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._ensure_schema(conn)
+        return conn
+
+    def _ensure_schema(self, conn: sqlite3.Connection):
+        with self._schema_lock:
+            if self._schema_ready:
+                return
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                # 结构变化时丢弃旧索引，下次查询时从文件重新回填
+                for table in ('entries', 'entries_fts', 'sources', 'coverage', 'devices'):
+                    conn.execute(f"DROP TABLE IF EXISTS {table}")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            conn.commit()
+            self._schema_ready = True
+
+    # === 延迟索引 ===
+
+    def backfill(self):
+        """索引本次会话之前的日志文件与存档，已索引且未变化的文件直接跳过"""
+        # 当前日志文件中已写入的行都已入队，写入后会话覆盖的时间段才包括这些行
+        self.flush()
+        with self._backfill_lock, closing(self._open()) as conn:
+            self.prune(conn)
+            devices = dict(conn.execute("SELECT file_device, device FROM devices"))
+            for name, file_device, size, mtime, opener in self._sources():
+                device = devices.get(file_device, file_device)
+                if name in self._live_done:
+                    continue
+                known = conn.execute("SELECT size, mtime FROM sources WHERE name = ?", (name,)).fetchone()
+                if known is not None and known[0] == size and known[1] == mtime:
+                    continue
+                try:
+                    with opener() as stream:
+                        self._index_stream(conn, device, stream)
+                except (OSError, EOFError, zipfile.BadZipFile, UnicodeDecodeError):
+                    self.stats['errors'] += 1
+                    continue
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO sources (name, size, mtime) VALUES (?, ?, ?)",
+                                 (name, size, mtime))
+                self.stats['files'] += 1
+                if name.startswith("live/"):
+                    self._live_done.add(name)
+
+    def _sources(self):
+        """产出 (来源名, 设备, 大小, 修改时间, 打开函数)，打开函数返回文本流"""
+        if os.path.isdir(self.log_dir):
+            for entry in os.scandir(self.log_dir):
+                if entry.is_file() and entry.name.endswith('.log'):
+                    stat = entry.stat()
+                    yield (f"live/{entry.name}", device_from_file_name(entry.name), stat.st_size, stat.st_mtime,
+                           lambda path=entry.path: open(path, 'r', encoding='utf-8', errors='replace'))
+        if not os.path.isdir(self.backup_dir):
+            return
+        for entry in os.scandir(self.backup_dir):
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            if entry.name.endswith('.log.gz'):
+                yield (f"archive/{entry.name}", device_from_file_name(entry.name), stat.st_size, stat.st_mtime,
+                       lambda path=entry.path: gzip.open(path, 'rt', encoding='utf-8', errors='replace'))
+            elif entry.name.endswith('.zip'):
+                try:
+                    with zipfile.ZipFile(entry.path) as archive:
+                        members = [m for m in archive.namelist() if m.endswith('.log')]
+                except (OSError, zipfile.BadZipFile):
+                    self.stats['errors'] += 1
+                    continue
+                for member in members:
+                    yield (f"zip/{entry.name}/{member}", device_from_file_name(member), stat.st_size, stat.st_mtime,
+                           lambda path=entry.path, member=member: _open_zip_member(path, member))
+
+    def _index_stream(self, conn: sqlite3.Connection, device: str, stream):
+        intervals = [tuple(row) for row in conn.execute(
+            "SELECT start_ts, end_ts FROM coverage WHERE device IN (?, '*')", (device,))]
+        first_ts = last_ts = None
+        batch: List[Tuple] = []
+        for ts, level, message in parse_lines(stream):
+            if first_ts is None:
+                first_ts = ts
+            last_ts = ts
+            if any(start <= ts <= end for start, end in intervals):
+                continue
+            batch.append((ts, device, level, None, message))
+            if len(batch) >= self.FILE_BATCH:
+                with conn:
+                    self._insert(conn, batch)
+                self.stats['backfilled'] += len(batch)
+                batch = []
+        with conn:
+            if batch:
+                self._insert(conn, batch)
+                self.stats['backfilled'] += len(batch)
+            if first_ts is not None:
+                conn.execute("INSERT INTO coverage (device, start_ts, end_ts) VALUES (?, ?, ?)",
+                             (device, first_ts, last_ts))
+
+    # === 清理 ===
+
+    def prune(self, conn: Optional[sqlite3.Connection] = None):
+        """按保留天数与大小上限删除最旧的索引记录，可以在任意线程调用"""
+        if self.retention_days <= 0 and self.max_bytes <= 0:
+            return
+        if conn is None:
+            if not os.path.exists(self.db_path):
+                return
+            with closing(self._open()) as conn:
+                self.prune(conn)
+            return
+        with self._prune_lock:
+            if self.retention_days > 0:
+                self._prune(conn, time.time() - self.retention_days * 86400)
+            if self.max_bytes > 0:
+                self._prune_to_size(conn, self.max_bytes)
+
+    def _prune_to_size(self, conn: sqlite3.Connection, max_bytes: int):
+        pragma = lambda name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+        used = (pragma("page_count") - pragma("freelist_count")) * pragma("page_size")
+        if used <= max_bytes:
+            return
+        # 记录大小大致相同，按比例删除最旧的记录，并多删一成以免每次写入后都要清理
+        total = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        drop = int(total * (1 - max_bytes * 0.9 / used))
+        if drop <= 0:
+            return
+        row = conn.execute("SELECT ts FROM entries ORDER BY ts LIMIT 1 OFFSET ?", (drop,)).fetchone()
+        self._prune(conn, row[0] if row else float('inf'))
+        # FTS5 的删除只写入墓碑，合并段后才释放页面，否则下次清理时仍按旧大小计算
+        with conn:
+            conn.execute("INSERT INTO entries_fts (entries_fts) VALUES ('optimize')")
+
+    def _prune(self, conn: sqlite3.Connection, before_ts: float):
+        with conn:
+            conn.execute("DELETE FROM entries_fts WHERE rowid IN (SELECT id FROM entries WHERE ts < ?)", (before_ts,))
+            self.stats['pruned'] += conn.execute("DELETE FROM entries WHERE ts < ?", (before_ts,)).rowcount
+            conn.execute("DELETE FROM coverage WHERE end_ts < ? AND device != '*'", (before_ts,))
+
+    # === 查询 ===
+
+    def search(self, text: str = "", device: Optional[str] = ALL_DEVICES, min_level: int = logging.NOTSET,
+               since: Optional[float] = None, until: Optional[float] = None, task_id: Optional[str] = None,
+               limit: int = 500) -> List[LogSearchHit]:
+        """
+        检索日志，结果按时间倒序。
+        device 为 ALL_DEVICES 时不限设备，为 None 时只检索应用日志；since / until 为时间戳。
+        第一次调用时会先回填本次会话之前的日志，耗时取决于日志量，应在后台线程中调用。
+        """
+        self.backfill()
+        self.stats['queries'] += 1
+
+        conditions = []
+        params: List = []
+        if device != ALL_DEVICES:
+            device = device or APP_DEVICE
+            file_device = file_device_name(device)
+            if file_device != device:
+                # 设备名记录之前回填的存档只有清理后的文件名
+                conditions.append("e.device IN (?, ?)")
+                params.extend((device, file_device))
+            else:
+                conditions.append("e.device = ?")
+                params.append(device)
+        if min_level > logging.NOTSET:
+            conditions.append("e.level >= ?")
+            params.append(min_level)
+        if since is not None:
+            conditions.append("e.ts >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("e.ts <= ?")
+            params.append(until)
+        if task_id:
+            conditions.append("e.task_id = ?")
+            params.append(task_id)
+
+        text = text.strip()
+        join = "entries e JOIN entries_fts f ON f.rowid = e.id"
+        if len(text) >= 3:
+            # trigram 分词按子串匹配，整体作为一个短语；CROSS JOIN 让全文匹配只执行一次，再按主键过滤
+            join = "entries_fts f CROSS JOIN entries e ON e.id = f.rowid"
+            conditions.insert(0, "entries_fts MATCH ?")
+            params.insert(0, '"' + text.replace('"', '""') + '"')
+        elif text:
+            # 不足三个字符时 trigram 无法使用，在过滤后的行中按子串查找；LIKE 与 trigram 一样不区分大小写
+            conditions.append("f.message LIKE ? ESCAPE '\\'")
+            escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f"%{escaped}%")
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = (f"SELECT e.ts, e.device, e.level, e.task_id, f.message "
+               f"FROM {join} {where} "
+               f"ORDER BY e.ts DESC LIMIT ?")
+        params.append(int(limit))
+        with closing(self._open()) as conn:
+            return [LogSearchHit(ts, device_name or None, logging.getLevelName(level), message, task)
+                    for ts, device_name, level, task, message in conn.execute(sql, params)]
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+def _open_zip_member(path: str, member: str):
+    archive = zipfile.ZipFile(path)
+    try:
+        raw = archive.open(member)
+    except Exception:
+        archive.close()
+        raise
+    return _ZipMemberText(archive, raw)
+
+
+class _ZipMemberText(io.TextIOWrapper):
+    """关闭时一并关闭所属的 zip 文件"""
+
+    def __init__(self, archive: zipfile.ZipFile, raw):
+        super().__init__(raw, encoding='utf-8', errors='replace')
+        self._archive = archive
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._archive.close()
@@ -6,154 +6,82 @@
 
 import functools
 import logging
-import logging.handlers
+import multiprocessing
 import os
-import sys
-import zipfile
 import atexit
-from collections import defaultdict, deque
-from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Any, Callable, Optional, Deque
-
-from queue import Queue
-
-# 尝试导入Qt，如果失败则使用纯Python实现
-try:
-    from PySide6.QtCore import QObject, Signal
-    _QT_AVAILABLE = True
-except ImportError:
-    _QT_AVAILABLE = False
-    # 如果Qt不可用，创建一个简单的基类
-    class QObject:
-        def __init__(self):
-            pass
-    
-    class Signal:
-        def __init__(self, *args):
-            self._callbacks = []
-        
-        def connect(self, callback):
-            self._callbacks.append(callback)
-        
-        def disconnect(self, callback):
-            if callback in self._callbacks:
-                self._callbacks.remove(callback)
-        
-        def emit(self, *args, **kwargs):
-            for callback in self._callbacks:
-                try:
-                    callback(*args, **kwargs)
-                except Exception:
-                    pass
-
+from typing import Dict, List, Any, Callable
 
-@dataclass
-class LogRecord:
-    """日志记录数据类，用于内存缓冲和UI显示"""
-    timestamp: datetime
-    level: str
-    message: str
-    device_name: Optional[str] = None  # None表示app日志
-    
-    def to_formatted_string(self) -> str:
-        """转换为格式化的日志字符串"""
-        time_str = self.timestamp.strftime('%Y-%m-%d %H:%M:%S')
-        return f"{time_str} - {self.level} - {self.message}"
-    
-    def to_display_string(self) -> str:
-        """转换为用于UI显示的简化字符串（仅时间和消息）"""
-        time_str = self.timestamp.strftime('%H:%M:%S')
-        return f"{time_str} {self.message}"
-
-
-class LogBuffer:
-    """
-    内存日志缓冲区
-    维护当前会话的日志记录，供UI快速读取
-    """
-    def __init__(self, max_size: int = 2000):
-        self.max_size = max_size
-        self.app_logs: Deque[LogRecord] = deque(maxlen=max_size)
-        self.device_logs: Dict[str, Deque[LogRecord]] = defaultdict(
-            lambda: deque(maxlen=max_size)
-        )
-        self._lock = None  # 可以添加线程锁如果需要
-    
-    def add_app_log(self, record: LogRecord) -> None:
-        """添加应用程序日志"""
-        self.app_logs.append(record)
-    
-    def add_device_log(self, device_name: str, record: LogRecord) -> None:
-        """添加设备日志"""
-        record.device_name = device_name
-        self.device_logs[device_name].append(record)
-    
-    def get_app_logs(self) -> List[LogRecord]:
-        """获取所有应用程序日志"""
-        return list(self.app_logs)
-    
-    def get_device_logs(self, device_name: str) -> List[LogRecord]:
-        """获取指定设备的所有日志"""
-        return list(self.device_logs.get(device_name, []))
-    
-    def get_all_logs(self) -> List[LogRecord]:
-        """获取所有日志（app + 所有设备），按时间排序"""
-        all_records = list(self.app_logs)
-        for device_logs in self.device_logs.values():
-            all_records.extend(device_logs)
-        return sorted(all_records, key=lambda r: r.timestamp)
-    
-    def clear(self) -> None:
-        """清空所有日志"""
-        self.app_logs.clear()
-        self.device_logs.clear()
-    
-    def clear_device(self, device_name: str) -> None:
-        """清空指定设备的日志"""
-        if device_name in self.device_logs:
-            self.device_logs[device_name].clear()
+from app.models.logging.log_buffer import LogBuffer, LogRecord
+from app.models.logging.log_context import DeviceLogContext
+from app.models.logging.log_delivery import LogDeliveryHub
+from app.models.logging.log_housekeeping import LogHousekeeper, LogRetentionPolicy, sanitize_file_name
+from app.models.logging.log_index import LogIndex
+from app.models.logging.log_router import LogRouter, RoutedQueueHandler
+from app.models.logging.qt_compat import QObject, Signal
 
 
 class LogManager(QObject):
     """
     日志管理器 - 重构版
     - 使用内存缓冲区存储当前会话日志
-    - 信号携带LogRecord对象，无节流
-    - 保持文件异步写入
+    - 界面通过 delivery.subscribe() 按投递周期批量接收过滤后的日志记录
+    - 文件与控制台输出由常驻的日志路由线程异步写入
+    - context 保存各设备的任务上下文，写入结构化日志（NDJSON）与日志索引
     """
-    # 新信号：携带日志记录对象
+    # 逐条信号：只在有连接时由投递中心在 GUI 线程中发出（推荐改用 delivery.subscribe）
     app_log_added = Signal(object)          # LogRecord
     device_log_added = Signal(str, object)  # device_name, LogRecord
     
-    # 保留旧信号以保持兼容性（但不再推荐使用）
+    # 保留旧信号以保持兼容性（但不再推荐使用），每个投递周期每个来源最多发出一次
     app_log_updated = Signal()
     device_log_updated = Signal(str)
 
     def __init__(self):
+        if multiprocessing.parent_process() is not None:
+            # 子进程中创建会另起路由线程、写入共享的 app.log 并与主进程同时整理存档
+            raise RuntimeError("日志管理器只能在主进程中创建，工作进程不应导入应用的日志模块")
         super().__init__()
         self.loggers: Dict[str, logging.Logger] = {}
+        self.logger_devices: Dict[str, str] = {}  # logger 名称 -> 设备名称，用于 O(1) 反查
         self.log_dir = "logs"
         self.backup_dir = os.path.join(self.log_dir, "backup")
         self.handle_to_device: Dict[Any, str] = {}
         self.context_to_logger: Dict[Any, logging.Logger] = {}
         
-        # 内存日志缓冲区
-        self.log_buffer = LogBuffer(max_size=2000)
+        # 内存日志缓冲区（列式环形缓冲区，所有来源共用十万条容量）
+        self.log_buffer = LogBuffer(capacity=100_000)
         
-        # 使用队列处理器实现异步日志写入
-        self.log_queue = Queue(maxsize=1000)
-        self.queue_listener: Optional[logging.handlers.QueueListener] = None
-        self.file_handlers: Dict[str, logging.FileHandler] = {}
+        # 所有 logger 共用一个路由线程，按 logger 名称写入各自的文件
+        self.router = LogRouter()
+
+        # 界面日志投递中心：合并日志记录，按订阅方过滤后批量投递
+        self.delivery = LogDeliveryHub(self)
 
         self.session_start_time = datetime.now()
         self.session_start_str = self.session_start_time.strftime("%Y-%m-%d %H:%M:%S")
+        self.session_id = f"{self.session_start_time:%Y%m%d-%H%M%S}-{os.getpid()}"
+
+        # 设备日志上下文：记录提交给路由器时附带当前的 task_id、资源、子任务与阶段
+        self.context = DeviceLogContext()
+        self.router.set_context_provider(self._log_context)
+        self.router.configure_structured(False, self.session_id)
 
+        # 日志轮转与存档在后台进行，启动时只提交整理任务，不等待
+        self.housekeeper = LogHousekeeper(self.log_dir, self.backup_dir)
         self._ensure_directories()
-        self._check_and_backup_logs()
 
-        # 启动队列监听器
-        self._start_queue_listener()
+        # 日志全文索引：路由线程增量写入，本次会话之前的日志在第一次检索时回填
+        self.index = LogIndex(os.path.join(self.log_dir, "index", "log_index.db"), self.log_dir, self.backup_dir)
+        self.router.add_tap(self._index_record)
+        self.housekeeper.add_sweep_hook(self.index.prune)
+        # 保留策略在配置加载后由 configure_housekeeping 设置，这里只补做上次未完成的压缩
+        policy = self.housekeeper.policy
+        self.router.configure_rotation(policy.max_file_bytes, policy.rotate_daily, self.housekeeper.compress)
+        self.housekeeper.sweep()
+
+        # 启动日志路由线程
+        self.router.start()
 
         # 初始化应用日志
         self.initialize_logger("app", "app.log")
@@ -165,68 +93,40 @@ class LogManager(QObject):
         # 注册退出时的清理函数
         atexit.register(self.shutdown)
 
-    def _start_queue_listener(self):
-        """启动队列监听器，负责从队列中取出日志并写入文件"""
-        self.queue_listener = logging.handlers.QueueListener(
-            self.log_queue,
-            respect_handler_level=True
-        )
-        self.queue_listener.start()
-
     def shutdown(self):
         """关闭日志系统，确保所有日志都被写入"""
-        if self.queue_listener:
-            try:
-                self.queue_listener.stop()
-            except Exception:
-                pass
-            self.queue_listener = None
-        
-        # 关闭所有文件处理器
-        for handler in self.file_handlers.values():
-            try:
-                handler.flush()
-                handler.close()
-            except Exception:
-                pass
+        try:
+            self.router.stop()
+        except Exception:
+            pass
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """等待已提交的日志写入文件"""
+        return self.router.flush(timeout)
 
     def _ensure_directories(self):
         """确保日志目录和备份目录存在"""
         os.makedirs(self.log_dir, exist_ok=True)
         os.makedirs(self.backup_dir, exist_ok=True)
 
-    def _check_and_backup_logs(self):
-        """检查日志文件大小，超过阈值则备份"""
-        log_files_to_backup = []
-        total_size = 0
-
-        for filename in os.listdir(self.log_dir):
-            if filename.endswith('.log'):
-                file_path = os.path.join(self.log_dir, filename)
-                log_files_to_backup.append(file_path)
-                total_size += os.path.getsize(file_path)
-
-        if total_size > 1 * 1024 * 1024:  # 如果总大小 > 1MB
-            self._backup_logs(log_files_to_backup)
-            for file_path in log_files_to_backup:
-                open(file_path, 'w', encoding='utf-8').close()
-
-    def _backup_logs(self, log_files):
-        """将日志文件备份到zip压缩包"""
-        if not log_files:
-            return
+    def configure_housekeeping(self, policy: LogRetentionPolicy):
+        """设置日志轮转与存档保留策略，并在后台执行一次整理"""
+        self.index.retention_days = policy.retention_days
+        self.index.max_bytes = policy.retention_total_bytes
+        self.router.configure_rotation(policy.max_file_bytes, policy.rotate_daily, self.housekeeper.compress)
+        self.housekeeper.configure(policy)
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        zip_filename = os.path.join(self.backup_dir, f"logs_backup_{timestamp}.zip")
+    def set_structured_logging(self, enabled: bool):
+        """开启或关闭结构化日志，开启后每个日志文件旁另写一份同名的 .ndjson 文件"""
+        self.router.configure_structured(enabled)
 
-        with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file_path in log_files:
-                if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-                    zipf.write(file_path, os.path.basename(file_path))
+    def _log_context(self, route_key: str):
+        device_name = self.logger_devices.get(route_key)
+        return device_name, self.context.get(device_name)
 
     def initialize_logger(self, name: str, log_file: str) -> logging.Logger:
         """
-        初始化一个logger，使用QueueHandler实现异步日志
+        初始化一个logger，文件与控制台输出交给日志路由线程，新建 logger 时只注册路由
         """
         if name in self.loggers:
             return self.loggers[name]
@@ -242,41 +142,9 @@ class LogManager(QObject):
         sanitized_log_file = self._sanitize_filename(log_file)
         file_path = os.path.join(self.log_dir, sanitized_log_file)
 
-        # 创建文件处理器
-        file_handler = logging.FileHandler(file_path, encoding='utf-8', mode='a')
-        file_handler.setLevel(logging.DEBUG)
-        formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        file_handler.setFormatter(formatter)
-        self.file_handlers[name] = file_handler
-
-        # 创建控制台处理器
-        console_handler = logging.StreamHandler(sys.stdout)
-        console_handler.setLevel(logging.INFO)
-        console_formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s',
-            datefmt='%H:%M:%S'
-        )
-        console_handler.setFormatter(console_formatter)
-
-        # 更新队列监听器
-        if self.queue_listener:
-            self.queue_listener.stop()
-        
-        all_handlers = list(self.file_handlers.values())
-        self.queue_listener = logging.handlers.QueueListener(
-            self.log_queue,
-            *all_handlers,
-            console_handler,
-            respect_handler_level=True
-        )
-        self.queue_listener.start()
-
-        # 为logger添加队列处理器（用于异步文件写入）
-        queue_handler = logging.handlers.QueueHandler(self.log_queue)
-        logger.addHandler(queue_handler)
+        # 注册路由（文件在第一次写入时才打开），并为logger添加路由处理器（用于异步文件与控制台写入）
+        self.router.register(name, file_path)
+        logger.addHandler(RoutedQueueHandler(self.router, name))
 
         # 添加信号处理器（用于UI更新和内存缓冲）
         if name == "app":
@@ -285,6 +153,7 @@ class LogManager(QObject):
             logger.addHandler(signal_handler)
         elif name.startswith("device_"):
             device_name = name[7:]
+            self.logger_devices[name] = device_name
             signal_handler = DeviceLogSignalHandler(device_name, self)
             signal_handler.setLevel(logging.DEBUG)
             logger.addHandler(signal_handler)
@@ -297,11 +166,7 @@ class LogManager(QObject):
 
     def _sanitize_filename(self, filename: str) -> str:
         """清理文件名，确保其对文件系统有效"""
-        invalid_chars = ['<', '>', ':', '"', '/', '\\', '|', '?', '*', '\r', '\n']
-        sanitized = filename
-        for char in invalid_chars:
-            sanitized = sanitized.replace(char, '_')
-        return sanitized.strip().strip('.') or "unnamed_device.log"
+        return sanitize_file_name(filename)
 
     def get_device_logger(self, device_name: str) -> logging.Logger:
         """获取或创建特定设备的logger"""
@@ -309,6 +174,13 @@ class LogManager(QObject):
         log_file = f"{device_name}.log"
         return self.loggers.get(logger_name) or self.initialize_logger(logger_name, log_file)
 
+    def _index_record(self, route_key: str, record: logging.LogRecord):
+        self.index.feed(self.logger_devices.get(route_key), record)
+
+    def get_device_name(self, logger: logging.Logger) -> str:
+        """返回设备 logger 对应的设备名称，非设备 logger 返回 unknown"""
+        return self.logger_devices.get(logger.name, "unknown")
+
     def get_app_logger(self) -> logging.Logger:
         """获取主应用程序logger"""
         return self.loggers.get("app")
@@ -348,11 +220,7 @@ class LogManager(QObject):
                     log_manager = logger.log_manager
                     app_logger = log_manager.get_app_logger()
                     if app_logger and app_logger != logger:
-                        device_name = "unknown"
-                        for name, lg in log_manager.loggers.items():
-                            if lg == logger and name.startswith("device_"):
-                                device_name = name[7:]
-                                break
+                        device_name = log_manager.get_device_name(logger)
                         log_method = getattr(app_logger, level)
                         log_method(f"[{device_name}] {message}")
                 except Exception:
@@ -378,7 +246,7 @@ class LogManager(QObject):
         return self.log_buffer.get_device_logs(device_name)
     
     def get_all_log_records(self) -> List[LogRecord]:
-        """获取所有日志记录，按时间排序"""
+        """获取所有日志记录，按写入顺序"""
         return self.log_buffer.get_all_logs()
 
     # ========== 兼容旧API：返回格式化字符串 ==========
@@ -393,6 +261,11 @@ class LogManager(QObject):
         records = self.log_buffer.get_app_logs()
         return [record.to_formatted_string() for record in records]
     
+    def publish(self, record: LogRecord) -> None:
+        """写入内存缓冲区并交给投递中心，可以在任意线程调用"""
+        self.log_buffer.append_record(record)
+        self.delivery.publish(record)
+
     def add_device_log(self, device_name: str, log_entry: str) -> None:
         """手动添加设备日志条目（兼容旧API）"""
         # 解析日志条目
@@ -418,17 +291,14 @@ class LogManager(QObject):
             message=message,
             device_name=device_name
         )
-        self.log_buffer.add_device_log(device_name, record)
-        self.device_log_added.emit(device_name, record)
-        self.device_log_updated.emit(device_name)
+        self.publish(record)
 
 
 class AppLogSignalHandler(logging.Handler):
     """
     应用日志信号处理器
     - 将日志记录添加到内存缓冲区
-    - 发出携带LogRecord的信号
-    - 无节流限制，保证实时性
+    - 交给投递中心，由 GUI 线程批量投递，处理器本身不发出信号
     """
     def __init__(self, log_manager: LogManager):
         super().__init__()
@@ -444,14 +314,8 @@ class AppLogSignalHandler(logging.Handler):
                 device_name=None
             )
             
-            # 添加到内存缓冲区
-            self.log_manager.log_buffer.add_app_log(log_record)
-            
-            # 发出新信号（携带日志记录）
-            self.log_manager.app_log_added.emit(log_record)
-            
-            # 发出旧信号（兼容性）
-            self.log_manager.app_log_updated.emit()
+            # 添加到内存缓冲区并交给投递中心
+            self.log_manager.publish(log_record)
             
         except Exception:
             # 日志处理器不应抛出异常
@@ -466,8 +330,7 @@ class DeviceLogSignalHandler(logging.Handler):
     """
     设备日志信号处理器
     - 将日志记录添加到设备专属的内存缓冲区
-    - 发出携带LogRecord的信号
-    - 无节流限制，保证实时性
+    - 交给投递中心，由 GUI 线程批量投递，处理器本身不发出信号
     """
     def __init__(self, device_name: str, log_manager: LogManager):
         super().__init__()
@@ -484,14 +347,8 @@ class DeviceLogSignalHandler(logging.Handler):
                 device_name=self.device_name
             )
             
-            # 添加到设备日志缓冲区
-            self.log_manager.log_buffer.add_device_log(self.device_name, log_record)
-            
-            # 发出新信号（携带设备名和日志记录）
-            self.log_manager.device_log_added.emit(self.device_name, log_record)
-            
-            # 发出旧信号（兼容性）
-            self.log_manager.device_log_updated.emit(self.device_name)
+            # 添加到设备日志缓冲区并交给投递中心
+            self.log_manager.publish(log_record)
             
         except Exception:
             # 日志处理器不应抛出异常
@@ -513,11 +370,7 @@ class ContextLogger:
             try:
                 app_logger = log_manager.get_app_logger()
                 if app_logger and app_logger != logger:
-                    device_name = "unknown"
-                    for name, lg in log_manager.loggers.items():
-                        if lg == logger and name.startswith("device_"):
-                            device_name = name[7:]
-                            break
+                    device_name = log_manager.get_device_name(logger)
                     app_log_method = getattr(app_logger, level)
                     app_log_method(f"[{device_name}] {message}")
             except Exception:
@@ -0,0 +1,350 @@
+# -*- coding: UTF-8 -*-
+"""
+日志路由
+- 单个常驻路由线程: 所有 logger 的记录进入同一个无界队列，路由线程按路由键分发到对应的输出端，
+  新建 logger 只需注册路由，不再重启监听器，注册期间的记录不会停滞或丢失。
+- 延迟打开: 文件输出端在第一次写入时打开，打开的文件数量超过上限时按 LRU 关闭最久未写入的文件，
+  再次写入时以追加模式重新打开，数百个设备也只占用有限的文件描述符。
+- 控制台输出端全局只创建一次。
+- 轮转: 刷新文件后以及打开已有文件前检查大小与日期，需要轮转时关闭并重命名，
+  交给 on_rotated 回调（日志整理线程）压缩，路由线程本身不做压缩。
+- 结构化输出: 开启后每个路由键另有一个 NDJSON 文件（与文本日志同名，扩展名为 .ndjson），
+  与文本日志经过同一个队列与路由线程，共用打开文件上限与轮转策略。
+"""
+
+import copy
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from queue import SimpleQueue, Empty
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.models.logging.log_context import STRUCTURED_SUFFIX, NdjsonFormatter, attach_context
+from app.models.logging.log_housekeeping import rotated_name
+
+FILE_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+FILE_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+CONSOLE_DATE_FORMAT = '%H:%M:%S'
+
+_STOP = object()
+_FLUSH = object()
+
+
+class FileSink:
+    """按需打开的日志文件输出端，只在路由线程中使用"""
+
+    __slots__ = ('path', 'stream', 'records', 'period')
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stream = None
+        self.records = 0
+        self.period = ''  # 当前文件开始写入的日期，用于按天轮转
+
+    def open(self):
+        if self.stream is None:
+            try:
+                stat = os.stat(self.path)
+                started = stat.st_mtime if stat.st_size > 0 else time.time()
+            except OSError:
+                started = time.time()
+            self.stream = open(self.path, 'a', encoding='utf-8')
+            self.period = _day(started)
+
+    def size(self) -> int:
+        if self.stream is not None:
+            return os.fstat(self.stream.fileno()).st_size
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def write(self, text: str):
+        self.stream.write(text)
+        self.stream.write('\n')
+        self.records += 1
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+
+    def close(self):
+        if self.stream is not None:
+            try:
+                self.stream.flush()
+                self.stream.close()
+            finally:
+                self.stream = None
+
+
+def _day(timestamp: float) -> str:
+    return time.strftime('%Y-%m-%d', time.localtime(timestamp))
+
+
+class RoutedQueueHandler(logging.Handler):
+    """把记录连同路由键交给路由器，在调用线程中只做消息合并，不做格式化与 IO"""
+
+    def __init__(self, router: 'LogRouter', route_key: str):
+        super().__init__(logging.DEBUG)
+        self.router = router
+        self.route_key = route_key
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.router.submit(self.route_key, record)
+        except Exception:
+            self.handleError(record)
+
+
+class LogRouter:
+    """日志路由器：一个路由线程，按路由键写入各自的文件，并把 INFO 及以上的记录输出到控制台"""
+
+    MAX_OPEN_FILES = 32  # 同时保持打开的日志文件数量上限
+    FLUSH_IDLE_SECONDS = 0.5  # 队列空闲时刷新已写入的文件
+
+    def __init__(self, console_level: int = logging.INFO):
+        self._queue: SimpleQueue = SimpleQueue()
+        self._routes: Dict[str, FileSink] = {}  # 路由键 -> 文件输出端
+        self._structured_routes: Dict[str, FileSink] = {}  # 路由键 -> NDJSON 输出端
+        self._open: "OrderedDict[str, FileSink]" = OrderedDict()  # 已打开的文件（LRU 顺序）
+        self._dirty: Dict[str, FileSink] = {}  # 写入后尚未刷新的文件
+        self._routes_lock = threading.Lock()
+        self._formatter = logging.Formatter(FILE_FORMAT, datefmt=FILE_DATE_FORMAT)
+        self._console = logging.StreamHandler(sys.stdout)
+        self._console.setLevel(console_level)
+        self._console.setFormatter(logging.Formatter(FILE_FORMAT, datefmt=CONSOLE_DATE_FORMAT))
+        self._thread: Optional[threading.Thread] = None
+        self.max_file_bytes = 0  # 0 表示不按大小轮转
+        self.rotate_daily = False
+        self.on_rotated: Optional[Callable[[str], None]] = None
+        self._taps: List[Callable[[str, logging.LogRecord], None]] = []
+        self.structured = False  # 是否同时写入 NDJSON
+        self._structured_formatter = NdjsonFormatter()
+        self.context_provider: Optional[Callable[[str], Tuple[Optional[str], dict]]] = None
+        self.stats = {'records': 0, 'opens': 0, 'evictions': 0, 'rotations': 0, 'errors': 0}
+
+    # === 任意线程 ===
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="LogRouter", daemon=True)
+            self._thread.start()
+
+    def configure_rotation(self, max_file_bytes: int, rotate_daily: bool,
+                           on_rotated: Optional[Callable[[str], None]] = None):
+        """设置轮转条件，on_rotated 在路由线程中以重命名后的路径调用，应尽快返回"""
+        self.max_file_bytes = max(0, int(max_file_bytes))
+        self.rotate_daily = bool(rotate_daily)
+        if on_rotated is not None:
+            self.on_rotated = on_rotated
+
+    def add_tap(self, tap: Callable[[str, logging.LogRecord], None]):
+        """在路由线程中以 (路由键, 记录) 调用，用于日志索引等附加输出，应尽快返回"""
+        self._taps.append(tap)
+
+    def configure_structured(self, enabled: bool, session_id: Optional[str] = None):
+        """开启或关闭 NDJSON 输出，关闭时由路由线程关闭已打开的 NDJSON 文件"""
+        if session_id is not None:
+            self._structured_formatter.session_id = session_id
+        self.structured = bool(enabled)
+        if not self.structured:
+            with self._routes_lock:
+                for sink in self._structured_routes.values():
+                    self._queue.put((_STOP, sink))
+
+    def set_context_provider(self, provider: Callable[[str], Tuple[Optional[str], dict]]):
+        """provider 以路由键调用，返回 (设备名称, 上下文快照)，在提交日志的线程中调用，应尽快返回"""
+        self.context_provider = provider
+
+    def register(self, route_key: str, file_path: str):
+        """注册路由键对应的日志文件，已注册的路由键更新文件路径"""
+        with self._routes_lock:
+            sink = self._routes.get(route_key)
+            if sink is None or sink.path != file_path:
+                self._routes[route_key] = FileSink(file_path)
+                structured = self._structured_routes.get(route_key)
+                self._structured_routes[route_key] = FileSink(os.path.splitext(file_path)[0] + STRUCTURED_SUFFIX)
+                if sink is not None:
+                    self._queue.put((_STOP, sink))  # 由路由线程关闭旧文件
+                if structured is not None:
+                    self._queue.put((_STOP, structured))
+
+    def submit(self, route_key: str, record: logging.LogRecord):
+        # 在调用线程中合并参数，避免参数对象在路由线程格式化前被修改；复制记录，不影响同一 logger 的其它处理器
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self._formatter.formatException(record.exc_info)
+        record.exc_info = None
+        if self.context_provider is not None:
+            device_name, context = self.context_provider(route_key)
+            attach_context(record, device_name, context)
+        self._queue.put((route_key, record))
+
+    def flush(self, timeout: float = 2.0) -> bool:
+        """等待路由线程写完此前提交的记录并刷新文件"""
+        thread = self._thread
+        if thread is None or not thread.is_alive() or thread is threading.current_thread():
+            return False
+        event = threading.Event()
+        self._queue.put((_FLUSH, event))
+        return event.wait(timeout)
+
+    def stop(self, timeout: float = 2.0):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put((_STOP, None))
+            thread.join(timeout)
+        self._thread = None
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'routes': len(self._routes), 'open_files': len(self._open),
+                'structured': self.structured}
+
+    # === 路由线程 ===
+
+    def _run(self):
+        queue = self._queue
+        while True:
+            try:
+                item = queue.get(timeout=self.FLUSH_IDLE_SECONDS)
+            except Empty:
+                self._flush_dirty()
+                continue
+            if not self._handle(item):
+                break
+            # 一次取完已排队的记录，批量写入后统一刷新
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except Empty:
+                    break
+                if not self._handle(item):
+                    self._close_all()
+                    return
+            self._flush_dirty()
+        self._close_all()
+
+    def _handle(self, item: Tuple) -> bool:
+        route_key, payload = item
+        if route_key is _STOP:
+            if payload is None:
+                return False
+            self._close(payload)
+            return True
+        if route_key is _FLUSH:
+            self._flush_dirty()
+            payload.set()
+            return True
+        self._dispatch(route_key, payload)
+        return True
+
+    def _dispatch(self, route_key: str, record: logging.LogRecord):
+        self.stats['records'] += 1
+        sink = self._routes.get(route_key)
+        if sink is not None:
+            try:
+                self._acquire(route_key, sink).write(self._formatter.format(record))
+                self._dirty[route_key] = sink
+            except Exception:
+                self.stats['errors'] += 1
+                self._close(sink)
+        if self.structured:
+            self._write_structured(route_key, record)
+        if record.levelno >= self._console.level:
+            self._console.handle(record)
+        for tap in self._taps:
+            try:
+                tap(route_key, record)
+            except Exception:
+                self.stats['errors'] += 1
+
+    def _write_structured(self, route_key: str, record: logging.LogRecord):
+        sink = self._structured_routes.get(route_key)
+        if sink is None:
+            return
+        key = route_key + "\0" + STRUCTURED_SUFFIX  # 与文本日志共用 LRU 与刷新表
+        try:
+            self._acquire(key, sink).write(self._structured_formatter.format(record))
+            self._dirty[key] = sink
+        except Exception:
+            self.stats['errors'] += 1
+            self._close(sink)
+
+    def _acquire(self, route_key: str, sink: FileSink) -> FileSink:
+        if sink.stream is not None:
+            self._open.move_to_end(route_key)
+            return sink
+        while len(self._open) >= self.MAX_OPEN_FILES:
+            evicted_key, evicted = self._open.popitem(last=False)
+            self._dirty.pop(evicted_key, None)
+            evicted.close()
+            self.stats['evictions'] += 1
+        os.makedirs(os.path.dirname(sink.path) or '.', exist_ok=True)
+        if self._needs_rotation(sink):
+            # 上次会话留下的文件已超过大小或不是今天的日志
+            self._rotate(sink)
+        sink.open()
+        self.stats['opens'] += 1
+        self._open[route_key] = sink
+        return sink
+
+    def _flush_dirty(self):
+        dirty = list(self._dirty.values())
+        self._dirty.clear()
+        for sink in dirty:
+            try:
+                sink.flush()
+                if self._needs_rotation(sink):
+                    self._rotate(sink)
+            except Exception:
+                self.stats['errors'] += 1
+
+    def _needs_rotation(self, sink: FileSink) -> bool:
+        if self.rotate_daily and sink.stream is not None and sink.period != _day(time.time()):
+            return True
+        if self.rotate_daily and sink.stream is None:
+            try:
+                stat = os.stat(sink.path)
+            except OSError:
+                return False
+            if stat.st_size > 0 and _day(stat.st_mtime) != _day(time.time()):
+                return True
+        return self.max_file_bytes > 0 and sink.size() >= self.max_file_bytes
+
+    def _rotate(self, sink: FileSink):
+        """关闭并重命名日志文件，下一次写入时重新创建"""
+        self._close(sink)
+        if not os.path.exists(sink.path):
+            return
+        rotated = rotated_name(sink.path)
+        try:
+            os.replace(sink.path, rotated)
+        except OSError:
+            self.stats['errors'] += 1
+            return
+        self.stats['rotations'] += 1
+        if self.on_rotated is not None:
+            self.on_rotated(rotated)
+
+    def _close(self, sink: FileSink):
+        for key in [k for k, s in self._open.items() if s is sink]:
+            del self._open[key]
+            self._dirty.pop(key, None)
+        try:
+            sink.close()
+        except Exception:
+            self.stats['errors'] += 1
+
+    def _close_all(self):
+        self._flush_dirty()
+        for sink in list(self._open.values()):
+            try:
+                sink.close()
+            except Exception:
+                pass
+        self._open.clear()
@@ -0,0 +1,72 @@
+# -*- coding: UTF-8 -*-
+"""
+日志模块使用的 Qt 兼容层
+Qt 不可用时（命令行工具、测试环境）提供同名的纯 Python 实现。
+"""
+
+# 尝试导入Qt，如果失败则使用纯Python实现
+try:
+    from PySide6.QtCore import QObject, Signal, QMetaMethod
+    QT_AVAILABLE = True
+except ImportError:
+    QT_AVAILABLE = False
+
+    # 如果Qt不可用，创建一个简单的基类
+    class QObject:
+        def __init__(self, parent=None):
+            pass
+
+    class Signal:
+        def __init__(self, *args):
+            self._callbacks = []
+            self._name = None
+
+        def __set_name__(self, owner, name):
+            self._name = name
+
+        def __get__(self, obj, objtype=None):
+            # 与 Qt 一致：每个实例拥有独立的连接
+            if obj is None or self._name is None:
+                return self
+            bound = obj.__dict__.get(self._name)
+            if bound is None:
+                bound = obj.__dict__[self._name] = Signal()
+            return bound
+
+        def connect(self, callback):
+            self._callbacks.append(callback)
+
+        def disconnect(self, callback):
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+        def emit(self, *args, **kwargs):
+            for callback in self._callbacks:
+                try:
+                    callback(*args, **kwargs)
+                except Exception:
+                    pass
+
+
+_signal_methods = {}  # (类, 信号名) -> QMetaMethod
+
+
+def has_receivers(obj, signal_name: str) -> bool:
+    """信号是否有连接的槽函数"""
+    if not QT_AVAILABLE:
+        return bool(getattr(obj, signal_name)._callbacks)
+    key = (type(obj), signal_name)
+    method = _signal_methods.get(key)
+    if method is None:
+        meta = obj.metaObject()
+        for index in range(meta.methodCount()):
+            candidate = meta.method(index)
+            if candidate.methodType() == QMetaMethod.Signal and bytes(candidate.name()).decode() == signal_name:
+                method = _signal_methods[key] = candidate
+                break
+        else:
+            return True  # 找不到信号时按有连接处理，保持原有行为
+    try:
+        return obj.isSignalConnected(method)
+    except (RuntimeError, TypeError):
+        return True
@@ -42,17 +42,9 @@ class HomePage(QFrame):
         app_logger.info("MFWPH已启动")
         app_logger.info(f"日志存储路径: {os.path.abspath(log_manager.log_dir)}")
 
-        backup_dir = log_manager.backup_dir
-        # 确保目录存在
-        if not os.path.exists(backup_dir):
-            os.makedirs(backup_dir)
-
-        # 获取以 logs_backup_ 开头的文件列表
-        backup_files = [f for f in os.listdir(backup_dir) if f.startswith("logs_backup_")]
-        if backup_files:
-            # 获取最新的备份文件
-            latest_backup = max(backup_files)
-            app_logger.info(f"启动时发现日志超过10MB，已备份至: {os.path.join('backup', latest_backup)}")
+        policy = log_manager.housekeeper.policy
+        app_logger.info(f"日志存档路径: {os.path.abspath(log_manager.backup_dir)}"
+                        f"（单个日志超过 {policy.max_file_mb}MB{'或跨天' if policy.rotate_daily else ''}时压缩存档）")
 
     def init_ui(self):
         # 主布局
@@ -205,8 +197,6 @@ class HomePage(QFrame):
 
     def connect_signals(self):
         """连接来自日志管理器和其他信号"""
-        log_manager.app_log_updated.connect(self.on_app_log_updated)
-
         # 连接来自全局配置的设备更改
         if hasattr(global_config, 'device_added'):
             global_config.device_added.connect(self.on_device_config_changed)
@@ -261,12 +251,6 @@ class HomePage(QFrame):
         # 重新加载所有设备
         self.load_devices()
 
-    def on_app_log_updated(self):
-        """处理应用日志更新"""
-        # 如果日志显示可见，更新它
-        if self.log_display.isVisible():
-            self.log_display.on_app_log_updated()
-
     def toggle_logs(self, checked):
         """切换日志显示区域的可见性"""
         sizes = self.content_splitter.sizes()
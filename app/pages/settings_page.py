@@ -58,6 +58,9 @@ class LogExportWorker(QThread):
             # 扫描 logs 目录
             if os.path.exists(self.log_dir):
                 for root, dirs, files in os.walk(self.log_dir):
+                    # 日志检索索引由程序维护，不打包也不清理
+                    if root == self.log_dir and "index" in dirs:
+                        dirs.remove("index")
                     for file in files:
                         # 跳过之前的导出文件，防止递归打包
                         if file.startswith("logs_export_") and file.endswith(".zip"):
@@ -431,6 +434,8 @@ class SettingsPage(QWidget):
         self.wait_time_input = QLineEdit()
         self.wait_time_input.setValidator(QIntValidator(0, 300, self))  # 限制输入为0-300的整数
         self.wait_time_input.setFixedWidth(100)  # 设置一个合适的宽度
+        self.wait_time_input.setToolTip("ADB 模拟器启动后会自动探测就绪状态，此值仅作为首次启动的预计耗时；\n"
+                                        "其他类型的设备仍固定等待该时间")
 
         # 从配置加载初始值
         try:
@@ -448,6 +453,54 @@ class SettingsPage(QWidget):
         wait_time_row.addStretch()
         layout.addLayout(wait_time_row)
 
+        # 设备会话空闲保持时间
+        idle_timeout_row = QHBoxLayout()
+        idle_timeout_label = QLabel("设备空闲保持连接时间 (秒) ")
+        self.session_idle_input = QLineEdit()
+        self.session_idle_input.setValidator(QIntValidator(0, 86400, self))
+        self.session_idle_input.setFixedWidth(100)
+        self.session_idle_input.setToolTip("任务批次结束后保持设备连接的时间，0表示每批次结束即断开")
+        try:
+            self.session_idle_input.setText(str(global_config.get_app_config().device_session_idle_timeout))
+        except Exception as e:
+            logger.warning(f"无法加载设备空闲保持时间: {e}, 使用默认值 300")
+            self.session_idle_input.setText("300")
+        self.session_idle_input.editingFinished.connect(self.on_session_idle_timeout_changed)
+
+        idle_timeout_row.addWidget(idle_timeout_label)
+        idle_timeout_row.addWidget(self.session_idle_input)
+        idle_timeout_row.addStretch()
+        layout.addLayout(idle_timeout_row)
+
+        # 主机级准入控制：同时启动的模拟器数量与同时运行的设备数量
+        app_config = global_config.get_app_config()
+        admission_row = QHBoxLayout()
+        self.max_boots_input = QLineEdit(str(app_config.max_concurrent_boots))
+        self.max_boots_input.setValidator(QIntValidator(0, 64, self))
+        self.max_boots_input.setFixedWidth(60)
+        self.max_boots_input.setToolTip("同时冷启动的模拟器数量上限，0表示不限制")
+        self.max_boots_input.editingFinished.connect(self.on_admission_limits_changed)
+        self.max_running_input = QLineEdit(str(app_config.max_running_devices))
+        self.max_running_input.setValidator(QIntValidator(0, 64, self))
+        self.max_running_input.setFixedWidth(60)
+        self.max_running_input.setToolTip("同时运行任务的设备数量上限，0表示不限制")
+        self.max_running_input.editingFinished.connect(self.on_admission_limits_changed)
+        admission_row.addWidget(QLabel("同时启动模拟器上限 "))
+        admission_row.addWidget(self.max_boots_input)
+        admission_row.addSpacing(20)
+        admission_row.addWidget(QLabel("同时运行设备上限 "))
+        admission_row.addWidget(self.max_running_input)
+        admission_row.addStretch()
+        layout.addLayout(admission_row)
+
+        adaptive_row = QHBoxLayout()
+        adaptive_checkbox = QCheckBox("根据 CPU/内存/磁盘负载自动降低上限")
+        adaptive_checkbox.setChecked(app_config.adaptive_admission)
+        adaptive_checkbox.stateChanged.connect(self.on_adaptive_admission_changed)
+        adaptive_row.addWidget(adaptive_checkbox)
+        adaptive_row.addStretch()
+        layout.addLayout(adaptive_row)
+
     def on_emulator_wait_time_changed(self):
         """【新增】当模拟器启动等待时间输入框编辑完成时，保存设置"""
         app_config = global_config.get_app_config()
@@ -467,6 +520,46 @@ class SettingsPage(QWidget):
             logger.error(f"保存模拟器启动等待时间失败: {e}")
             notification_manager.show_error("保存设置失败", "错误")
 
+    def on_session_idle_timeout_changed(self):
+        """设备空闲保持时间输入框编辑完成时，保存设置"""
+        app_config = global_config.get_app_config()
+        try:
+            new_value = int(self.session_idle_input.text())
+            if app_config.device_session_idle_timeout != new_value:
+                app_config.device_session_idle_timeout = new_value
+                global_config.save_all_configs()
+                notification_manager.show_info(f"设备空闲保持时间已设置为 {new_value} 秒。", "设置已保存")
+        except ValueError:
+            self.session_idle_input.setText(str(app_config.device_session_idle_timeout))
+            notification_manager.show_warning("请输入有效的保持时间（0-86400秒）。", "输入无效")
+        except Exception as e:
+            logger.error(f"保存设备空闲保持时间失败: {e}")
+            notification_manager.show_error("保存设置失败", "错误")
+
+    def on_admission_limits_changed(self):
+        """同时启动模拟器上限或同时运行设备上限编辑完成时，保存设置"""
+        app_config = global_config.get_app_config()
+        try:
+            max_boots = int(self.max_boots_input.text())
+            max_running = int(self.max_running_input.text())
+            if (app_config.max_concurrent_boots, app_config.max_running_devices) != (max_boots, max_running):
+                app_config.max_concurrent_boots = max_boots
+                app_config.max_running_devices = max_running
+                global_config.save_all_configs()
+                notification_manager.show_info("并发上限设置已保存。", "设置已保存")
+        except ValueError:
+            self.max_boots_input.setText(str(app_config.max_concurrent_boots))
+            self.max_running_input.setText(str(app_config.max_running_devices))
+            notification_manager.show_warning("请输入有效的上限（0-64，0表示不限制）。", "输入无效")
+        except Exception as e:
+            logger.error(f"保存并发上限设置失败: {e}")
+            notification_manager.show_error("保存设置失败", "错误")
+
+    def on_adaptive_admission_changed(self, state):
+        app_config = global_config.get_app_config()
+        app_config.adaptive_admission = (state == Qt.CheckState.Checked.value)
+        global_config.save_all_configs()
+
     def show_dependency_sources_dialog(self):
         dialog = DependencySourcesDialog(self)
         dialog.exec()
@@ -8,6 +8,7 @@ import asyncio
 import os
 from PySide6.QtWidgets import QApplication
 
+from app.exit_handler import flush_config_writes
 from app.models.config.global_config import global_config
 from app.utils.global_logger import get_logger
 from core.tasker_manager import task_manager
@@ -76,6 +77,7 @@ def create_device_completion_handler(device_names, completed_devices):
                     asyncio.create_task(perform_graceful_shutdown(loop, app, window))
                 except Exception as e:
                     logger.error(f"获取应用实例失败，直接退出: {e}")
+                    flush_config_writes()
                     os._exit(0)
     return on_device_completed
 
@@ -86,6 +88,7 @@ async def check_timeout_and_active_tasks(device_names, completed_devices, start_
     current_time = asyncio.get_event_loop().time()
     if current_time - start_time > timeout_seconds:
         logger.warning(f"等待任务完成超时 ({timeout_seconds}秒)，强制退出")
+        flush_config_writes()
         os._exit(1)
 
     # 检查是否还有活跃的任务处理器
@@ -129,6 +132,7 @@ async def wait_for_all_tasks_complete(device_names, timeout_seconds=3600):
 
     except Exception as e:
         logger.error(f"等待任务完成时发生错误: {e}")
+        flush_config_writes()
         os._exit(1)
 
 
@@ -157,4 +161,5 @@ async def start_tasks_on_startup(args):
     except Exception as e:
         logger.error(f"启动任务时发生错误: {e}")
         if args.exit_on_complete:
+            flush_config_writes()
             os._exit(1)  # 出错时直接退出
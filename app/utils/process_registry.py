@@ -0,0 +1,177 @@
+import re
+import threading
+import time
+from typing import Optional, Dict, Tuple
+
+import psutil
+
+# 模拟器实例键: (厂商, 实例编号)
+InstanceKey = Tuple[str, str]
+
+LDPLAYER = "ldplayer"
+MUMU = "mumu"
+
+_LD_INDEX_RE = re.compile(r'index[=\s]+(\d+)')
+_MUMU_V_RE = re.compile(r'-v\s*(\d+)\b')
+
+
+def _cmdline_to_str(cmdline) -> str:
+    """把 cmdline list -> 单一小写字符串（健壮处理 None/空列表）"""
+    if not cmdline:
+        return ""
+    if isinstance(cmdline, (list, tuple)):
+        return " ".join(cmdline).lower()
+    return str(cmdline).lower()
+
+
+def parse_start_command(start_command: str) -> Optional[InstanceKey]:
+    """
+    从启动命令解析模拟器实例键。
+    支持 LDPlayer (dnplayer.exe index=N) 和 MuMu (MuMuNxMain.exe -v N)，无法识别时返回 None。
+    """
+    cmd_lower = start_command.strip().lower()
+    if "dnplayer.exe" in cmd_lower:
+        m = _LD_INDEX_RE.search(cmd_lower)
+        return (LDPLAYER, m.group(1)) if m else None
+    if "mumu" in cmd_lower:
+        m = _MUMU_V_RE.search(cmd_lower)
+        return (MUMU, m.group(1)) if m else None
+    return None
+
+
+def classify_process(name: str, cmdline: str) -> Optional[InstanceKey]:
+    """根据进程名与命令行判断进程属于哪个模拟器实例"""
+    if "dnplayer" in name or "dnconsole" in name:
+        m = _LD_INDEX_RE.search(cmdline)
+        return (LDPLAYER, m.group(1)) if m else None
+    if "mumunxdevice.exe" in name or "mumunxdevice.exe" in cmdline:
+        # 主实例 (v=0) 的命令行可能不含 -v 参数；多开实例会明确带有 -v N
+        m = _MUMU_V_RE.search(cmdline)
+        return (MUMU, m.group(1) if m else "0")
+    return None
+
+
+class EmulatorProcessRegistry:
+    """
+    模拟器进程注册表。
+    首次使用时快照一次系统进程，之后按 (PID, 创建时间) 比对，只检查新出现、被复用或上次检查失败的进程，
+    并按 (厂商, 实例编号) 索引模拟器进程，查找为 O(1)：命中索引时只核对该进程的创建时间（PID 复用），
+    索引中没有该实例时才增量刷新。
+    所有执行器共享同一个实例，可在线程池中并发调用。
+    """
+
+    REFRESH_INTERVAL = 0.5  # 两次增量刷新的最小间隔（秒）
+    MAX_INSPECT_RETRIES = 5  # 检查失败的进程最多重试次数（系统进程通常始终无权限或没有命令行）
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # PID -> 创建时间；创建时间变化说明 PID 已被复用
+        self._known: Dict[int, Optional[float]] = {}
+        # 上次检查失败（无权限或命令行尚为空）的 PID -> 已失败次数，下次刷新时重试
+        self._retry: Dict[int, int] = {}
+        # 实例键 -> {pid: create_time}
+        self._index: Dict[InstanceKey, Dict[int, float]] = {}
+        self._pid_keys: Dict[int, InstanceKey] = {}
+        self._last_refresh = 0.0
+        self.stats = {'refreshes': 0, 'processes_inspected': 0, 'lookups': 0}
+
+    def refresh(self, force: bool = False):
+        """
+        增量刷新：一次遍历读取所有进程的创建时间（不读取命令行），
+        移除已退出或被复用的 PID，只检查新出现、被复用以及上次检查失败的进程
+        """
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.REFRESH_INTERVAL:
+                return
+            current = {proc.pid: proc.info['create_time'] for proc in psutil.process_iter(['create_time'])}
+            for pid, create_time in self._known.items():
+                if current.get(pid, -1) != create_time:
+                    self._forget(pid)
+                    self._retry.pop(pid, None)
+            for pid, create_time in current.items():
+                if pid in self._retry or self._known.get(pid, -1) != create_time:
+                    self._inspect(pid)
+            self._known = current
+            self._last_refresh = now
+            self.stats['refreshes'] += 1
+
+    def lookup(self, key: InstanceKey) -> Optional[int]:
+        """返回实例对应的进程 PID（多个进程时取最早创建的），不存在时返回 None"""
+        with self._lock:
+            self.stats['lookups'] += 1
+            pid = self._lookup_indexed(key)
+        if pid is not None:
+            return pid
+        # 索引中没有该实例（模拟器可能刚启动），增量刷新后再查一次
+        self.refresh()
+        with self._lock:
+            return self._lookup_indexed(key)
+
+    def find_by_start_command(self, start_command: str) -> Optional[int]:
+        key = parse_start_command(start_command)
+        return self.lookup(key) if key else None
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, 'known': len(self._known), 'indexed': len(self._pid_keys)}
+
+    # === 内部实现（调用方持有锁） ===
+
+    def _lookup_indexed(self, key: InstanceKey) -> Optional[int]:
+        entries = self._index.get(key)
+        if not entries:
+            return None
+        for pid, create_time in sorted(entries.items(), key=lambda item: item[1]):
+            if self._is_same_process(pid, create_time):
+                return pid
+            # PID 已被复用或进程已退出，重新检查该 PID
+            self._forget(pid)
+            self._inspect(pid)
+        entries = self._index.get(key)
+        return min(entries, key=entries.get) if entries else None
+
+    def _inspect(self, pid: int):
+        failures = self._retry.pop(pid, 0)
+        try:
+            proc = psutil.Process(pid)
+            name = (proc.name() or "").lower()
+            self.stats['processes_inspected'] += 1
+            # MuMu 设备进程可能只能从命令行识别，新进程都读取命令行；已知进程不会重复读取
+            cmdline = _cmdline_to_str(proc.cmdline())
+            if not cmdline:
+                # 刚启动的进程命令行可能还是空的，下次刷新再检查
+                self._mark_failed(pid, failures)
+            key = classify_process(name, cmdline)
+            if key:
+                self._index.setdefault(key, {})[pid] = proc.create_time()
+                self._pid_keys[pid] = key
+        except (psutil.AccessDenied, psutil.ZombieProcess):
+            self._mark_failed(pid, failures)
+        except psutil.NoSuchProcess:
+            return
+
+    def _mark_failed(self, pid: int, failures: int):
+        if failures < self.MAX_INSPECT_RETRIES:
+            self._retry[pid] = failures + 1
+
+    def _forget(self, pid: int):
+        key = self._pid_keys.pop(pid, None)
+        if key is None:
+            return
+        entries = self._index.get(key)
+        if entries is not None:
+            entries.pop(pid, None)
+            if not entries:
+                del self._index[key]
+
+    @staticmethod
+    def _is_same_process(pid: int, create_time: float) -> bool:
+        try:
+            return psutil.Process(pid).create_time() == create_time
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            return False
+
+
+# 创建全局实例
+emulator_process_registry = EmulatorProcessRegistry()
@@ -638,7 +638,7 @@ class AddDeviceDialog(QDialog):
                     auto_start_emulator=auto_start,
                     auto_close_emulator=auto_close
                 )
-                self.global_config.app_config.devices.append(new_config)
+                self.global_config.app_config.add_device(new_config)
 
             self.global_config.save_all_configs()
             self.accept()
@@ -662,10 +662,7 @@ class AddDeviceDialog(QDialog):
         if reply == QMessageBox.Yes:
             try:
                 # 从全局配置中删除该设备，假设设备以 device_name 为唯一标识
-                self.global_config.app_config.devices = [
-                    device for device in self.global_config.app_config.devices
-                    if device.device_name != self.device_config.device_name
-                ]
+                self.global_config.app_config.remove_device(self.device_config.device_name)
                 self.global_config.save_all_configs()
                 self.delete_devices_signal.emit()
                 self.accept()
@@ -182,6 +182,9 @@ class BasicInfoWidget(QFrame):
                 tooltip += f": {ui_info.error_message}"
             if ui_info.queue_length > 0:
                 tooltip += f"，队列中还有 {ui_info.queue_length} 个任务"
+            if ui_info.queue_position > 0:
+                waiting_text = "模拟器启动名额" if ui_info.waiting_for == "boot" else "运行名额"
+                tooltip += f"，正在排队等待{waiting_text}（第 {ui_info.queue_position} 位）"
             if ui_info.progress > 0 and ui_info.state == DeviceState.RUNNING:
                 tooltip += f"（进度: {ui_info.progress}%）"
             self.status_indicator.setToolTip(tooltip)
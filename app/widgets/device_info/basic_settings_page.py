@@ -269,9 +269,7 @@ class BasicSettingsPage(QFrame):
             self.show_error_message(f"未找到资源 {resource_name} 的配置信息")
             return
 
-        settings = next(
-            (s for s in app_config.resource_settings if s.name == settings_name and s.resource_name == resource_name),
-            None)
+        settings = app_config.get_resource_setting(resource_name, settings_name)
         if not settings:
             self.show_error_message(f"未找到名为 '{settings_name}' 的设置方案")
             return
@@ -307,8 +305,7 @@ class BasicSettingsPage(QFrame):
                     self.logger.warning(f"数据不一致: task_order 中的 ID '{instance_id}' 在 task_instances 中找不到。")
                     continue
 
-                task_config = next(
-                    (t for t in full_resource_config.resource_tasks if t.task_name == task_instance.task_name), None)
+                task_config = full_resource_config.get_task(task_instance.task_name)
                 if task_config:
                     task_widget = TaskItemWidget(task_instance, task_config)
                     task_widget.settings_requested.connect(self.on_task_settings_requested)
@@ -428,8 +425,7 @@ class BasicSettingsPage(QFrame):
         if settings and device_resource and instance_id in settings.task_instances:
             task_instance = settings.task_instances[instance_id]
             full_resource_config = global_config.get_resource_config(self.selected_resource_name)
-            task_config = next(
-                (t for t in full_resource_config.resource_tasks if t.task_name == task_instance.task_name), None)
+            task_config = full_resource_config.get_task(task_instance.task_name)
 
             if task_config:
                 self.task_settings_requested.emit(
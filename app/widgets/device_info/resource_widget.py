@@ -1,7 +1,7 @@
 # app/widgets/resource_widget.py
 
 from PySide6.QtCore import Qt, QSize, Signal
-from PySide6.QtGui import QFont, QIcon
+from PySide6.QtGui import QFont, QIcon, QGuiApplication
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFrame, QLabel,
     QPushButton, QTableWidget, QTableWidgetItem, QHeaderView,
@@ -112,9 +112,11 @@ class ResourceWidget(QFrame):
             run_btn.setFixedSize(24, 24)
             run_btn.setIcon(QIcon("assets/icons/play.svg"))
             run_btn.setIconSize(QSize(14, 14))
-            run_btn.setToolTip("运行此资源")
+            run_btn.setToolTip("运行此资源（当天中断过的任务会从上次进度继续，按住 Shift 点击则从头完整运行）")
             run_btn.clicked.connect(lambda checked, r_name=resource_name:
-                                    task_manager.run_resource_task(self.device_config.device_name, r_name))
+                                    task_manager.run_resource_task(
+                                        self.device_config.device_name, r_name,
+                                        bool(QGuiApplication.keyboardModifiers() & Qt.KeyboardModifier.ShiftModifier)))
 
             settings_btn = QPushButton()
             settings_btn.setFixedSize(24, 24)
@@ -168,8 +170,7 @@ class ResourceWidget(QFrame):
 
         # 检查此设备是否已有此资源的专用配置方案
         device_specific_settings_name = f"默认配置_{self.device_name}"
-        existing_device_settings = next((s for s in app_config.resource_settings
-                                       if s.resource_name == resource_name and s.name == device_specific_settings_name), None)
+        existing_device_settings = app_config.get_resource_setting(resource_name, device_specific_settings_name)
 
         if existing_device_settings:
             # 如果此设备的专用配置已存在，直接使用
@@ -184,9 +184,8 @@ class TaskOptionsWidget(QFrame):
         app_config = global_config.get_app_config()
         if not app_config: return None
 
-        settings = next((s for s in app_config.resource_settings if
-                         s.name == self.current_device_resource.settings_name and s.resource_name == self.current_resource_name),
-                        None)
+        settings = app_config.get_resource_setting(self.current_resource_name,
+                                                   self.current_device_resource.settings_name)
 
         if not settings or not hasattr(settings, 'task_instances'):
             return None
@@ -381,15 +380,8 @@ class TaskOptionsWidget(QFrame):
         full_resource_config = global_config.get_resource_config(self.current_resource_name)
         if not full_resource_config: return value
 
-        original_option = None
-        # 处理嵌套选项（在SettingsGroup中）
-        if '.' in option_name:
-            group_name, sub_option_name = option_name.split('.', 1)
-            group_option = next((opt for opt in full_resource_config.options if opt.name == group_name), None)
-            if group_option and isinstance(group_option, SettingsGroupOption):
-                original_option = next((opt for opt in group_option.settings if opt.name == sub_option_name), None)
-        else:
-            original_option = next((opt for opt in full_resource_config.options if opt.name == option_name), None)
+        # 嵌套选项（在SettingsGroup中）以 "组名.子选项名" 查找
+        original_option = full_resource_config.get_option(option_name)
 
         if not original_option: return value
 
@@ -223,8 +223,7 @@ class TaskSettingsWidget(QFrame):
             if not new_task_names: return
 
             app_config = global_config.get_app_config()
-            settings = next((s for s in app_config.resource_settings
-                             if s.name == settings_name and s.resource_name == resource_name), None)
+            settings = app_config.get_resource_setting(resource_name, settings_name)
 
             if settings:
                 for task_name in new_task_names:
@@ -0,0 +1,137 @@
+# -*- coding: UTF-8 -*-
+"""
+界面日志缓冲区内存基准
+写入相同的日志（应用日志 + 多个设备），比较旧结构（每个来源一个 deque，元素为 LogRecord 数据类，
+带 datetime 对象）与列式环形缓冲区 LogBuffer 的内存占用、写入速度与按设备筛选的耗时。
+消息字符串在计时和统计之前生成，两种结构共用，内存统计只包括结构本身的开销。
+
+用法:
+    python benchmarks/log_buffer_memory_bench.py [--records 100000] [--devices 20]
+"""
+
+import argparse
+import gc
+import importlib.util
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _load_log_buffer():
+    """直接加载 log_buffer.py，不经过 app.models.logging 包（包的 __init__ 会创建日志管理器并写入 logs/）"""
+    path = os.path.join(ROOT, "app", "models", "logging", "log_buffer.py")
+    spec = importlib.util.spec_from_file_location("log_buffer", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # dataclass 需要通过 sys.modules 找到所属模块
+    spec.loader.exec_module(module)
+    return module
+
+
+LogBuffer = _load_log_buffer().LogBuffer
+
+LEVELS = ('INFO', 'INFO', 'INFO', 'DEBUG', 'DEBUG', 'WARNING', 'ERROR')
+
+
+@dataclass
+class LegacyLogRecord:
+    """旧实现的日志记录"""
+    timestamp: datetime
+    level: str
+    message: str
+    device_name: Optional[str] = None
+
+
+class LegacyLogBuffer:
+    """旧实现的等价副本：应用日志与每个设备各一个定长 deque"""
+
+    def __init__(self, max_size: int):
+        self.app_logs = deque(maxlen=max_size)
+        self.device_logs = defaultdict(lambda: deque(maxlen=max_size))
+
+    def add(self, timestamp: float, level: str, message: str, device_name: Optional[str]):
+        record = LegacyLogRecord(datetime.fromtimestamp(timestamp), level, message, device_name)
+        if device_name is None:
+            self.app_logs.append(record)
+        else:
+            self.device_logs[device_name].append(record)
+
+    def device(self, device_name: str):
+        return list(self.device_logs.get(device_name, []))
+
+
+def make_entries(count: int, devices: int):
+    base = time.time()
+    entries = []
+    for i in range(count):
+        source = i % (devices + 1)
+        device_name = None if source == 0 else f"设备{source:02d}"
+        message = f"[{device_name or 'app'}] 执行任务 {i % 37} 的第 {i} 步: 识别到目标，耗时 {i % 97}ms"
+        entries.append((base + i * 0.01, LEVELS[i % len(LEVELS)], message, device_name))
+    return entries
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    structure = build()
+    seconds = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return structure, current, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=100000, help="写入的日志条数")
+    parser.add_argument("--devices", type=int, default=20, help="设备数量（另有应用日志）")
+    args = parser.parse_args()
+
+    entries = make_entries(args.records, args.devices)
+    per_source = args.records // (args.devices + 1) + 1  # 旧结构按来源分配容量，保证两者保留的日志相同
+
+    def build_legacy():
+        buffer = LegacyLogBuffer(per_source)
+        for entry in entries:
+            buffer.add(*entry)
+        return buffer
+
+    def build_columnar():
+        buffer = LogBuffer(capacity=args.records)
+        for entry in entries:
+            buffer.append(*entry)
+        return buffer
+
+    legacy, legacy_bytes, legacy_seconds = measure(build_legacy)
+    columnar, columnar_bytes, columnar_seconds = measure(build_columnar)
+
+    device_name = "设备01"
+    started = time.perf_counter()
+    legacy_count = len(legacy.device(device_name))
+    legacy_select = time.perf_counter() - started
+    started = time.perf_counter()
+    columnar_count = len(columnar.select(device=device_name))
+    columnar_select = time.perf_counter() - started
+    # 兼容接口：没有日志的设备返回空列表
+    assert columnar.get_device_logs("未知设备") == []
+    assert len(columnar.select_snapshot(device="未知设备")[0]) == 0
+
+    print(f"{args.records} 条日志，{args.devices} 个设备 + 应用日志")
+    print(f"旧结构:   {legacy_bytes / 1024 / 1024:8.2f} MiB  {legacy_bytes / args.records:6.1f} 字节/条  "
+          f"写入 {args.records / legacy_seconds:12,.0f} 条/秒  筛选 {device_name} {legacy_count} 条 "
+          f"{legacy_select * 1000:.2f}ms")
+    print(f"列式缓冲: {columnar_bytes / 1024 / 1024:8.2f} MiB  {columnar_bytes / args.records:6.1f} 字节/条  "
+          f"写入 {args.records / columnar_seconds:12,.0f} 条/秒  筛选 {device_name} {columnar_count} 条 "
+          f"{columnar_select * 1000:.2f}ms（只返回序号）")
+    print(f"内存占用降低: {(1 - columnar_bytes / legacy_bytes) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
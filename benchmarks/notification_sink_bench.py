@@ -0,0 +1,170 @@
+# -*- coding: UTF-8 -*-
+"""
+节点通知处理器微基准
+回放节点回调载荷，比较旧处理器（每次回调重建映射表、在回调线程同步写日志）
+与 NotificationLogSink（静态分派 + deque 交接，日志在排空时批量写入）的每秒回调数。
+
+用法:
+    python benchmarks/notification_sink_bench.py [--payloads recorded.json] [--count 200000]
+
+recorded.json 为列表，每项形如:
+    {"kind": "recognition" | "action", "type": "Starting" | "Succeeded" | "Failed", "focus": {...}}
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from maa.event_sink import NotificationType  # noqa: E402
+
+from core.notification_sink import NotificationLogSink  # noqa: E402
+
+
+def default_payloads():
+    """识别密集型任务的典型载荷：大量无日志协议的识别回调，夹杂带日志的动作回调"""
+    payloads = []
+    for i in range(50):
+        payloads.append({"kind": "recognition", "type": "Starting", "focus": None})
+        payloads.append({"kind": "recognition", "type": "Failed", "focus": {"other": i}})
+    payloads.append({"kind": "recognition", "type": "Succeeded",
+                     "focus": {"Node.Recognition.Succeeded": "[debug]识别到目标"}})
+    payloads.append({"kind": "action", "type": "Starting", "focus": {"start": "开始执行动作"}})
+    payloads.append({"kind": "action", "type": "Succeeded",
+                     "focus": {"Node.Action.Succeeded": ["[info]动作完成", "[debug]耗时 12ms"]}})
+    payloads.append({"kind": "action", "type": "Failed",
+                     "focus": {"failed": "动作失败", "level": {"failed": "warning"}}})
+    return payloads
+
+
+class LegacyHandler:
+    """旧实现的等价副本：每次回调重建映射表，并在回调线程直接写日志"""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self._log_pattern = re.compile(r"^\[(info|debug|warning|error|critical)\](.*)", re.IGNORECASE)
+
+    def _process_log_protocol(self, focus_data, key_map, noti_type):
+        exec_obj = self.executor
+        if not exec_obj or not focus_data or not isinstance(focus_data, dict):
+            return False
+        protocol_key = key_map.get(noti_type)
+        if not protocol_key or protocol_key not in focus_data:
+            return False
+        raw_content = focus_data[protocol_key]
+        messages = raw_content if isinstance(raw_content, list) else [str(raw_content)]
+        for msg in messages:
+            match = self._log_pattern.match(msg)
+            if match:
+                getattr(exec_obj.logger, match.group(1).lower(), exec_obj.logger.info)(match.group(2))
+            else:
+                exec_obj.logger.info(msg)
+        return True
+
+    def on_node_recognition(self, context, noti_type, detail):
+        recog_key_map = {
+            NotificationType.Starting: 'Node.Recognition.Starting',
+            NotificationType.Succeeded: 'Node.Recognition.Succeeded',
+            NotificationType.Failed: 'Node.Recognition.Failed',
+        }
+        self._process_log_protocol(getattr(detail, "focus", None), recog_key_map, noti_type)
+
+    def on_node_action(self, context, noti_type, detail):
+        exec_obj = self.executor
+        if not exec_obj or not detail or not getattr(detail, "focus", None):
+            return
+        focus = detail.focus
+        action_key_map = {
+            NotificationType.Starting: 'Node.Action.Starting',
+            NotificationType.Succeeded: 'Node.Action.Succeeded',
+            NotificationType.Failed: 'Node.Action.Failed',
+        }
+        if self._process_log_protocol(focus, action_key_map, noti_type):
+            return
+        old_protocol_map = {
+            NotificationType.Succeeded: ("succeeded", exec_obj.logger.info),
+            NotificationType.Failed: ("failed", exec_obj.logger.error),
+            NotificationType.Starting: ("start", exec_obj.logger.info),
+        }
+        if noti_type in old_protocol_map:
+            key, log_func = old_protocol_map[noti_type]
+            level_config = focus.get("level")
+            if isinstance(level_config, dict) and level_config.get(key):
+                log_func = getattr(exec_obj.logger, level_config[key], log_func)
+            if key in focus:
+                values = focus[key]
+                for v in (values if isinstance(values, list) else [values]):
+                    log_func(str(v))
+
+
+def make_logger() -> logging.Logger:
+    """与设备日志相同的格式化开销，输出写入空设备"""
+    logger = logging.getLogger("bench_device")
+    logger.handlers.clear()
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = logging.FileHandler(os.devnull, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    return logger
+
+
+def replay(handler, calls, count: int) -> float:
+    """回放 count 次回调，返回耗时（秒）"""
+    started = time.perf_counter()
+    n = len(calls)
+    for i in range(count):
+        method, noti_type, detail = calls[i % n]
+        method(handler, None, noti_type, detail)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payloads", help="录制的回调载荷 JSON 文件")
+    parser.add_argument("--count", type=int, default=200000, help="回放的回调次数")
+    args = parser.parse_args()
+
+    if args.payloads:
+        with open(args.payloads, 'r', encoding='utf-8') as f:
+            payloads = json.load(f)
+    else:
+        payloads = default_payloads()
+
+    executor = SimpleNamespace(logger=make_logger())
+    legacy = LegacyHandler(executor)
+    sink = NotificationLogSink(executor)
+    sink._loop = None  # 不经过事件循环，交接后由基准手动排空
+    sink.MAX_PENDING = args.count * 10  # 基准中不丢弃消息，保证两者写入的日志条数相同
+
+    def build_calls(handler_cls):
+        calls = []
+        for p in payloads:
+            method = handler_cls.on_node_recognition if p["kind"] == "recognition" else handler_cls.on_node_action
+            calls.append((method, getattr(NotificationType, p["type"]), SimpleNamespace(focus=p.get("focus"))))
+        return calls
+
+    legacy_seconds = replay(legacy, build_calls(LegacyHandler), args.count)
+
+    # 回调线程的开销只包括解析与交接；排空在事件循环中进行，单独计时
+    sink._drain_scheduled = True  # 阻止回放期间的同步排空
+    sink_seconds = replay(sink, build_calls(NotificationLogSink), args.count)
+    started = time.perf_counter()
+    flushed = sink.flush()
+    drain_seconds = time.perf_counter() - started
+
+    print(f"回放 {args.count} 次回调，载荷 {len(payloads)} 种")
+    print(f"旧处理器:   {args.count / legacy_seconds:12,.0f} 次/秒 ({legacy_seconds:.3f} 秒)")
+    print(f"新处理器:   {args.count / sink_seconds:12,.0f} 次/秒 ({sink_seconds:.3f} 秒，回调线程)")
+    print(f"排空写日志: {flushed} 条，{drain_seconds:.3f} 秒（事件循环线程）")
+    print(f"统计: {sink.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+# -*- coding: UTF-8 -*-
+"""
+主机级准入控制
+- 两类名额: 同时启动的模拟器数量、同时运行任务的设备数量，分别可配置（0表示不限制）。
+- 公平排队: 名额不足时按先来先到排队，新到达的设备不会越过已在排队的设备。
+- 等待可见: 排队中的设备处于 WAITING 状态，并在设备状态上下文中更新排队位置。
+- 自适应: 可选根据 CPU、内存与磁盘繁忙程度临时收紧名额。
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, Deque, Tuple, Callable
+
+import psutil
+
+from app.models.config.global_config import global_config
+from app.models.logging.log_manager import log_manager
+from core.device_state_machine import DeviceState
+from core.device_status_manager import device_status_manager
+
+
+class AdmissionSlotPool:
+    """
+    FIFO 名额池。
+    limit_getter 返回当前生效的名额上限，0表示不限制。
+    """
+
+    def __init__(self, name: str, limit_getter: Callable[[], int],
+                 on_queue_changed: Callable[['AdmissionSlotPool'], None]):
+        self.name = name
+        self._limit_getter = limit_getter
+        self._on_queue_changed = on_queue_changed
+        self._holders: Dict[str, int] = {}  # 设备名 -> 持有的名额数
+        self._waiters: Deque[Tuple[str, asyncio.Future]] = deque()
+        self.stats = {'granted': 0, 'queued': 0, 'total_wait_seconds': 0.0}
+
+    @property
+    def active(self) -> int:
+        return sum(self._holders.values())
+
+    @property
+    def waiting(self):
+        return [name for name, _ in self._waiters]
+
+    def _has_capacity(self) -> bool:
+        limit = self._limit_getter()
+        return limit <= 0 or self.active < limit
+
+    async def acquire(self, device_name: str):
+        """获取一个名额，名额不足时排队等待"""
+        if not self._waiters and self._has_capacity():
+            self._grant(device_name)
+            return
+
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.append((device_name, future))
+        self.stats['queued'] += 1
+        started = time.monotonic()
+        self._on_queue_changed(self)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 名额已分配但等待方被取消，归还名额
+                self.release(device_name)
+            else:
+                self._remove_waiter(future)
+            raise
+        finally:
+            self.stats['total_wait_seconds'] += time.monotonic() - started
+
+    def release(self, device_name: str):
+        count = self._holders.get(device_name, 0)
+        if count <= 1:
+            self._holders.pop(device_name, None)
+        else:
+            self._holders[device_name] = count - 1
+        self.wake()
+
+    def wake(self):
+        """在名额允许时按顺序唤醒排队者"""
+        changed = False
+        while self._waiters and self._has_capacity():
+            device_name, future = self._waiters.popleft()
+            changed = True
+            if future.done():
+                continue
+            self._grant(device_name)
+            future.set_result(None)
+        if changed:
+            self._on_queue_changed(self)
+
+    def _grant(self, device_name: str):
+        self._holders[device_name] = self._holders.get(device_name, 0) + 1
+        self.stats['granted'] += 1
+
+    def _remove_waiter(self, future: asyncio.Future):
+        for item in list(self._waiters):
+            if item[1] is future:
+                self._waiters.remove(item)
+                self._on_queue_changed(self)
+                return
+
+
+class AdmissionController:
+    """
+    主机级准入控制器。
+    设备任务处理器在执行任务前获取"运行"名额；执行器在启动模拟器前获取"启动"名额，直到模拟器就绪后释放。
+    """
+
+    DEFAULT_MAX_BOOTS = 2
+    DEFAULT_MAX_RUNNING = 0
+    SAMPLE_INTERVAL = 2.0
+    HIGH_PRESSURE = 90.0  # 任一指标超过该百分比时只允许一个
+    MEDIUM_PRESSURE = 75.0  # 任一指标超过该百分比时名额减半（不限制时暂停新增）
+
+    def __init__(self):
+        self.logger = log_manager.get_app_logger()
+        self.boots = AdmissionSlotPool("boot", lambda: self._effective_limit(self.boots, 'max_concurrent_boots',
+                                                                            self.DEFAULT_MAX_BOOTS),
+                                       self._publish_positions)
+        self.running = AdmissionSlotPool("run", lambda: self._effective_limit(self.running, 'max_running_devices',
+                                                                             self.DEFAULT_MAX_RUNNING),
+                                         self._publish_positions)
+        self._pressure: Optional[Dict[str, float]] = None
+        self._last_disk: Optional[Tuple[float, float]] = None
+        self._sampler_task: Optional[asyncio.Task] = None
+
+    # === 公开接口 ===
+
+    async def acquire_run_slot(self, device_name: str):
+        await self._acquire(self.running, device_name)
+
+    def release_run_slot(self, device_name: str):
+        self.running.release(device_name)
+
+    @asynccontextmanager
+    async def boot_slot(self, device_name: str):
+        """在启动模拟器期间持有一个启动名额"""
+        await self._acquire(self.boots, device_name)
+        try:
+            yield
+        finally:
+            self.boots.release(device_name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            pool.name: {**pool.stats, 'active': pool.active, 'waiting': pool.waiting,
+                        'limit': pool._limit_getter()}
+            for pool in (self.boots, self.running)
+        }
+        stats['pressure'] = self._pressure
+        return stats
+
+    # === 内部实现 ===
+
+    async def _acquire(self, pool: AdmissionSlotPool, device_name: str):
+        if self._adaptive_enabled():
+            self._sample_pressure()
+        if pool.waiting or not pool._has_capacity():
+            # 需要排队时启动后台采样，压力下降后名额会放宽
+            self._ensure_sampler()
+        await pool.acquire(device_name)
+        manager = device_status_manager.get_device_manager(device_name)
+        if manager and manager.get_context().get('waiting_for'):
+            manager.update_context(queue_position=0, admission_queue_length=0, waiting_for=None)
+
+    def _adaptive_enabled(self) -> bool:
+        return bool(getattr(global_config.app_config, 'adaptive_admission', False))
+
+    def _effective_limit(self, pool: AdmissionSlotPool, config_key: str, default: int) -> int:
+        base = max(0, int(getattr(global_config.app_config, config_key, default)))
+        if not self._adaptive_enabled() or not self._pressure:
+            return base
+        pressure = max(self._pressure.values())
+        if pressure >= self.HIGH_PRESSURE:
+            return 1
+        if pressure >= self.MEDIUM_PRESSURE:
+            return max(1, base // 2) if base else max(1, pool.active)
+        return base
+
+    def _sample_pressure(self):
+        """采样主机压力 (百分比)：CPU、内存、磁盘繁忙度"""
+        try:
+            pressure = {'cpu': psutil.cpu_percent(interval=None), 'memory': psutil.virtual_memory().percent}
+            io = psutil.disk_io_counters()
+            if io is not None:
+                now = time.monotonic()
+                io_ms = float(getattr(io, 'busy_time', io.read_time + io.write_time))
+                if self._last_disk is not None and now > self._last_disk[0]:
+                    busy = (io_ms - self._last_disk[1]) / ((now - self._last_disk[0]) * 1000) * 100
+                    pressure['disk'] = max(0.0, min(100.0, busy))
+                self._last_disk = (now, io_ms)
+            self._pressure = pressure
+        except Exception as e:
+            self.logger.debug(f"采样主机压力失败: {e}")
+            self._pressure = None
+
+    def _ensure_sampler(self):
+        if self._sampler_task is None or self._sampler_task.done():
+            self._sampler_task = asyncio.ensure_future(self._sample_loop())
+
+    async def _sample_loop(self):
+        """有设备排队时定期采样压力并重新检查名额（压力下降后名额会放宽）"""
+        while self.boots.waiting or self.running.waiting:
+            await asyncio.sleep(self.SAMPLE_INTERVAL)
+            if self._adaptive_enabled():
+                self._sample_pressure()
+            else:
+                self._pressure = None
+            self.boots.wake()
+            self.running.wake()
+
+    def _publish_positions(self, pool: AdmissionSlotPool):
+        """将排队位置写入设备状态，排队中的设备显示为 WAITING"""
+        waiting = pool.waiting
+        for position, device_name in enumerate(waiting, start=1):
+            device_status_manager.set_device_state(device_name, DeviceState.WAITING, queue_position=position,
+                                                   admission_queue_length=len(waiting), waiting_for=pool.name)
+        self.logger.debug(f"准入队列 [{pool.name}] 运行 {pool.active}，排队 {len(waiting)}: {waiting}")
+
+
+# 创建全局实例
+admission_controller = AdmissionController()
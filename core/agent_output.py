@@ -0,0 +1,164 @@
+# -*- coding: UTF-8 -*-
+"""
+Agent 输出管道
+- 异步读取: 在事件循环中以异步流读取 Agent 的 stdout/stderr，不再为每个 Agent 启动读取线程。
+- 批量写入: 按时间与行数批量写入设备日志，管道始终被及时读空，Agent 不会阻塞在输出上。
+- 背压: 超过单位时间的行数上限或缓冲上限时丢弃低级别输出，并在日志中汇总被丢弃的行数。
+- 级别过滤: 按设备配置的 Agent 日志级别过滤输出，低于该级别的行不写入日志。
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from typing import Optional, Deque, Tuple, Dict, List
+
+_LEVEL_RE = re.compile(r'\b(DEBUG|INFO|WARNING|WARN|ERROR|CRITICAL|FATAL)\b')
+_LEVELS = {
+    'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING, 'WARN': logging.WARNING,
+    'ERROR': logging.ERROR, 'CRITICAL': logging.CRITICAL, 'FATAL': logging.CRITICAL,
+}
+
+
+def parse_level_name(name: Optional[str], default: int = logging.DEBUG) -> int:
+    """把配置中的级别名称转换为 logging 级别"""
+    if not name:
+        return default
+    return _LEVELS.get(str(name).strip().upper(), default)
+
+
+def detect_line_level(line: str, prefix: str) -> int:
+    """根据行首附近的级别标记判断输出级别，无法判断时 stdout 视为 DEBUG，stderr 中的异常堆栈视为 ERROR"""
+    m = _LEVEL_RE.search(line, 0, 80)
+    if m:
+        return _LEVELS[m.group(1)]
+    if prefix == 'stderr' and line.startswith('Traceback'):
+        return logging.ERROR
+    return logging.DEBUG
+
+
+class AgentOutputPipeline:
+    """
+    单个 Agent 进程的输出管道。
+    只在事件循环线程中使用：读取任务把行放入缓冲区，刷新任务按批写入日志。
+    """
+
+    BATCH_LINES = 100  # 缓冲区达到该行数时立即刷新
+    FLUSH_INTERVAL = 0.2  # 最长刷新间隔（秒）
+    MAX_BUFFERED = 2000  # 缓冲区上限，超过后丢弃低级别输出
+    MAX_LINES_PER_SECOND = 500  # 每秒写入日志的行数上限，WARNING 及以上级别不受限制
+
+    def __init__(self, device_name: str, logger, min_level: int = logging.DEBUG):
+        self.device_name = device_name
+        self.logger = logger
+        self.min_level = min_level
+        self._buffer: Deque[Tuple[int, str]] = deque()
+        self._wakeup = asyncio.Event()
+        self._readers: List[asyncio.Task] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._window_started = time.monotonic()
+        self._window_lines = 0
+        self._dropped_since_flush = 0
+        self.stats: Dict[str, int] = {'lines': 0, 'emitted': 0, 'filtered': 0, 'dropped': 0, 'batches': 0}
+
+    def attach(self, process: asyncio.subprocess.Process):
+        """开始读取进程的 stdout 与 stderr"""
+        for stream, prefix in ((process.stdout, 'stdout'), (process.stderr, 'stderr')):
+            if stream is not None:
+                self._readers.append(asyncio.ensure_future(self._read(stream, prefix)))
+        self._flusher = asyncio.ensure_future(self._flush_loop())
+
+    async def close(self, timeout: float = 1.0):
+        """等待输出读完并写入日志；超时后（例如子进程仍持有管道）取消读取"""
+        if self._readers:
+            _, pending = await asyncio.wait(self._readers, timeout=timeout)
+            for task in pending:
+                task.cancel()
+        if self._flusher is not None:
+            self._wakeup.set()
+            try:
+                await asyncio.wait_for(asyncio.shield(self._flusher), timeout=timeout)
+            except asyncio.TimeoutError:
+                self._flusher.cancel()
+                self._flush()
+
+    # === 读取 ===
+
+    async def _read(self, stream: asyncio.StreamReader, prefix: str):
+        while True:
+            try:
+                raw = await stream.readline()
+            except ValueError:
+                # 单行超过流缓冲上限，该行已被丢弃
+                self._drop()
+                continue
+            except Exception as e:
+                self.logger.warning(f"读取 Agent {prefix} 输出异常: {e}")
+                return
+            if not raw:
+                return
+            line = raw.decode('utf-8', errors='replace').rstrip()
+            if line:
+                self._accept(prefix, line)
+
+    def _accept(self, prefix: str, line: str):
+        self.stats['lines'] += 1
+        level = detect_line_level(line, prefix)
+        if level < self.min_level:
+            self.stats['filtered'] += 1
+            return
+
+        if level < logging.WARNING:
+            now = time.monotonic()
+            if now - self._window_started >= 1.0:
+                self._window_started = now
+                self._window_lines = 0
+            if self._window_lines >= self.MAX_LINES_PER_SECOND or len(self._buffer) >= self.MAX_BUFFERED:
+                self._drop()
+                return
+            self._window_lines += 1
+        elif len(self._buffer) >= self.MAX_BUFFERED:
+            # 缓冲区已满时为高级别输出腾出位置，丢弃最早的一行
+            self._buffer.popleft()
+            self._drop()
+
+        self._buffer.append((level, f"[Agent {prefix}] {line}"))
+        if len(self._buffer) >= self.BATCH_LINES:
+            self._wakeup.set()
+
+    def _drop(self):
+        self.stats['dropped'] += 1
+        self._dropped_since_flush += 1
+
+    # === 刷新 ===
+
+    async def _flush_loop(self):
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.FLUSH_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                self._flush()
+                if self._readers and all(task.done() for task in self._readers):
+                    self._flush()
+                    return
+                # 让出事件循环，单次刷新不会长期占用
+                await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            self._flush()
+            raise
+
+    def _flush(self):
+        if not self._buffer and not self._dropped_since_flush:
+            return
+        lines, self._buffer = self._buffer, deque()
+        for level, message in lines:
+            self.logger.log(level, message)
+        self.stats['emitted'] += len(lines)
+        self.stats['batches'] += 1
+        if self._dropped_since_flush:
+            self.logger.warning(f"[Agent] 输出过快，已省略 {self._dropped_since_flush} 行")
+            self._dropped_since_flush = 0
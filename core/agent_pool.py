@@ -0,0 +1,428 @@
+# -*- coding: UTF-8 -*-
+"""
+Agent 进程池
+- 预热: 按 (资源, Python 解释器, 设备, 启动参数) 预先启动 Agent 进程，提前完成解释器启动与依赖导入。
+- 租用: 任务租用一个已预热的进程，并以该进程的标识创建新的 AgentClient 完成握手。
+- 回收: MaaAgentServer 在客户端断开后即退出，因此每个进程只服务一次，归还后后台补充新的预热进程。
+- 健康检查: 后台定期移除已崩溃、空闲过久或超过最长存活时间的预热进程，并补齐预热数量。
+- 僵尸进程防护: 使用 Windows Job Object 强制管理子进程生命周期。
+- 输出: 以异步子进程启动 Agent，输出经 AgentOutputPipeline 批量写入设备日志，不再为每个进程启动读取线程。
+"""
+
+import asyncio
+import ctypes
+import os
+import subprocess
+import time
+import uuid
+from ctypes import wintypes
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Dict, List, Tuple
+
+from app.models.config.global_config import global_config
+from app.models.logging.log_manager import log_manager
+from core.agent_output import AgentOutputPipeline, parse_level_name
+
+
+@dataclass(frozen=True)
+class AgentSpec:
+    """Agent 进程的启动规格，同时作为进程池的键"""
+    resource_name: str
+    python_exe: str
+    device_name: str
+    agent_path: str
+    agent_params: Tuple[str, ...] = ()
+    # Agent 脚本与依赖文件的修改时间，资源更新后旧的预热进程不再匹配
+    code_stamp: Tuple[int, ...] = ()
+
+    @classmethod
+    def create(cls, resource_name: str, python_exe: str, device_name: str, resource_path: str,
+               agent_config) -> 'AgentSpec':
+        agent_full_path = Path(resource_path) / agent_config.agent_path
+        stamp_files = [agent_full_path]
+        if agent_config.requirements_path:
+            stamp_files.append(Path(resource_path) / agent_config.requirements_path)
+        code_stamp = []
+        for file in stamp_files:
+            try:
+                code_stamp.append(file.stat().st_mtime_ns)
+            except OSError:
+                code_stamp.append(0)
+        return cls(
+            resource_name=resource_name,
+            python_exe=str(python_exe),
+            device_name=device_name,
+            agent_path=str(agent_full_path),
+            agent_params=tuple(agent_config.agent_params.split()) if agent_config.agent_params else (),
+            code_stamp=tuple(code_stamp),
+        )
+
+    def build_command(self, identifier: str) -> List[str]:
+        cmd = [self.python_exe, "-u", self.agent_path]
+        cmd.extend(self.agent_params)
+        cmd.extend(["-device", self.device_name, "-id", identifier])
+        return cmd
+
+
+class PooledAgent:
+    """进程池中的一个 Agent 进程"""
+
+    def __init__(self, spec: AgentSpec, identifier: str, process: asyncio.subprocess.Process, job_handle=None,
+                 output: Optional[AgentOutputPipeline] = None):
+        self.spec = spec
+        self.identifier = identifier
+        self.process = process
+        self.job_handle = job_handle
+        self.output = output
+        self.spawned_at = time.monotonic()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    @property
+    def alive(self) -> bool:
+        return self.process.returncode is None
+
+    @property
+    def returncode(self) -> Optional[int]:
+        return self.process.returncode
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.spawned_at
+
+
+def _assign_job_object(process, logger):
+    """
+    为 Agent 子进程配置 Windows Job Object，返回 Job 句柄（失败或非 Windows 时返回 None）。
+    使用精确的结构体定义，并处理继承冲突。
+    """
+    if os.name != 'nt' or not process:
+        return None
+
+    job_handle = None
+    try:
+        # 1. 创建 Job Object
+        job_handle = ctypes.windll.kernel32.CreateJobObjectW(None, None)
+        if not job_handle:
+            logger.warning(f"Agent Job Object 创建失败: {ctypes.GetLastError()}")
+            return None
+
+        # 2. 定义精确的结构体 (使用 IO_COUNTERS 而非 c_void_p)
+        JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE = 0x2000
+
+        class IO_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ('ReadOperationCount', ctypes.c_ulonglong),
+                ('WriteOperationCount', ctypes.c_ulonglong),
+                ('OtherOperationCount', ctypes.c_ulonglong),
+                ('ReadTransferCount', ctypes.c_ulonglong),
+                ('WriteTransferCount', ctypes.c_ulonglong),
+                ('OtherTransferCount', ctypes.c_ulonglong),
+            ]
+
+        class JOBOBJECT_BASIC_LIMIT_INFORMATION(ctypes.Structure):
+            _fields_ = [
+                ('PerProcessUserTimeLimit', wintypes.LARGE_INTEGER),
+                ('PerJobUserTimeLimit', wintypes.LARGE_INTEGER),
+                ('LimitFlags', wintypes.DWORD),
+                ('MinimumWorkingSetSize', ctypes.c_size_t),
+                ('MaximumWorkingSetSize', ctypes.c_size_t),
+                ('ActiveProcessLimit', wintypes.DWORD),
+                ('Affinity', ctypes.c_size_t),
+                ('PriorityClass', wintypes.DWORD),
+                ('SchedulingClass', wintypes.DWORD),
+            ]
+
+        class JOBOBJECT_EXTENDED_LIMIT_INFORMATION(ctypes.Structure):
+            _fields_ = [
+                ('BasicLimitInformation', JOBOBJECT_BASIC_LIMIT_INFORMATION),
+                ('IoInfo', IO_COUNTERS),  # 这里必须是精确的 IO_COUNTERS 结构
+                ('ProcessMemoryLimit', ctypes.c_size_t),
+                ('JobMemoryLimit', ctypes.c_size_t),
+                ('PeakProcessMemoryUsed', ctypes.c_size_t),
+                ('PeakJobMemoryUsed', ctypes.c_size_t),
+            ]
+
+        # 3. 配置属性
+        info = JOBOBJECT_EXTENDED_LIMIT_INFORMATION()
+        info.BasicLimitInformation.LimitFlags = JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE
+
+        res = ctypes.windll.kernel32.SetInformationJobObject(
+            job_handle,
+            9,  # JobObjectExtendedLimitInformation
+            ctypes.pointer(info),
+            ctypes.sizeof(JOBOBJECT_EXTENDED_LIMIT_INFORMATION)
+        )
+
+        if not res:
+            err_code = ctypes.GetLastError()
+            logger.warning(f"无法设置 Agent Job Object 属性 (Error Code: {err_code})")
+            ctypes.windll.kernel32.CloseHandle(job_handle)
+            return None
+
+        # 4. 获取子进程句柄并绑定
+        PROCESS_ALL_ACCESS = 0x1FFFFF
+        process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, False, process.pid)
+
+        if not process_handle:
+            logger.warning(f"无法获取 Agent 进程句柄 (PID: {process.pid})")
+            return job_handle
+
+        try:
+            success = ctypes.windll.kernel32.AssignProcessToJobObject(job_handle, process_handle)
+            if not success:
+                # 处理 Job 冲突：
+                # 如果返回 False (Error 5: Access Denied)，通常因为主程序 (main.py) 已经把这个子进程
+                # 纳入了全局 Job Object。这是好事，说明主程序的防护生效了。
+                # 我们不需要再创建一个独立的 Job，直接忽略即可。
+                err = ctypes.GetLastError()
+                if err == 5:  # ERROR_ACCESS_DENIED
+                    logger.info(f"Agent (PID: {process.pid}) 已由全局主程序 Job Object 管理 (跳过独立绑定)。")
+                    ctypes.windll.kernel32.CloseHandle(job_handle)
+                    job_handle = None
+                else:
+                    logger.debug(f"绑定 Job Object 失败 (Code: {err})")
+            else:
+                logger.info(f"Agent (PID: {process.pid}) 已成功绑定到独立 Job Object")
+        finally:
+            ctypes.windll.kernel32.CloseHandle(process_handle)
+        return job_handle
+
+    except Exception as e:
+        logger.error(f"设置 Agent Job Object 时发生错误: {e}")
+        return job_handle
+
+
+class AgentProcessPool:
+    """
+    Agent 进程池。
+    所有公开方法都在事件循环线程中调用；进程的启动与回收放入线程池执行。
+    """
+
+    DEFAULT_POOL_SIZE = 1  # 每个规格保持的预热进程数量，0表示不预热
+    DEFAULT_MAX_IDLE = 600  # 规格最近一次使用后保持预热的时间（秒）
+    DEFAULT_MAX_LIFETIME = 3600  # 预热进程的最长存活时间（秒），超过后替换为新进程
+    HEALTH_CHECK_INTERVAL = 5.0
+
+    def __init__(self):
+        self._idle: Dict[AgentSpec, List[PooledAgent]] = {}
+        self._last_used: Dict[AgentSpec, float] = {}
+        self._spawning: Dict[AgentSpec, int] = {}
+        self._maintain_task: Optional[asyncio.Task] = None
+        self.logger = log_manager.get_app_logger()
+        self.stats = {'leases': 0, 'warm_hits': 0, 'spawned': 0, 'recycled': 0, 'crashed': 0}
+
+    # === 配置 ===
+
+    def _settings(self) -> Tuple[int, int, int]:
+        app_config = global_config.app_config
+        size = getattr(app_config, 'agent_pool_size', self.DEFAULT_POOL_SIZE)
+        max_idle = getattr(app_config, 'agent_pool_max_idle', self.DEFAULT_MAX_IDLE)
+        max_lifetime = getattr(app_config, 'agent_pool_max_lifetime', self.DEFAULT_MAX_LIFETIME)
+        return max(0, int(size)), max(0, int(max_idle)), max(0, int(max_lifetime))
+
+    # === 租用与归还 ===
+
+    async def lease(self, spec: AgentSpec, logger=None) -> PooledAgent:
+        """租用一个 Agent 进程，优先使用预热时间最长的进程，没有可用进程时立即启动新进程"""
+        logger = logger or self.logger
+        self.stats['leases'] += 1
+        self._last_used[spec] = time.monotonic()
+
+        agent = None
+        idle = self._idle.get(spec, [])
+        while idle:
+            candidate = idle.pop(0)
+            if candidate.alive:
+                agent = candidate
+                break
+            self.stats['crashed'] += 1
+            await self._retire(candidate)
+
+        if agent is not None:
+            self.stats['warm_hits'] += 1
+            logger.info(f"使用已预热的 Agent 进程 (PID: {agent.pid}，已预热 {agent.age:.1f} 秒)")
+        else:
+            # 租用方可能在进程启动期间被取消（例如并行的准备阶段失败），此时新进程转为预热进程而不是泄漏
+            spawn = asyncio.ensure_future(self._spawn(spec, logger))
+            try:
+                agent = await asyncio.shield(spawn)
+            except asyncio.CancelledError:
+                spawn.add_done_callback(self._adopt_orphan)
+                raise
+
+        self._ensure_maintainer()
+        self._schedule_replenish(spec)
+        return agent
+
+    async def release(self, agent: Optional[PooledAgent]):
+        """归还租用的 Agent 进程。进程在客户端断开后不可再次连接，因此直接回收"""
+        if agent is None:
+            return
+        self._last_used[agent.spec] = time.monotonic()
+        await self._retire(agent)
+
+    def discard_now(self, agent: Optional[PooledAgent]):
+        """同步强制结束进程，用于任务被取消时的紧急清理（不等待进程退出）"""
+        if agent is None:
+            return
+        try:
+            if agent.alive:
+                agent.process.kill()
+        except Exception as e:
+            self.logger.debug(f"结束 Agent 进程时出错 (通常忽略): {e}")
+        self._close_job(agent)
+        self._forget_process(agent)
+
+    async def shutdown(self):
+        """停止后台维护并回收所有预热进程"""
+        if self._maintain_task and not self._maintain_task.done():
+            self._maintain_task.cancel()
+        self._maintain_task = None
+        agents = [agent for agents in self._idle.values() for agent in agents]
+        self._idle.clear()
+        self._last_used.clear()
+        for agent in agents:
+            await self._retire(agent)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, 'idle': sum(len(agents) for agents in self._idle.values())}
+
+    # === 进程管理 ===
+
+    async def _spawn(self, spec: AgentSpec, logger) -> PooledAgent:
+        identifier = uuid.uuid4().hex
+        cmd = spec.build_command(identifier)
+        logger.debug(f"Agent启动命令: {' '.join(cmd)}")
+
+        agent_env = os.environ.copy()
+        agent_env["PYTHONUTF8"] = "1"
+        common_kwargs = dict(cwd=os.getcwd(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=agent_env)
+        if os.name == 'nt':
+            # 注意：CREATE_NEW_PROCESS_GROUP 允许发送信号，但通常不影响 Job 继承
+            process = await asyncio.create_subprocess_exec(
+                *cmd, creationflags=subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.CREATE_NO_WINDOW,
+                **common_kwargs)
+        else:
+            process = await asyncio.create_subprocess_exec(*cmd, preexec_fn=os.setsid, **common_kwargs)
+        logger.info(f"Agent进程已启动，PID: {process.pid}")
+
+        # 输出管道立即开始读取，避免 Agent 启动期间的输出填满管道
+        output = AgentOutputPipeline(spec.device_name, log_manager.get_device_logger(spec.device_name),
+                                     self._output_level(spec.device_name))
+        output.attach(process)
+
+        loop = asyncio.get_event_loop()
+        job_handle = await loop.run_in_executor(None, _assign_job_object, process, logger)
+
+        if not hasattr(global_config, "agent_processes"): global_config.agent_processes = []
+        global_config.agent_processes.append(process)
+        self.stats['spawned'] += 1
+        return PooledAgent(spec, identifier, process, job_handle, output)
+
+    @staticmethod
+    def _output_level(device_name: str) -> int:
+        device_config = global_config.get_device_config(device_name)
+        return parse_level_name(getattr(device_config, 'agent_log_level', None))
+
+    async def _retire(self, agent: PooledAgent):
+        """强制结束进程并关闭 Job 句柄：即使进程未能退出，Job Object 也会由操作系统收割"""
+        process = agent.process
+        try:
+            if agent.alive:
+                process.kill()
+            await asyncio.wait_for(process.wait(), timeout=5.0)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"等待 Agent 进程 (PID: {process.pid}) 结束超时")
+        except Exception as e:
+            self.logger.debug(f"结束 Agent 进程时出错 (通常忽略): {e}")
+
+        self._close_job(agent)
+        self._forget_process(agent)
+        if agent.output is not None:
+            await agent.output.close()
+
+    def _close_job(self, agent: PooledAgent):
+        if agent.job_handle:
+            try:
+                ctypes.windll.kernel32.CloseHandle(agent.job_handle)
+            except Exception as e:
+                self.logger.error(f"关闭 Job Handle 失败: {e}")
+            agent.job_handle = None
+
+    @staticmethod
+    def _forget_process(agent: PooledAgent):
+        if hasattr(global_config, "agent_processes") and agent.process in global_config.agent_processes:
+            global_config.agent_processes.remove(agent.process)
+
+    # === 预热与维护 ===
+
+    def _adopt_orphan(self, spawn: asyncio.Future):
+        if spawn.cancelled() or spawn.exception() is not None:
+            return
+        agent = spawn.result()
+        if len(self._idle.get(agent.spec, [])) < self._settings()[0]:
+            self._idle.setdefault(agent.spec, []).append(agent)
+        else:
+            asyncio.ensure_future(self._retire(agent))
+
+    def _schedule_replenish(self, spec: AgentSpec):
+        size, _, _ = self._settings()
+        missing = size - len(self._idle.get(spec, [])) - self._spawning.get(spec, 0)
+        for _ in range(max(0, missing)):
+            self._spawning[spec] = self._spawning.get(spec, 0) + 1
+            asyncio.ensure_future(self._warm_one(spec))
+
+    async def _warm_one(self, spec: AgentSpec):
+        try:
+            agent = await self._spawn(spec, log_manager.get_device_logger(spec.device_name))
+            if spec in self._last_used:
+                self._idle.setdefault(spec, []).append(agent)
+            else:
+                await self._retire(agent)
+        except Exception as e:
+            self.logger.warning(f"预热 Agent 进程失败 ({spec.resource_name}/{spec.device_name}): {e}")
+        finally:
+            self._spawning[spec] = max(0, self._spawning.get(spec, 1) - 1)
+
+    def _ensure_maintainer(self):
+        if self._maintain_task is None or self._maintain_task.done():
+            self._maintain_task = asyncio.ensure_future(self._maintain_loop())
+
+    async def _maintain_loop(self):
+        """后台健康检查：替换崩溃与超龄进程，停止预热长期未使用的规格"""
+        while self._last_used or any(self._idle.values()):
+            await asyncio.sleep(self.HEALTH_CHECK_INTERVAL)
+            _, max_idle, max_lifetime = self._settings()
+            now = time.monotonic()
+            for spec in list(self._idle.keys() | self._last_used.keys()):
+                expired = max_idle and now - self._last_used.get(spec, 0) > max_idle
+                # 先同步地挑出需要退役的进程，再统一 await，避免与 lease()/_warm_one 并发修改同一列表
+                idle = self._idle.get(spec, [])
+                retire = []
+                for agent in idle:
+                    if not agent.alive:
+                        self.stats['crashed'] += 1
+                        self.logger.warning(f"预热的 Agent 进程已退出 (PID: {agent.pid})，将在后台替换")
+                        retire.append(agent)
+                    elif expired or (max_lifetime and agent.age > max_lifetime):
+                        self.stats['recycled'] += 1
+                        retire.append(agent)
+                # 原地移除，正在 lease() 中遍历同一列表的调用方也不会再拿到这些进程
+                for agent in retire:
+                    idle.remove(agent)
+                if expired:
+                    self._idle.pop(spec, None)
+                    self._last_used.pop(spec, None)
+                for agent in retire:
+                    await self._retire(agent)
+                if expired:
+                    continue
+                self._schedule_replenish(spec)
+
+
+# 创建全局实例
+agent_pool = AgentProcessPool()
@@ -0,0 +1,216 @@
+# -*- coding: UTF-8 -*-
+"""
+阻塞调用调度器
+- 进程级共享: 所有执行器共用固定数量的工作线程，不再为每个执行器创建线程池。
+- 分道: 长调用（job.wait、资源加载、Agent 连接）与短调用（截图、连接、查找进程等）使用独立的线程，
+  长时间运行的任务不会占满短调用所需的线程。
+- 公平: 每条通道内按设备轮转派发，并限制单个设备同时占用的线程数，避免一个设备挤占其他设备。
+- 弹性: 长调用通道与控制通道按有调用的设备数量扩容，每个设备至少能占用各自的线程配额，
+  同时运行的设备再多也不会排在其他设备可能持续数小时的 job.wait 之后。
+- 控制通道: 停止任务、断开 Agent 等调用单独一条通道，不会被长调用占满。
+- 可观测: 提供排队深度、运行数量与等待时间等指标。
+"""
+
+import asyncio
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Any, Deque, Dict, Optional
+
+from app.models.logging.log_manager import log_manager
+
+LONG = "long"
+SHORT = "short"
+CONTROL = "control"
+
+
+@dataclass
+class _PendingCall:
+    func: Callable[..., Any]
+    args: tuple
+    future: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class BlockingLane:
+    """
+    单条调度通道。
+    只在事件循环线程中调度，工作线程只负责执行阻塞调用。
+    """
+
+    MAX_ELASTIC_THREADS = 256  # 弹性通道的线程上限，线程按需创建
+
+    def __init__(self, name: str, workers: int, per_device_limit: int, elastic: bool = False):
+        self.name = name
+        self.workers = workers
+        self.per_device_limit = per_device_limit
+        self.elastic = elastic  # 弹性通道：并发数随有调用的设备数量增长
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # 设备名 -> 待执行的调用；有序字典的顺序即轮转顺序
+        self._pending: "OrderedDict[str, Deque[_PendingCall]]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self.stats = {'submitted': 0, 'completed': 0, 'cancelled': 0,
+                      'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'total_run_seconds': 0.0}
+
+    @property
+    def active(self) -> int:
+        return sum(self._running.values())
+
+    @property
+    def capacity(self) -> int:
+        """当前允许同时执行的调用数量"""
+        if not self.elastic:
+            return self.workers
+        devices = len(self._running.keys() | self._pending.keys())
+        return min(self.MAX_ELASTIC_THREADS, max(self.workers, devices * self.per_device_limit))
+
+    @property
+    def queued(self) -> int:
+        return sum(len(calls) for calls in self._pending.values())
+
+    async def run(self, device_name: str, func: Callable[..., Any], *args) -> Any:
+        future = asyncio.get_event_loop().create_future()
+        self._pending.setdefault(device_name, deque()).append(_PendingCall(func, args, future))
+        self.stats['submitted'] += 1
+        self._dispatch()
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if not future.done():
+                # 仍在排队时直接撤销；已在线程中执行的调用无法中断，结束后自然释放线程
+                future.cancel()
+                self.stats['cancelled'] += 1
+            raise
+
+    def shutdown(self):
+        for calls in self._pending.values():
+            for call in calls:
+                if not call.future.done():
+                    call.future.cancel()
+        self._pending.clear()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        completed = self.stats['completed']
+        return {
+            **self.stats,
+            'workers': self.workers,
+            'capacity': self.capacity,
+            'active': self.active,
+            'queued': self.queued,
+            'queued_by_device': {name: len(calls) for name, calls in self._pending.items() if calls},
+            'running_by_device': dict(self._running),
+            'avg_wait_seconds': self.stats['total_wait_seconds'] / completed if completed else 0.0,
+        }
+
+    # === 内部实现 ===
+
+    def _dispatch(self):
+        """在有空闲线程时按设备轮转派发排队的调用"""
+        while self.active < self.capacity:
+            call_device = self._next_device()
+            if call_device is None:
+                return
+            device_name, call = call_device
+            self._start(device_name, call)
+
+    def _next_device(self):
+        for device_name in list(self._pending):
+            calls = self._pending[device_name]
+            while calls and calls[0].future.done():
+                calls.popleft()  # 已被取消的调用
+            if not calls:
+                del self._pending[device_name]
+                continue
+            if self._running.get(device_name, 0) >= self.per_device_limit:
+                continue
+            call = calls.popleft()
+            # 轮转: 派发后把该设备移到队尾
+            self._pending.move_to_end(device_name)
+            if not calls:
+                del self._pending[device_name]
+            return device_name, call
+        return None
+
+    def _start(self, device_name: str, call: _PendingCall):
+        if self._pool is None:
+            max_workers = self.MAX_ELASTIC_THREADS if self.elastic else self.workers
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"Blocking_{self.name}")
+        waited = time.monotonic() - call.enqueued_at
+        self.stats['total_wait_seconds'] += waited
+        self.stats['max_wait_seconds'] = max(self.stats['max_wait_seconds'], waited)
+        self._running[device_name] = self._running.get(device_name, 0) + 1
+        started = time.monotonic()
+
+        inner = asyncio.get_event_loop().run_in_executor(self._pool, call.func, *call.args)
+
+        def on_done(done: asyncio.Future):
+            count = self._running.get(device_name, 0)
+            if count <= 1:
+                self._running.pop(device_name, None)
+            else:
+                self._running[device_name] = count - 1
+            self.stats['completed'] += 1
+            self.stats['total_run_seconds'] += time.monotonic() - started
+            if not call.future.done():
+                if done.cancelled():
+                    call.future.cancel()
+                elif done.exception() is not None:
+                    call.future.set_exception(done.exception())
+                else:
+                    call.future.set_result(done.result())
+            elif not done.cancelled():
+                done.exception()  # 等待方已取消，取出异常避免"未检索的异常"警告
+            self._dispatch()
+
+        inner.add_done_callback(on_done)
+
+
+class BlockingCallScheduler:
+    """
+    进程级阻塞调用调度器。
+    执行器通过 run_short / run_long / run_control 提交阻塞调用，调用在共享的工作线程中执行。
+    """
+
+    LONG_WORKERS = 16  # 长调用通道的基础线程数，设备更多时按 LONG_PER_DEVICE 扩容
+    SHORT_WORKERS = 6
+    CONTROL_WORKERS = 2  # 控制通道的基础线程数，设备更多时按 CONTROL_PER_DEVICE 扩容
+    LONG_PER_DEVICE = 2  # 准备阶段资源加载与 Agent 连接可同时进行
+    SHORT_PER_DEVICE = 2
+    CONTROL_PER_DEVICE = 1
+
+    def __init__(self):
+        self.logger = log_manager.get_app_logger()
+        self.lanes: Dict[str, BlockingLane] = {
+            LONG: BlockingLane(LONG, self.LONG_WORKERS, self.LONG_PER_DEVICE, elastic=True),
+            SHORT: BlockingLane(SHORT, self.SHORT_WORKERS, self.SHORT_PER_DEVICE),
+            CONTROL: BlockingLane(CONTROL, self.CONTROL_WORKERS, self.CONTROL_PER_DEVICE, elastic=True),
+        }
+
+    async def run(self, device_name: str, lane: str, func: Callable[..., Any], *args) -> Any:
+        return await self.lanes[lane].run(device_name, func, *args)
+
+    async def run_short(self, device_name: str, func: Callable[..., Any], *args) -> Any:
+        return await self.lanes[SHORT].run(device_name, func, *args)
+
+    async def run_long(self, device_name: str, func: Callable[..., Any], *args) -> Any:
+        return await self.lanes[LONG].run(device_name, func, *args)
+
+    async def run_control(self, device_name: str, func: Callable[..., Any], *args) -> Any:
+        return await self.lanes[CONTROL].run(device_name, func, *args)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: lane.get_stats() for name, lane in self.lanes.items()}
+
+    def shutdown(self):
+        """撤销排队中的调用并关闭工作线程，之后的调用会重新创建线程"""
+        for lane in self.lanes.values():
+            lane.shutdown()
+        self.logger.debug("阻塞调用调度器已关闭")
+
+
+# 创建全局实例
+blocking_scheduler = BlockingCallScheduler()
@@ -0,0 +1,241 @@
+# -*- coding: UTF-8 -*-
+"""
+设备会话管理
+- 长生命周期: 跨任务批次保持已连接的控制器、Tasker 与已绑定的资源。
+- 空闲回收: 队列处理完毕后按配置的空闲超时关闭会话。
+- 健康探测: 复用前通过截图探测控制器，失败则丢弃会话内组件并重新连接。
+- 统计信息: 记录建立连接次数与避免的重连次数等指标。
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, asdict
+from typing import Optional, Dict, Any, Union, Callable, Awaitable, Tuple
+
+from maa.controller import AdbController, Win32Controller
+from maa.resource import Resource
+from maa.tasker import Tasker
+
+from app.models.config.app_config import DeviceConfig, DeviceType
+from app.models.config.global_config import global_config
+from app.models.logging.log_manager import log_manager
+from core.resource_cache import resource_cache, ResourceLease
+
+
+@dataclass
+class SessionMetrics:
+    """单个设备会话的统计指标"""
+    batches: int = 0  # 使用该会话执行过的任务批次数
+    connects: int = 0  # 实际建立控制器连接的次数
+    reconnects_avoided: int = 0  # 复用已连接控制器而避免的重连次数
+    tasker_reuses: int = 0  # 复用 Tasker 的次数
+    tasker_rebuilds: int = 0  # 重建 Tasker 的次数
+    probe_failures: int = 0  # 健康探测失败的次数
+
+    def to_dict(self) -> Dict[str, int]:
+        return asdict(self)
+
+
+def controller_fingerprint(device_config: DeviceConfig) -> Tuple:
+    """根据设备配置生成控制器指纹，配置变化时会话中的控制器将被丢弃"""
+    cfg = device_config.controller_config
+    if device_config.device_type == DeviceType.ADB:
+        return (DeviceType.ADB.value, cfg.adb_path, cfg.address, cfg.screencap_methods, cfg.input_methods,
+                repr(sorted(cfg.config.items())) if isinstance(cfg.config, dict) else repr(cfg.config))
+    return (device_config.device_type.value, getattr(cfg, 'hWnd', None))
+
+
+class DeviceSession:
+    """
+    单个设备的长生命周期会话。
+    同一时间只会被该设备的一个任务处理器使用，因此内部不加锁。
+    """
+
+    def __init__(self, device_name: str):
+        self.device_name = device_name
+        self.logger = log_manager.get_device_logger(device_name)
+
+        self.controller: Optional[Union[AdbController, Win32Controller]] = None
+        self.controller_key: Optional[Tuple] = None
+        self.tasker: Optional[Tasker] = None
+        self.resource_lease: Optional[ResourceLease] = None
+        self.resource_key: Optional[Tuple] = None
+        # 绑定在 Tasker 上的通知处理器，随 Tasker 一起复用
+        self.event_sink = None
+
+        self.metrics = SessionMetrics()
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.in_use = False
+        self.closed = False
+        self._idle_handle: Optional[asyncio.TimerHandle] = None
+
+    # === 状态查询 ===
+
+    @property
+    def is_connected(self) -> bool:
+        return self.controller is not None and self.controller.connected
+
+    @property
+    def resource(self) -> Optional[Resource]:
+        return self.resource_lease.resource if self.resource_lease else None
+
+    def has_tasker_for(self, resource_key: Tuple, exclusive: bool = False) -> bool:
+        """会话中的 Tasker 是否已经绑定了指定的资源（需要独占时，持有的租约也必须是独占的）"""
+        return (self.tasker is not None and self.tasker.inited and self.resource_lease is not None
+                and self.resource_key == resource_key and (self.resource_lease.exclusive or not exclusive))
+
+    async def probe(self, run_blocking: Callable[..., Awaitable[Any]]) -> bool:
+        """
+        健康探测：控制器仍处于连接状态且能成功截图。
+
+        Args:
+            run_blocking: 在线程池中执行阻塞调用的协程函数
+        """
+        if not self.is_connected:
+            return False
+        controller = self.controller
+        try:
+            succeeded = await run_blocking(lambda: controller.post_screencap().wait().succeeded)
+        except Exception as e:
+            self.logger.warning(f"会话健康探测异常: {e}")
+            succeeded = False
+        if not succeeded:
+            self.metrics.probe_failures += 1
+        return bool(succeeded)
+
+    # === 组件管理 ===
+
+    def attach_controller(self, controller: Union[AdbController, Win32Controller], controller_key: Tuple):
+        """保存新建立的控制器连接，旧的 Tasker 因绑定了旧控制器而一并失效"""
+        self.drop_tasker()
+        self.controller = controller
+        self.controller_key = controller_key
+        self.metrics.connects += 1
+
+    def attach_tasker(self, tasker: Tasker, lease: ResourceLease, resource_key: Tuple):
+        """保存新建的 Tasker 及其绑定的资源租约"""
+        self.drop_tasker()
+        self.tasker = tasker
+        self.resource_lease = lease
+        self.resource_key = resource_key
+        self.metrics.tasker_rebuilds += 1
+
+    def drop_tasker(self):
+        """丢弃 Tasker 并归还资源租约，但保留控制器连接"""
+        self.tasker = None
+        resource_cache.release(self.resource_lease)
+        self.resource_lease = None
+        self.resource_key = None
+        self.event_sink = None
+
+    def invalidate(self, reason: str):
+        """丢弃会话内的所有 MAA 组件，下次使用时将重新连接"""
+        if self.controller is not None or self.tasker is not None:
+            self.logger.info(f"设备会话已失效: {reason}")
+        self.drop_tasker()
+        self.controller = None
+        self.controller_key = None
+
+    def touch(self):
+        self.last_used = time.time()
+
+    def close(self, reason: str = "会话关闭"):
+        """关闭会话，释放所有组件"""
+        self.cancel_idle_timer()
+        self.invalidate(reason)
+        self.closed = True
+
+    # === 空闲回收 ===
+
+    def cancel_idle_timer(self):
+        if self._idle_handle is not None:
+            self._idle_handle.cancel()
+            self._idle_handle = None
+
+    def schedule_idle_close(self, timeout: float, on_expired: Callable[['DeviceSession'], None]):
+        self.cancel_idle_timer()
+        loop = asyncio.get_event_loop()
+        self._idle_handle = loop.call_later(timeout, on_expired, self)
+
+
+class DeviceSessionManager:
+    """
+    设备会话管理器 - 按设备名维护长生命周期的 DeviceSession。
+    会话在任务处理器启动时获取，在队列处理完毕后释放并进入空闲计时。
+    """
+
+    DEFAULT_IDLE_TIMEOUT = 300
+
+    def __init__(self):
+        self._sessions: Dict[str, DeviceSession] = {}
+        self.logger = log_manager.get_app_logger()
+
+    def _get_idle_timeout(self) -> int:
+        try:
+            return int(global_config.get_app_config().device_session_idle_timeout)
+        except (ValueError, TypeError):
+            return self.DEFAULT_IDLE_TIMEOUT
+
+    def acquire(self, device_name: str) -> DeviceSession:
+        """获取设备会话，不存在或已关闭时创建新的会话"""
+        session = self._sessions.get(device_name)
+        if session is None or session.closed:
+            session = DeviceSession(device_name)
+            self._sessions[device_name] = session
+            self.logger.debug(f"为设备 {device_name} 创建新的设备会话")
+        else:
+            session.cancel_idle_timer()
+            self.logger.debug(f"设备 {device_name} 复用已有设备会话")
+        session.in_use = True
+        session.touch()
+        return session
+
+    def release(self, device_name: str):
+        """释放设备会话，按空闲超时延迟关闭；超时为0时立即关闭"""
+        session = self._sessions.get(device_name)
+        if session is None:
+            return
+        session.in_use = False
+        session.touch()
+        timeout = self._get_idle_timeout()
+        self.logger.info(f"设备 {device_name} 会话统计: {session.metrics.to_dict()}")
+        if timeout <= 0 or not session.is_connected:
+            self.close(device_name, "无需保持会话")
+            return
+        session.schedule_idle_close(timeout, self._on_idle_expired)
+        self.logger.debug(f"设备 {device_name} 的会话将在空闲 {timeout} 秒后关闭")
+
+    def _on_idle_expired(self, session: DeviceSession):
+        if session.in_use or self._sessions.get(session.device_name) is not session:
+            return
+        self.close(session.device_name, f"空闲超过 {self._get_idle_timeout()} 秒")
+
+    def close(self, device_name: str, reason: str = "会话关闭"):
+        session = self._sessions.pop(device_name, None)
+        if session is not None:
+            session.close(reason)
+            self.logger.info(f"设备 {device_name} 的会话已关闭: {reason}")
+
+    def close_all(self, reason: str = "关闭所有会话"):
+        for device_name in list(self._sessions.keys()):
+            self.close(device_name, reason)
+
+    def get_session(self, device_name: str) -> Optional[DeviceSession]:
+        return self._sessions.get(device_name)
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有会话的统计指标"""
+        return {
+            name: {
+                **session.metrics.to_dict(),
+                'connected': session.is_connected,
+                'in_use': session.in_use,
+                'idle_seconds': 0 if session.in_use else int(time.time() - session.last_used),
+            }
+            for name, session in self._sessions.items()
+        }
+
+
+# 创建全局实例
+device_session_manager = DeviceSessionManager()
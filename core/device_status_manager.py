@@ -26,6 +26,8 @@ class DeviceUIInfo:
     error_message: Optional[str] = None
     task_name: Optional[str] = None
     queue_length: int = 0
+    queue_position: int = 0  # 在主机准入队列中的位置，0表示未排队
+    waiting_for: Optional[str] = None  # 正在等待的名额类型: boot (模拟器启动) / run (设备运行)
     is_connected: bool = False
     is_busy: bool = False
 
@@ -263,6 +265,8 @@ class DeviceStatusManager(QObject):
             error_message=context.get('error_message'),
             task_name=context.get('task_name'),
             queue_length=context.get('queue_length', 0),
+            queue_position=context.get('queue_position', 0),
+            waiting_for=context.get('waiting_for'),
             is_connected=(state not in [DeviceState.DISCONNECTED, DeviceState.CONNECTING]),
             is_busy=(state in [DeviceState.UPDATING, DeviceState.PREPARING,
                                DeviceState.RUNNING, DeviceState.PAUSED])
@@ -0,0 +1,170 @@
+# -*- coding: UTF-8 -*-
+"""
+设备任务队列
+- 优先级: 高优先级（如手动"立即运行"）排在积压的定时任务之前，同优先级保持先来先到。
+- 合并: 以 (设备, 资源, 配置方案) 为合并键，已在队列中的相同任务不会重复入队，
+  而是更新为最新的运行配置并提升到较高的优先级。
+- 可检查: 提供队列快照供 UI 展示，支持调整顺序与移除排队项，不影响正在执行的任务。
+"""
+
+import itertools
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import List, Optional, Dict, Any, Tuple, Union
+
+from app.models.config.global_config import RunTimeConfigs
+
+TaskPayload = Union[RunTimeConfigs, List[RunTimeConfigs]]
+CoalesceKey = Tuple[str, str, str]
+
+
+class TaskPriority(IntEnum):
+    """任务优先级，数值越大越先执行"""
+    SCHEDULED = 10  # 定时任务
+    NORMAL = 20
+    MANUAL = 30  # 手动"立即运行"
+
+
+@dataclass
+class QueuedItem:
+    """队列中的一项，对应执行器的一个任务批次"""
+    item_id: int
+    configs: List[RunTimeConfigs]
+    priority: int
+    source: str = ""
+    enqueued_at: float = field(default_factory=time.time)
+    is_batch: bool = False  # 提交时是否为列表，出队时保持原有形式
+
+    @property
+    def payload(self) -> TaskPayload:
+        return list(self.configs) if self.is_batch else self.configs[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.item_id,
+            'priority': int(self.priority),
+            'source': self.source,
+            'enqueued_at': self.enqueued_at,
+            'resources': [{'resource_name': c.resource_name, 'settings_name': c.settings_name,
+                           'task_count': len(c.task_list)} for c in self.configs],
+        }
+
+
+class DeviceTaskQueue:
+    """
+    单个设备的任务队列。
+    只在事件循环线程中使用，内部列表始终按 (优先级降序, 入队顺序) 排列。
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, device_name: str):
+        self.device_name = device_name
+        self._items: List[QueuedItem] = []
+        self.stats = {'enqueued': 0, 'coalesced': 0, 'removed': 0}
+
+    def coalesce_key(self, config: RunTimeConfigs) -> CoalesceKey:
+        return self.device_name, config.resource_name, config.settings_name
+
+    # === 入队与出队 ===
+
+    def put(self, payload: TaskPayload, priority: int = TaskPriority.NORMAL,
+            source: str = "") -> Tuple[Optional[QueuedItem], int]:
+        """
+        提交任务，返回 (新入队的项, 被合并的配置数量)。
+        所有配置都已在队列中时不会产生新项，返回的项为 None。
+        """
+        is_batch = isinstance(payload, list)
+        configs = payload if is_batch else [payload]
+        remaining = []
+        coalesced = 0
+        for config in configs:
+            existing = self._find(self.coalesce_key(config))
+            if existing is None:
+                remaining.append(config)
+                continue
+            item, index = existing
+            # 使用最新的运行配置，并保证不低于新提交的优先级
+            item.configs[index] = config
+            if priority > item.priority:
+                self._items.remove(item)
+                item.priority = priority
+                self._insert(item)
+            coalesced += 1
+        self.stats['coalesced'] += coalesced
+
+        if not remaining:
+            return None, coalesced
+        item = QueuedItem(next(self._ids), remaining, int(priority), source, is_batch=is_batch)
+        self._insert(item)
+        self.stats['enqueued'] += 1
+        return item, coalesced
+
+    def pop(self) -> Optional[QueuedItem]:
+        """取出下一项，队列为空时返回 None"""
+        return self._items.pop(0) if self._items else None
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # === 检查与调整 ===
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """按执行顺序返回队列中各项的信息"""
+        return [dict(item.to_dict(), position=i + 1) for i, item in enumerate(self._items)]
+
+    def remove(self, item_id: int) -> bool:
+        item = self._get(item_id)
+        if item is None:
+            return False
+        self._items.remove(item)
+        self.stats['removed'] += 1
+        return True
+
+    def move(self, item_id: int, new_index: int) -> bool:
+        """
+        把某项移动到指定位置。
+        该项会采用新位置前一项的优先级（移到队首时采用原队首的优先级），以便后续入队的任务保持相对顺序。
+        """
+        item = self._get(item_id)
+        if item is None:
+            return False
+        self._items.remove(item)
+        new_index = max(0, min(new_index, len(self._items)))
+        neighbor = self._items[new_index - 1] if new_index > 0 else (self._items[0] if self._items else None)
+        if neighbor is not None:
+            item.priority = neighbor.priority
+        self._items.insert(new_index, item)
+        return True
+
+    def clear(self) -> int:
+        count = len(self._items)
+        self._items.clear()
+        return count
+
+    # === 内部实现 ===
+
+    def _insert(self, item: QueuedItem):
+        index = len(self._items)
+        for i, queued in enumerate(self._items):
+            if queued.priority < item.priority:
+                index = i
+                break
+        self._items.insert(index, item)
+
+    def _find(self, key: CoalesceKey) -> Optional[Tuple[QueuedItem, int]]:
+        for item in self._items:
+            for index, config in enumerate(item.configs):
+                if self.coalesce_key(config) == key:
+                    return item, index
+        return None
+
+    def _get(self, item_id: int) -> Optional[QueuedItem]:
+        return next((item for item in self._items if item.item_id == item_id), None)
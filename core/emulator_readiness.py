@@ -0,0 +1,173 @@
+# -*- coding: UTF-8 -*-
+"""
+模拟器就绪探测
+- 就绪探测: 依次检查 ADB 设备状态、系统启动完成属性与开机动画状态，就绪后立即返回。
+- 指数退避: 探测间隔从短到长递增，避免刚启动时频繁调用 adb。
+- 启动时间学习: 按设备记录历史启动耗时 (EWMA)，据此设置探测超时。
+"""
+
+import asyncio
+import json
+import os
+import subprocess
+import threading
+import time
+from typing import Optional, Dict, Any, Callable, Awaitable, List
+
+from app.config.config_manager import get_config_directory
+from app.models.logging.log_manager import log_manager
+
+RunBlocking = Callable[..., Awaitable[Any]]
+
+
+class ExponentialBackoff:
+    """指数退避间隔生成器"""
+
+    def __init__(self, initial: float = 0.5, factor: float = 1.6, maximum: float = 5.0):
+        self.initial = initial
+        self.factor = factor
+        self.maximum = maximum
+        self._current = initial
+
+    def next_delay(self) -> float:
+        delay = self._current
+        self._current = min(self.maximum, self._current * self.factor)
+        return delay
+
+    def reset(self):
+        self._current = self.initial
+
+
+class BootTimeHistory:
+    """
+    设备启动耗时历史。
+    以指数加权移动平均记录每个设备从执行启动命令到可用的耗时，持久化到配置目录。
+    """
+
+    FILE_NAME = "emulator_boot_history.json"
+    ALPHA = 0.3  # 新样本的权重
+    MIN_TIMEOUT = 60
+    MAX_TIMEOUT = 600
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Optional[Dict[str, Dict[str, float]]] = None
+        self.logger = log_manager.get_app_logger()
+
+    def _path(self) -> str:
+        return os.path.join(get_config_directory(), self.FILE_NAME)
+
+    def _load(self) -> Dict[str, Dict[str, float]]:
+        if self._data is None:
+            try:
+                with open(self._path(), 'r', encoding='utf-8') as f:
+                    self._data = json.load(f)
+            except FileNotFoundError:
+                self._data = {}
+            except Exception as e:
+                self.logger.warning(f"读取模拟器启动历史失败，将重新记录: {e}")
+                self._data = {}
+        return self._data
+
+    def expected(self, device_name: str, default: float) -> float:
+        """设备的预期启动耗时（秒），无历史记录时返回默认值"""
+        with self._lock:
+            entry = self._load().get(device_name)
+        return float(entry['ewma']) if entry else float(default)
+
+    def timeout_for(self, device_name: str, default: float) -> float:
+        """根据预期启动耗时计算探测超时，为慢启动留出充足余量"""
+        expected = self.expected(device_name, default)
+        return min(self.MAX_TIMEOUT, max(self.MIN_TIMEOUT, expected * 3, expected + 60))
+
+    def record(self, device_name: str, seconds: float):
+        """记录一次启动耗时并持久化"""
+        with self._lock:
+            data = self._load()
+            entry = data.get(device_name)
+            if entry:
+                entry['ewma'] = self.ALPHA * seconds + (1 - self.ALPHA) * entry['ewma']
+                entry['samples'] = int(entry.get('samples', 0)) + 1
+            else:
+                entry = data[device_name] = {'ewma': seconds, 'samples': 1}
+            entry['last'] = seconds
+            snapshot = json.dumps(data, ensure_ascii=False, indent=2)
+        try:
+            path = self._path()
+            tmp_path = path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            self.logger.warning(f"保存模拟器启动历史失败: {e}")
+
+
+class EmulatorReadinessProber:
+    """通过 adb 探测模拟器是否已启动完成"""
+
+    COMMAND_TIMEOUT = 5
+
+    def __init__(self, adb_path: str, address: str, run_blocking: RunBlocking, logger=None):
+        self.adb_path = adb_path
+        self.address = address
+        self.run_blocking = run_blocking
+        self.logger = logger or log_manager.get_app_logger()
+
+    def _adb(self, *args: str) -> Optional[str]:
+        """执行 adb 命令，失败或超时返回 None"""
+        cmd: List[str] = [self.adb_path, *args]
+        kwargs: Dict[str, Any] = {}
+        if os.name == 'nt':
+            kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='replace',
+                                    timeout=self.COMMAND_TIMEOUT, **kwargs)
+        except (subprocess.TimeoutExpired, OSError):
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip()
+
+    def _probe_once(self) -> str:
+        """
+        执行一次探测，返回当前所处阶段:
+        offline (adb 未识别设备) / booting (系统启动中) / ready (启动完成)
+        """
+        state = self._adb("-s", self.address, "get-state")
+        if state != "device":
+            if ":" in self.address:
+                # 网络地址的模拟器需要先 connect 才会出现在设备列表中
+                self._adb("connect", self.address)
+            return "offline"
+        if self._adb("-s", self.address, "shell", "getprop", "sys.boot_completed") != "1":
+            return "booting"
+        bootanim = self._adb("-s", self.address, "shell", "getprop", "init.svc.bootanim")
+        if bootanim and bootanim != "stopped":
+            return "booting"
+        return "ready"
+
+    async def wait_until_ready(self, timeout: float) -> bool:
+        """轮询直到模拟器启动完成或超时"""
+        backoff = ExponentialBackoff()
+        deadline = time.monotonic() + timeout
+        last_stage = None
+        while True:
+            stage = await self.run_blocking(self._probe_once)
+            if stage != last_stage:
+                self.logger.info({
+                    "offline": "等待 ADB 识别模拟器...",
+                    "booting": "ADB 已连接，等待系统启动完成...",
+                    "ready": "模拟器系统启动完成。",
+                }[stage])
+                last_stage = stage
+            if stage == "ready":
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.logger.warning(f"等待模拟器就绪超时（{timeout:.0f}秒），当前阶段: {stage}")
+                return False
+            await asyncio.sleep(min(backoff.next_delay(), remaining))
+
+
+# 创建全局实例
+boot_time_history = BootTimeHistory()
@@ -0,0 +1,183 @@
+# -*- coding: UTF-8 -*-
+"""
+节点通知处理器
+- 静态分派: 通知类型到协议字段的映射在模块加载时构建一次，回调中只做字典查找。
+- 无锁交接: maa 回调线程只解析消息并放入 deque，由事件循环中的排空任务批量写入设备日志，
+  回调线程不再经过完整的 logging 处理链。
+- 采样: 可按级别设置采样间隔；积压过多时丢弃 WARNING 以下的消息并在日志中汇总。
+"""
+
+import asyncio
+import logging
+import re
+from collections import deque
+from typing import Optional, Dict, Tuple, Any, Deque
+
+from maa.context import ContextEventSink
+from maa.event_sink import NotificationType
+
+_LOG_PATTERN = re.compile(r"^\[(info|debug|warning|error|critical)\](.*)", re.IGNORECASE)
+_LEVELS: Dict[str, int] = {
+    'debug': logging.DEBUG, 'info': logging.INFO, 'warning': logging.WARNING, 'warn': logging.WARNING,
+    'error': logging.ERROR, 'critical': logging.CRITICAL,
+}
+
+# 日志协议: focus 中以通知类型对应的键携带 "[level]消息"
+_RECOGNITION_KEYS: Dict[Any, str] = {
+    NotificationType.Starting: 'Node.Recognition.Starting',
+    NotificationType.Succeeded: 'Node.Recognition.Succeeded',
+    NotificationType.Failed: 'Node.Recognition.Failed',
+}
+_ACTION_KEYS: Dict[Any, str] = {
+    NotificationType.Starting: 'Node.Action.Starting',
+    NotificationType.Succeeded: 'Node.Action.Succeeded',
+    NotificationType.Failed: 'Node.Action.Failed',
+}
+# 旧协议: focus 中的 start/succeeded/failed 键，级别可由 focus["level"] 覆盖
+_OLD_PROTOCOL: Dict[Any, Tuple[str, int]] = {
+    NotificationType.Succeeded: ("succeeded", logging.INFO),
+    NotificationType.Failed: ("failed", logging.ERROR),
+    NotificationType.Starting: ("start", logging.INFO),
+}
+
+
+class NotificationLogSink(ContextEventSink):
+    """
+    将节点通知中的日志协议转发到设备日志。
+    Tasker 跨批次复用时同一个实例会被保留，通过 rebind 指向新的执行器。
+    """
+
+    FLUSH_INTERVAL = 0.1  # 排空任务的批量间隔（秒）
+    MAX_PENDING = 5000  # 积压超过该数量时丢弃 WARNING 以下的消息
+    DEFAULT_SAMPLE_EVERY: Dict[int, int] = {}  # 级别 -> 每 N 条保留 1 条，未配置的级别全部保留
+
+    def __init__(self, executor, sample_every: Optional[Dict[int, int]] = None):
+        super().__init__()
+        self._pending: Deque[Tuple[int, str]] = deque()
+        self._drain_scheduled = False
+        self._sample_every = dict(sample_every if sample_every is not None else self.DEFAULT_SAMPLE_EVERY)
+        self._sample_counters: Dict[int, int] = {}
+        self._dropped = 0
+        self.stats = {'callbacks': 0, 'messages': 0, 'sampled_out': 0, 'dropped': 0, 'batches': 0}
+        self.logger: Optional[logging.Logger] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.rebind(executor)
+
+    def rebind(self, executor):
+        """将通知转发给新的执行器所属的日志，并记录排空任务所在的事件循环"""
+        self.logger = executor.logger
+        try:
+            self._loop = asyncio.get_event_loop()
+        except RuntimeError:
+            self._loop = None
+
+    # === maa 回调（回调线程） ===
+
+    def on_node_recognition(self, context, noti_type: NotificationType,
+                            detail: ContextEventSink.NodeRecognitionDetail):
+        self.stats['callbacks'] += 1
+        focus = getattr(detail, "focus", None)
+        if focus and isinstance(focus, dict):
+            self._process_log_protocol(focus, _RECOGNITION_KEYS.get(noti_type))
+
+    def on_node_action(self, context, noti_type: NotificationType, detail: ContextEventSink.NodeActionDetail):
+        self.stats['callbacks'] += 1
+        focus = getattr(detail, "focus", None)
+        if not focus or not isinstance(focus, dict):
+            return
+        if self._process_log_protocol(focus, _ACTION_KEYS.get(noti_type)):
+            return
+
+        entry = _OLD_PROTOCOL.get(noti_type)
+        if entry is None:
+            return
+        key, level = entry
+        if key not in focus:
+            return
+        level_config = focus.get("level")
+        if isinstance(level_config, dict) and level_config.get(key):
+            level = _LEVELS.get(str(level_config[key]).lower(), level)
+        values = focus[key]
+        if isinstance(values, list):
+            for v in values:
+                self._emit(level, str(v))
+        else:
+            self._emit(level, str(values))
+
+    def _process_log_protocol(self, focus: dict, protocol_key: Optional[str]) -> bool:
+        if not protocol_key or protocol_key not in focus:
+            return False
+        raw_content = focus[protocol_key]
+        messages = raw_content if isinstance(raw_content, list) else [str(raw_content)]
+        for msg in messages:
+            match = _LOG_PATTERN.match(msg)
+            if match:
+                self._emit(_LEVELS[match.group(1).lower()], match.group(2))
+            else:
+                self._emit(logging.INFO, msg)
+        return True
+
+    def _emit(self, level: int, message: str):
+        self.stats['messages'] += 1
+        every = self._sample_every.get(level)
+        if every and every > 1:
+            count = self._sample_counters.get(level, 0) + 1
+            self._sample_counters[level] = count
+            if count % every:
+                self.stats['sampled_out'] += 1
+                return
+        if level < logging.WARNING and len(self._pending) >= self.MAX_PENDING:
+            self._dropped += 1
+            return
+        # deque.append 是线程安全的，回调线程不需要加锁
+        self._pending.append((level, message))
+        if not self._drain_scheduled:
+            self._drain_scheduled = True
+            loop = self._loop
+            if loop is None or loop.is_closed():
+                self._drain_scheduled = False
+                self.flush()
+                return
+            loop.call_soon_threadsafe(self._start_drain)
+
+    # === 排空（事件循环线程） ===
+
+    def _start_drain(self):
+        asyncio.ensure_future(self._drain_loop())
+
+    async def _drain_loop(self):
+        """批量写入积压的消息，直到没有新的消息"""
+        try:
+            while True:
+                await asyncio.sleep(self.FLUSH_INTERVAL)
+                self.flush()
+                if not self._pending:
+                    # 先清除标记再复查：清除前到达的消息在这里处理，清除后到达的消息由回调重新调度
+                    self._drain_scheduled = False
+                    if not self._pending:
+                        return
+                    self._drain_scheduled = True
+        except asyncio.CancelledError:
+            self._drain_scheduled = False
+            self.flush()
+            raise
+
+    def flush(self) -> int:
+        """写入所有积压的消息，返回写入的条数"""
+        logger = self.logger
+        pending = self._pending
+        count = 0
+        while True:
+            try:
+                level, message = pending.popleft()
+            except IndexError:
+                break
+            logger.log(level, message)
+            count += 1
+        dropped, self._dropped = self._dropped, 0
+        if dropped:
+            self.stats['dropped'] += dropped
+            logger.warning(f"节点通知过多，已省略 {dropped} 条日志")
+        if count:
+            self.stats['batches'] += 1
+        return count
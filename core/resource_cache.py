@@ -0,0 +1,275 @@
+# -*- coding: UTF-8 -*-
+"""
+资源缓存 - 进程级共享的 MAA Resource 缓存
+- 以 (资源根路径, 资源包路径列表) 为键，并以文件指纹 (数量/大小/mtime) 校验。
+- 共享租约: 多个设备可同时使用同一个已加载的 Resource。
+- 独占租约: 需要绑定 Agent 的资源会注册自定义动作，必须独占一个 Resource 实例。
+- 引用计数 + LRU: 仅回收无人使用的条目，按条目数与内存预算淘汰。
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple, Callable, Awaitable
+
+from maa.resource import Resource
+
+from app.models.config.global_config import global_config
+from app.models.logging.log_manager import log_manager
+
+RunBlocking = Callable[..., Awaitable[Any]]
+
+
+def resolve_bundle_paths(resource_pack: Dict[str, Any], resource_path: str) -> List[str]:
+    """根据资源包配置计算需要按顺序加载的路径；无资源包时只加载资源根路径"""
+    if resource_pack and resource_pack.get('path'):
+        base_path = Path(resource_path)
+        return [str(base_path / rel_path) for rel_path in resource_pack.get('path', [])]
+    return [str(resource_path)]
+
+
+def scan_bundle_fingerprint(paths: List[str]) -> Tuple[Tuple[int, int, int], int]:
+    """
+    扫描资源目录，返回 ((文件数, 总大小, 最大mtime), 总大小)。
+    总大小同时作为该资源占用内存的估算值。
+    """
+    file_count = 0
+    total_size = 0
+    max_mtime = 0
+    stack = list(paths)
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            st = entry.stat(follow_symlinks=False)
+                            file_count += 1
+                            total_size += st.st_size
+                            if st.st_mtime_ns > max_mtime:
+                                max_mtime = st.st_mtime_ns
+                    except OSError:
+                        continue
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+    return (file_count, total_size, max_mtime), total_size
+
+
+@dataclass
+class _CacheEntry:
+    """缓存中的一个已加载 Resource 实例"""
+    key: Tuple
+    fingerprint: Tuple
+    resource: Resource
+    size_bytes: int
+    refcount: int = 0
+    exclusive: bool = False
+    last_used: float = field(default_factory=time.time)
+
+
+class ResourceLease:
+    """资源租约，使用完毕后必须通过 ResourceCache.release 归还"""
+
+    def __init__(self, entry: _CacheEntry, exclusive: bool):
+        self._entry = entry
+        self.exclusive = exclusive
+        self.released = False
+
+    @property
+    def resource(self) -> Resource:
+        return self._entry.resource
+
+    @property
+    def key(self) -> Tuple:
+        return self._entry.key
+
+    @property
+    def fingerprint(self) -> Tuple:
+        return self._entry.fingerprint
+
+
+class ResourceCache:
+    """
+    进程级资源缓存。
+    所有方法都在事件循环线程中调用，阻塞的加载与扫描通过 run_blocking 放入线程池。
+    """
+
+    DEFAULT_MAX_ENTRIES = 8
+    DEFAULT_MEMORY_BUDGET_MB = 1024
+    FINGERPRINT_TTL = 5.0  # 秒，短时间内重复获取同一资源时不重复扫描目录
+
+    def __init__(self):
+        self._entries: "OrderedDict[int, _CacheEntry]" = OrderedDict()  # id(entry) -> entry，按最近使用排序
+        self._loading: Dict[Tuple, asyncio.Future] = {}
+        self._fingerprints: Dict[Tuple, Tuple[float, Tuple, int]] = {}
+        self.logger = log_manager.get_app_logger()
+        self.stats = {'hits': 0, 'misses': 0, 'loads': 0, 'evictions': 0}
+
+    # === 配置 ===
+
+    def _limits(self) -> Tuple[int, int]:
+        app_config = global_config.app_config
+        max_entries = getattr(app_config, 'resource_cache_max_entries', self.DEFAULT_MAX_ENTRIES)
+        budget_mb = getattr(app_config, 'resource_cache_memory_mb', self.DEFAULT_MEMORY_BUDGET_MB)
+        return max(1, int(max_entries)), max(0, int(budget_mb)) * 1024 * 1024
+
+    # === 指纹 ===
+
+    async def fingerprint(self, resource_pack: Dict[str, Any], resource_path: str,
+                          run_blocking: RunBlocking) -> Tuple[Tuple, Tuple, int]:
+        """返回 (缓存键, 文件指纹, 估算大小)"""
+        paths = resolve_bundle_paths(resource_pack, resource_path)
+        key = (str(resource_path), tuple(paths))
+        cached = self._fingerprints.get(key)
+        now = time.monotonic()
+        if cached and now - cached[0] < self.FINGERPRINT_TTL:
+            return key, cached[1], cached[2]
+        fingerprint, size = await run_blocking(scan_bundle_fingerprint, paths)
+        self._fingerprints[key] = (now, fingerprint, size)
+        return key, fingerprint, size
+
+    # === 租约 ===
+
+    async def acquire(self, resource_pack: Dict[str, Any], resource_path: str, run_blocking: RunBlocking,
+                      logger=None, exclusive: bool = False) -> ResourceLease:
+        """
+        获取资源租约。
+
+        Args:
+            resource_pack: 资源包配置
+            resource_path: 资源根路径
+            run_blocking: 在线程池中执行阻塞调用的协程函数
+            logger: 加载过程日志输出到的 logger，默认使用应用日志
+            exclusive: 是否需要独占的 Resource 实例（例如需要绑定 Agent）
+        """
+        logger = logger or self.logger
+        key, fingerprint, size = await self.fingerprint(resource_pack, resource_path, run_blocking)
+
+        while True:
+            entry = self._find_entry(key, fingerprint, exclusive)
+            if entry is not None:
+                self.stats['hits'] += 1
+                logger.info(f"复用已缓存的资源 ({'独占' if exclusive else '共享'}，引用数 {entry.refcount + 1})")
+                return self._lease(entry, exclusive)
+
+            # 同一资源正在被加载时等待其完成，避免重复加载
+            pending = self._loading.get((key, fingerprint))
+            if pending is None:
+                break
+            await asyncio.shield(pending)
+
+        self.stats['misses'] += 1
+        future = asyncio.get_event_loop().create_future()
+        self._loading[(key, fingerprint)] = future
+        try:
+            resource = await self._load(key[1], run_blocking, logger)
+            entry = _CacheEntry(key=key, fingerprint=fingerprint, resource=resource, size_bytes=size)
+            self._entries[id(entry)] = entry
+            self.stats['loads'] += 1
+            lease = self._lease(entry, exclusive)
+            self._evict()
+            return lease
+        finally:
+            self._loading.pop((key, fingerprint), None)
+            if not future.done():
+                future.set_result(None)
+
+    def release(self, lease: Optional[ResourceLease]):
+        """归还资源租约"""
+        if lease is None or lease.released:
+            return
+        lease.released = True
+        entry = lease._entry
+        entry.refcount = max(0, entry.refcount - 1)
+        entry.last_used = time.time()
+        if entry.refcount == 0:
+            if entry.exclusive:
+                # 独占期间 Agent 可能注册了自定义动作，归还后清理以便共享
+                try:
+                    entry.resource.clear_custom_action()
+                    entry.resource.clear_custom_recognition()
+                except Exception as e:
+                    self.logger.warning(f"清理资源自定义动作失败，丢弃该缓存条目: {e}")
+                    self._entries.pop(id(entry), None)
+                    return
+            entry.exclusive = False
+            if not self._is_current(entry):
+                # 文件已更新，旧版本资源不再复用
+                self._entries.pop(id(entry), None)
+                return
+        self._evict()
+
+    def clear(self):
+        """清空所有未被使用的缓存条目"""
+        for entry_id, entry in list(self._entries.items()):
+            if entry.refcount == 0:
+                del self._entries[entry_id]
+        self._fingerprints.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            'entries': len(self._entries),
+            'in_use': sum(1 for e in self._entries.values() if e.refcount > 0),
+            'estimated_bytes': sum(e.size_bytes for e in self._entries.values()),
+        }
+
+    # === 内部实现 ===
+
+    def _find_entry(self, key: Tuple, fingerprint: Tuple, exclusive: bool) -> Optional[_CacheEntry]:
+        idle = None
+        for entry in reversed(self._entries.values()):
+            if entry.key != key or entry.fingerprint != fingerprint:
+                continue
+            if not exclusive and not entry.exclusive and entry.refcount > 0:
+                return entry
+            if entry.refcount == 0 and idle is None:
+                idle = entry
+        return idle
+
+    def _lease(self, entry: _CacheEntry, exclusive: bool) -> ResourceLease:
+        entry.refcount += 1
+        entry.exclusive = exclusive
+        entry.last_used = time.time()
+        self._entries.move_to_end(id(entry))
+        return ResourceLease(entry, exclusive)
+
+    def _is_current(self, entry: _CacheEntry) -> bool:
+        cached = self._fingerprints.get(entry.key)
+        return cached is None or cached[1] == entry.fingerprint
+
+    def _evict(self):
+        max_entries, budget = self._limits()
+        total = sum(e.size_bytes for e in self._entries.values())
+        for entry_id, entry in list(self._entries.items()):  # 从最久未使用的开始
+            if len(self._entries) <= max_entries and (budget == 0 or total <= budget):
+                break
+            if entry.refcount > 0:
+                continue
+            del self._entries[entry_id]
+            total -= entry.size_bytes
+            self.stats['evictions'] += 1
+            self.logger.debug(f"资源缓存淘汰: {entry.key[0]} (约 {entry.size_bytes / 1024 / 1024:.1f} MB)")
+
+    @staticmethod
+    async def _load(paths: Tuple[str, ...], run_blocking: RunBlocking, logger) -> Resource:
+        resource = Resource()
+        for i, path in enumerate(paths):
+            logger.debug(f"正在加载路径 ({i + 1}/{len(paths)}): {path}")
+            try:
+                await run_blocking(lambda p=path: resource.post_bundle(p).wait())
+                logger.debug(f"成功加载路径: {path}")
+            except Exception as e:
+                logger.error(f"加载路径 {path} 时发生错误: {e}")
+        logger.info("所有资源路径加载完成。")
+        return resource
+
+
+# 创建全局实例
+resource_cache = ResourceCache()
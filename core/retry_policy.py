@@ -0,0 +1,63 @@
+# -*- coding: UTF-8 -*-
+"""
+子任务重试策略
+- 全局默认值来自应用配置，资源任务定义中的 retry 字段可逐项覆盖。
+- 支持最大尝试次数、指数退避间隔，以及重试前重新连接控制器。
+- continue_on_failure 为 True 时，该子任务最终失败后继续执行后续子任务。
+- 配置中的值按字段类型转换（布尔值接受 "false"、"否" 等字符串），无法转换的值记录警告后忽略。
+"""
+
+from dataclasses import dataclass, fields
+from typing import Dict, Any, Optional
+
+from app.models.config.run_plan import parse_bool_value
+from app.models.logging.log_manager import log_manager
+
+_CONVERTERS = {int: int, float: float, bool: parse_bool_value}
+
+
+@dataclass
+class RetryPolicy:
+    """单个子任务的重试策略"""
+    max_attempts: int = 1  # 最大尝试次数（含第一次），1表示不重试
+    backoff: float = 3.0  # 第一次重试前的等待时间（秒）
+    backoff_factor: float = 2.0  # 每次重试等待时间的倍数
+    max_backoff: float = 60.0  # 单次等待时间上限（秒）
+    reconnect: bool = False  # 重试前是否重新连接控制器
+    continue_on_failure: bool = False  # 最终失败后是否继续执行后续子任务
+
+    @classmethod
+    def resolve(cls, app_config, overrides: Optional[Dict[str, Any]] = None) -> 'RetryPolicy':
+        """以应用配置为默认值，叠加子任务定义中的覆盖项"""
+        policy = cls()
+        policy._apply({
+            'max_attempts': getattr(app_config, 'subtask_max_attempts', cls.max_attempts),
+            'backoff': getattr(app_config, 'subtask_retry_backoff', cls.backoff),
+            'reconnect': getattr(app_config, 'subtask_retry_reconnect', cls.reconnect),
+            'continue_on_failure': getattr(app_config, 'subtask_continue_on_failure', cls.continue_on_failure),
+        }, "应用配置")
+        if overrides:
+            policy._apply(overrides, "子任务 retry 配置")
+        policy.max_attempts = max(1, policy.max_attempts)
+        return policy
+
+    def _apply(self, values: Dict[str, Any], source: str):
+        """按字段类型转换后写入，无法转换的值保留原值并记录警告"""
+        types = {f.name: f.type for f in fields(self)}
+        for key, value in values.items():
+            field_type = types.get(key)
+            if field_type is None:
+                continue
+            try:
+                converted = _CONVERTERS[field_type](value)
+                if field_type is float and converted != converted:
+                    raise ValueError("NaN")
+            except (TypeError, ValueError, OverflowError):
+                log_manager.get_app_logger().warning(
+                    f"{source}中的重试参数 {key}={value!r} 无效，使用 {getattr(self, key)!r}")
+                continue
+            setattr(self, key, converted)
+
+    def delay_before(self, attempt: int) -> float:
+        """第 attempt 次尝试（从2开始）之前的等待时间"""
+        return min(self.max_backoff, max(0.0, float(self.backoff)) * (self.backoff_factor ** max(0, attempt - 2)))
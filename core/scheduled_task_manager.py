@@ -9,6 +9,7 @@ from app.models.config.app_config import ScheduleTask
 from app.models.config.global_config import global_config
 from app.models.logging.log_manager import log_manager
 from core.tasker_manager import task_manager
+from core.device_task_queue import TaskPriority
 
 
 class ScheduledTaskManager(QObject):
@@ -30,11 +31,10 @@ class ScheduledTaskManager(QObject):
         self.logger.info("ScheduledTaskManager 初始化完成")
 
     async def _save_config_async(self):
-        """异步保存配置到磁盘，避免阻塞UI线程"""
+        """请求保存配置，序列化与写入由配置写入服务合并后在后台完成，不阻塞UI线程"""
         try:
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(None, global_config.save_all_configs)
-            self.logger.debug("全局配置已异步保存到磁盘。")
+            global_config.save_all_configs()
+            self.logger.debug("已请求保存全局配置。")
         except Exception as e:
             self.logger.error(f"异步保存配置失败: {e}", exc_info=True)
 
@@ -146,18 +146,13 @@ class ScheduledTaskManager(QObject):
 
             try:
                 app_config = global_config.get_app_config()
-                task_found = False
-                for i, task in enumerate(app_config.schedule_tasks):
-                    if task.schedule_id == schedule_id:
-                        updated_task_obj = ScheduleTask.from_ui_format(
-                            task_info,
-                            task_info['device_name'],
-                            task_info['resource_name']
-                        )
-                        updated_task_obj.schedule_id = schedule_id
-                        app_config.schedule_tasks[i] = updated_task_obj
-                        task_found = True
-                        break
+                updated_task_obj = ScheduleTask.from_ui_format(
+                    task_info,
+                    task_info['device_name'],
+                    task_info['resource_name']
+                )
+                updated_task_obj.schedule_id = schedule_id
+                task_found = app_config.replace_schedule_task(updated_task_obj)
 
                 if not task_found:
                     self.logger.warning(f"尝试更新配置失败，未找到任务ID: {schedule_id}")
@@ -304,7 +299,7 @@ class ScheduledTaskManager(QObject):
 
                 # 【修改】移除 create_executor 调用，直接提交任务
                 # TaskerManager 的 submit_task 现在会处理所有启动逻辑
-                await self._tasker_manager.submit_task(device_name, runtime_config)
+                await self._tasker_manager.submit_task(device_name, runtime_config, TaskPriority.SCHEDULED, "schedule")
                 self.logger.info(f"成功将定时任务加入队列 (设备 {device_name}, 资源 {resource_name})")
 
             finally:
@@ -332,14 +327,11 @@ class ScheduledTaskManager(QObject):
     def _update_task_field_in_config(self, schedule_id: str, field_name: str, value: Any, save: bool = True):
         try:
             app_config = global_config.get_app_config()
-            task_found = False
-            for task in app_config.schedule_tasks:
-                if task.schedule_id == schedule_id:
-                    setattr(task, field_name, value)
-                    task_found = True
-                    break
+            task = app_config.get_schedule_task(schedule_id)
+            task_found = task is not None
+            if task_found:
+                setattr(task, field_name, value)
             if task_found and save:
-                # This sync save is now only called if needed, but async is preferred.
                 global_config.save_all_configs()
             elif not task_found:
                 self.logger.warning(f"尝试更新配置失败，未找到任务ID: {schedule_id}")
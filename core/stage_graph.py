@@ -0,0 +1,141 @@
+# -*- coding: UTF-8 -*-
+"""
+阶段依赖图 - 并发执行互不依赖的异步准备阶段
+- 每个阶段在其依赖阶段全部完成后立即启动，因此总耗时取决于最长的依赖链而非所有阶段之和。
+- 任一阶段失败时取消其余未完成的阶段，并抛出最先发生的异常。
+- 记录每个阶段的开始时间与执行耗时，并计算关键路径。
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Any, Callable, Awaitable, Tuple, List, Optional
+
+
+@dataclass
+class StageTiming:
+    """单个阶段的计时信息（相对于依赖图开始执行的秒数）"""
+    deps: Tuple[str, ...] = ()
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    status: str = "pending"  # pending / running / done / failed / cancelled
+
+    @property
+    def duration(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'deps': list(self.deps),
+            'start': round(self.started_at or 0.0, 3),
+            'duration': round(self.duration, 3),
+            'status': self.status,
+        }
+
+
+@dataclass
+class _Stage:
+    name: str
+    func: Callable[..., Awaitable[Any]]
+    deps: Tuple[str, ...]
+    timing: StageTiming = field(default_factory=StageTiming)
+
+
+class StageGraph:
+    """
+    由异步阶段组成的小型依赖图。
+    阶段函数以依赖阶段的结果作为关键字参数调用，例如依赖 'resource' 的阶段会收到 resource=<结果>。
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._stages: Dict[str, _Stage] = {}
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]], deps: Tuple[str, ...] = ()) -> 'StageGraph':
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"阶段 {name} 依赖的阶段 {dep} 尚未添加")
+        self._stages[name] = _Stage(name, func, tuple(deps), StageTiming(deps=tuple(deps)))
+        return self
+
+    async def run(self) -> Dict[str, Any]:
+        """执行所有阶段，返回 {阶段名: 结果}"""
+        self._started_at = time.monotonic()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: _Stage):
+            kwargs = {dep: await tasks[dep] for dep in stage.deps}
+            stage.timing.started_at = self._elapsed()
+            stage.timing.status = "running"
+            try:
+                result = await stage.func(**kwargs)
+            except asyncio.CancelledError:
+                stage.timing.status = "cancelled"
+                raise
+            except BaseException:
+                stage.timing.status = "failed"
+                raise
+            finally:
+                stage.timing.finished_at = self._elapsed()
+            stage.timing.status = "done"
+            return result
+
+        # 按添加顺序创建任务，保证依赖任务先于依赖方存在
+        for stage in self._stages.values():
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+
+        try:
+            pending = set(tasks.values())
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    if not task.cancelled() and task.exception() is not None:
+                        raise task.exception()
+            return {name: task.result() for name, task in tasks.items()}
+        finally:
+            unfinished = [task for task in tasks.values() if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+            for stage in self._stages.values():
+                if stage.timing.status == "pending":
+                    stage.timing.status = "cancelled"
+            self._finished_at = self._elapsed()
+
+    # === 计时报告 ===
+
+    def _elapsed(self) -> float:
+        return time.monotonic() - self._started_at
+
+    @property
+    def total_duration(self) -> float:
+        return self._finished_at or 0.0
+
+    def timings(self) -> Dict[str, Dict[str, Any]]:
+        return {name: stage.timing.to_dict() for name, stage in self._stages.items()}
+
+    def critical_path(self) -> List[str]:
+        """从最后完成的阶段出发，沿最晚完成的依赖回溯得到关键路径"""
+        finished = [s for s in self._stages.values() if s.timing.finished_at is not None]
+        if not finished:
+            return []
+        current = max(finished, key=lambda s: s.timing.finished_at)
+        path = [current.name]
+        while current.deps:
+            deps = [self._stages[d] for d in current.deps if self._stages[d].timing.finished_at is not None]
+            if not deps:
+                break
+            current = max(deps, key=lambda s: s.timing.finished_at)
+            path.append(current.name)
+        return list(reversed(path))
+
+    def summary(self) -> str:
+        parts = [f"{name} {stage.timing.duration:.2f}s" + ("" if stage.timing.status == "done" else f"({stage.timing.status})")
+                 for name, stage in self._stages.items()]
+        return (f"{self.name}阶段耗时: {', '.join(parts)}；总耗时 {self.total_duration:.2f}s，"
+                f"关键路径: {' -> '.join(self.critical_path())}")
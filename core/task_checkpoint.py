@@ -0,0 +1,116 @@
+# -*- coding: UTF-8 -*-
+"""
+子任务检查点
+- 按 (设备, 资源, 配置方案, 日期) 记录已完成的子任务序号，保存在配置目录下的小型日志文件中。
+- 原子写入: 先写临时文件再替换，崩溃时不会留下损坏的记录。
+- 任务列表指纹: 子任务列表或参数变化后，旧的检查点自动失效。
+- 整批完成后删除检查点；过期的检查点在加载时顺带清理。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Set, Tuple
+
+from app.config.config_manager import get_config_directory
+from app.models.config.global_config import RunTimeConfigs
+from app.models.logging.log_manager import log_manager
+
+CheckpointKey = Tuple[str, str, str, str]
+
+
+def task_list_fingerprint(config: RunTimeConfigs) -> str:
+    """根据子任务列表（名称、入口与覆盖参数）计算指纹"""
+    items = [[t.task_name, t.task_entry, t.pipeline_override] for t in config.task_list]
+    data = json.dumps(items, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class TaskCheckpointJournal:
+    """
+    子任务检查点日志。
+    方法均为阻塞的小文件读写，由执行器放入线程池调用。
+    """
+
+    DIR_NAME = "checkpoints"
+    RETENTION_SECONDS = 3 * 24 * 3600  # 超过该时间未更新的检查点文件将被清理
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+        self.logger = log_manager.get_app_logger()
+
+    @staticmethod
+    def make_key(device_name: str, config: RunTimeConfigs) -> CheckpointKey:
+        return device_name, config.resource_name, config.settings_name, datetime.now().strftime('%Y-%m-%d')
+
+    def _dir(self) -> str:
+        path = os.path.join(get_config_directory(), self.DIR_NAME)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def _path(self, key: CheckpointKey) -> str:
+        digest = hashlib.sha1("\x1f".join(key).encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self._dir(), f"{digest}.json")
+
+    def load(self, key: CheckpointKey, fingerprint: str) -> Set[int]:
+        """读取已完成的子任务序号；记录不存在、损坏或任务列表已变化时返回空集合"""
+        self._purge_expired()
+        with self._lock:
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                return set()
+            except Exception as e:
+                self.logger.warning(f"读取任务检查点失败，将从头执行: {e}")
+                return set()
+        if data.get('key') != list(key) or data.get('fingerprint') != fingerprint:
+            return set()
+        return set(data.get('completed', []))
+
+    def mark_completed(self, key: CheckpointKey, fingerprint: str, completed: Set[int]):
+        """记录已完成的子任务序号"""
+        data = {'key': list(key), 'fingerprint': fingerprint, 'completed': sorted(completed),
+                'updated_at': time.time()}
+        with self._lock:
+            path = self._path(key)
+            tmp_path = path + ".tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except Exception as e:
+                self.logger.warning(f"保存任务检查点失败: {e}")
+
+    def clear(self, key: CheckpointKey):
+        with self._lock:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                self.logger.warning(f"删除任务检查点失败: {e}")
+
+    def _purge_expired(self):
+        now = time.time()
+        if now - self._last_purge < 3600:
+            return
+        self._last_purge = now
+        try:
+            directory = self._dir()
+            expired: List[str] = [entry.path for entry in os.scandir(directory)
+                                  if entry.is_file() and now - entry.stat().st_mtime > self.RETENTION_SECONDS]
+            for path in expired:
+                os.remove(path)
+        except Exception as e:
+            self.logger.debug(f"清理过期任务检查点失败: {e}")
+
+
+# 创建全局实例
+task_checkpoints = TaskCheckpointJournal()
@@ -3,31 +3,27 @@
 """
 任务执行器 - 使用全局Python运行时管理器 (重构版)
 特点:
-- 短生命周期: 为每个任务批次创建和销毁。
+- 短生命周期: 执行器对象为每个任务批次创建，批次结束后丢弃。
+- 会话复用: 控制器、Tasker 与资源保存在 DeviceSession 中，批次结束时交还会话，不随执行器销毁。
 - 无状态: 不维护内部任务队列或长期后台循环。
 - 单一入口: 通过 run_task_lifecycle 方法驱动。
-- 僵尸进程防护: 使用 Windows Job Object 强制管理子进程生命周期。
+- Agent 预热: Agent 进程从全局进程池租用，由进程池负责 Job Object 与回收。
+- 阻塞调用: 在进程级共享的调度器中执行，不再为每个执行器创建线程池。
 """
 
 import asyncio
 import os
-import re
 import subprocess
-import threading
 import time
-import ctypes
-from ctypes import wintypes
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Optional, Dict, List, Union, Any
+from typing import Optional, Dict, List, Union, Any, Tuple
 from dataclasses import dataclass, field
-from concurrent.futures import ThreadPoolExecutor
 
 import psutil
 from PySide6.QtCore import QObject, Signal
-from maa.context import ContextEventSink
 from maa.controller import AdbController, Win32Controller
-from maa.event_sink import NotificationType
 from maa.resource import Resource
 from maa.tasker import Tasker
 from maa.toolkit import Toolkit
@@ -40,10 +36,23 @@ from app.utils.device_untils import find_emulator_pid
 from core.python_runtime_manager import python_runtime_manager
 from core.device_state_machine import SimpleStateManager, DeviceState
 from core.device_status_manager import device_status_manager
+from core.device_session import DeviceSession, controller_fingerprint
+from core.resource_cache import resource_cache, ResourceLease
+from core.agent_pool import agent_pool, AgentSpec, PooledAgent
+from core.stage_graph import StageGraph
+from core.emulator_readiness import EmulatorReadinessProber, ExponentialBackoff, boot_time_history
+from core.admission_controller import admission_controller
+from core.task_checkpoint import task_checkpoints, task_list_fingerprint
+from core.retry_policy import RetryPolicy
+from core.blocking_scheduler import blocking_scheduler
+from core.notification_sink import NotificationLogSink
 
-import weakref
 import gc
 
+
+class DeviceConnectionError(RuntimeError):
+    """设备连接失败，批次内的所有任务都无法继续"""
+
 @dataclass
 class Task:
     """简化的任务数据类"""
@@ -56,13 +65,13 @@ class Task:
 
 class TaskExecutor(QObject):
     """
-    重构后的任务执行器 - 具有短生命周期，为单次任务执行而创建和销毁。
+    重构后的任务执行器 - 每个任务批次创建一个实例；控制器、Tasker 与资源由设备会话持有，跨批次复用。
     """
 
     # 信号定义
     task_state_changed = Signal(str, DeviceState, dict)
 
-    def __init__(self, device_config: DeviceConfig, parent=None):
+    def __init__(self, device_config: DeviceConfig, session: Optional[DeviceSession] = None, parent=None):
         super().__init__(parent)
         self.device_config = device_config
         self.device_name = device_config.device_name
@@ -71,28 +80,45 @@ class TaskExecutor(QObject):
         # 状态管理器
         self.device_manager = device_status_manager.get_or_create_device_manager(self.device_name)
 
+        # 设备会话：持有控制器、Tasker 与资源。未传入时使用仅属于本执行器的私有会话
+        self._owns_session = session is None
+        self._session = session or DeviceSession(self.device_name)
+        self._session.metrics.batches += 1
+
         # 核心组件 (在任务执行期间初始化)
-        self._controller: Optional[Union[AdbController, Win32Controller]] = None
-        self._tasker: Optional[Tasker] = None
-        self._current_resource: Optional[Resource] = None
-        self._current_resource_path: Optional[str] = None
         self._agent: Optional[AgentClient] = None
-        self._agent_process: Optional[subprocess.Popen] = None
+        # 从进程池租用的 Agent 进程（进程生命周期与 Job Object 由进程池管理）
+        self._agent_lease: Optional[PooledAgent] = None
+        # 资源阶段已获取、尚未交给绑定阶段的资源租约
+        self._pending_lease: Optional[ResourceLease] = None
+        # 本执行器启动模拟器的时间，用于学习设备的启动耗时
+        self._boot_started_at: Optional[float] = None
+
+        # 通知处理器：随会话中的 Tasker 复用，只需重新指向当前执行器
+        if self._session.event_sink is not None:
+            self._session.event_sink.rebind(self)
+            self._notification_handler = self._session.event_sink
+        else:
+            self._notification_handler = NotificationLogSink(self)
 
-        # Windows Job Object 句柄，用于防止僵尸进程
-        self._agent_job_handle = None
+        self.logger.info(f"任务执行器实例 {id(self)} 已创建")
 
-        # 线程池 - 减少工作线程数量，避免过度消耗资源
-        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix=f"TaskExec_{self.device_name}")
-        # 通知处理器
-        self._notification_handler = self._create_notification_handler()
+    @property
+    def _controller(self) -> Optional[Union[AdbController, Win32Controller]]:
+        return self._session.controller
 
-        self.logger.info(f"任务执行器实例 {id(self)} 已创建")
+    @property
+    def _tasker(self) -> Optional[Tasker]:
+        return self._session.tasker
+
+    @property
+    def _current_resource(self) -> Optional[Resource]:
+        return self._session.resource
 
     async def run_task_lifecycle(self, task_data: Union[RunTimeConfigs, List[RunTimeConfigs]]) -> None:
         """
         【核心方法】执行一个完整的任务生命周期：连接 -> 执行 -> 清理。
-        这个方法完成后，执行器实例即可被销毁。
+        这个方法完成后，执行器实例即可被丢弃，会话中的控制器、Tasker 与资源留给下个批次。
         """
         tasks_to_run: List[Task] = []
         try:
@@ -105,15 +131,10 @@ class TaskExecutor(QObject):
                 tasks_to_run.append(Task(id=task_id, data=config, state_manager=task_manager))
                 self.logger.debug(f"任务 {task_id} 已准备好执行")
 
-            # 2. 连接阶段：确保设备已连接
-            is_ready = await self._ensure_connection()
-            if not is_ready:
-                raise RuntimeError("为任务准备设备连接失败，任务将标记为失败。")
-
-            # 3. 执行阶段：依次执行所有任务
-            for task in tasks_to_run:
+            # 2. 执行阶段：依次执行所有任务，设备连接与第一个任务的准备阶段并行进行
+            for index, task in enumerate(tasks_to_run):
                 # 【重要】_execute_task 现在会将 CancelledError 向上抛出
-                await self._execute_task(task)
+                await self._execute_task(task, connect=index == 0)
 
         except asyncio.CancelledError:
             self.logger.warning(f"任务执行被取消 (Device: {self.device_name})")
@@ -130,60 +151,83 @@ class TaskExecutor(QObject):
                     task.state_manager.set_state(DeviceState.FAILED, error_message=str(e))
                     self.task_state_changed.emit(task.id, DeviceState.FAILED, task.state_manager.get_context())
         finally:
-            # 4. 清理阶段：无论成功与否，都销毁所有资源
+            # 4. 清理阶段：无论成功与否，停止任务、归还 Agent，并把控制器、Tasker 与资源交还会话
+            log_manager.context.bind(self.device_name, stage="cleanup", sub_task=None)
             self.logger.info("任务生命周期结束，开始清理执行器资源...")
-            await self._cleanup()
+            try:
+                await self._cleanup()
+            finally:
+                log_manager.context.clear(self.device_name)
             for task in tasks_to_run:
                 device_status_manager.remove_task_manager(task.id)
 
-    async def _execute_task(self, task: Task):
+    async def _execute_task(self, task: Task, connect: bool = False):
         """
         执行单个任务。
+        准备工作按依赖图并行执行，只有绑定 Tasker 时才需要等待设备连接与资源加载：
+            connection ─┐
+            resource ───┴─> bind ─┐
+            agent_env ────────────┴─> agent
         """
         task_manager = task.state_manager
+        log_context = log_manager.context
+        log_context.bind(self.device_name, task_id=task.id, resource=task.data.resource_name,
+                         sub_task=None, stage="preparing")
         try:
             task_manager.set_state(DeviceState.PREPARING)
-            await self._create_tasker(task.data.resource_pack, task.data.resource_path)
-
-            if await self._setup_agent(task):
-                task_manager.set_state(DeviceState.RUNNING)
-                self.device_manager.set_state(DeviceState.RUNNING, task_id=task.id, task_name=task.data.resource_name,
-                                              progress=0)
-                # 如果 _run_tasks 抛出 CancelledError，这里不会捕获，将直接中断并冒泡到 run_task_lifecycle
-                result = await self._run_tasks(task)
-                task.result = result
-                task_manager.set_state(DeviceState.COMPLETED, progress=100)
-                self.logger.info(f"任务 {task.id} 执行成功")
-
-                if getattr(self.device_config, 'auto_close_emulator', False):
-                    self.logger.info("配置了自动关闭模拟器，正在执行...")
-                    pid_to_close = await self._run_in_executor(find_emulator_pid, self.device_config.start_command)
-                    if pid_to_close:
-                        await self._kill_emulator_process(pid_to_close)
-            else:
-                raise Exception("Agent设置失败，任务无法继续")
-
+            await self._prepare_task(task, connect)
+
+            log_context.bind(self.device_name, stage="running")
+            task_manager.set_state(DeviceState.RUNNING)
+            self.device_manager.set_state(DeviceState.RUNNING, task_id=task.id, task_name=task.data.resource_name,
+                                          progress=0)
+            # 如果 _run_tasks 抛出 CancelledError，这里不会捕获，将直接中断并冒泡到 run_task_lifecycle
+            result = await self._run_tasks(task)
+            task.result = result
+            task_manager.set_state(DeviceState.COMPLETED, progress=100)
+            log_context.bind(self.device_name, sub_task=None, stage="completed")
+            self.logger.info(f"任务 {task.id} 执行成功")
+
+            if getattr(self.device_config, 'auto_close_emulator', False):
+                self.logger.info("配置了自动关闭模拟器，正在执行...")
+                pid_to_close = await self._run_blocking(find_emulator_pid, self.device_config.start_command)
+                if pid_to_close:
+                    await self._kill_emulator_process(pid_to_close)
+                    self._session.invalidate("模拟器已自动关闭")
+
+        except DeviceConnectionError:
+            # 设备连接失败时后续任务也无法执行，交由 run_task_lifecycle 统一标记失败
+            raise
         except Exception as e:
             # 这个 except 不会捕获 CancelledError，因为它继承自 BaseException
             error_msg = str(e)
             task_manager.set_state(DeviceState.FAILED, error_message=error_msg)
+            log_context.bind(self.device_name, stage="failed")
             self.logger.error(f"任务 {task.id} 失败: {error_msg}", exc_info=True)
         finally:
             # 发送最终状态信号（无论成功、失败还是取消后的状态）
             self.task_state_changed.emit(task.id, task_manager.get_state(), task_manager.get_context())
-            await self._disconnect()
+            # 进程池中的 Agent 进程只服务一个任务，任务结束即归还，避免同一批次的后续任务覆盖租约导致泄漏
+            try:
+                await asyncio.wait_for(self._cleanup_agent(), timeout=10.0)
+            except Exception as e:
+                self.logger.warning(f"归还 Agent 进程时出错: {e}")
 
     async def _cleanup(self):
-        """停止所有活动并清理资源，用于执行器销毁前"""
+        """停止所有活动并释放执行器持有的资源；共享会话中的控制器、Tasker 与资源保留给后续批次"""
         self.logger.info(f"正在为执行器实例 {id(self)} 执行全面清理")
 
-        # 1. 优先停止 MAA 任务
+        # 1. 优先停止 MAA 任务，等待停止完成以便会话中的 Tasker 可被下个批次复用
         try:
             if self._tasker:
-                await self._run_in_executor(self._tasker.post_stop)
-                self._tasker = None
+                tasker = self._tasker
+                await asyncio.wait_for(self._run_control(lambda: tasker.post_stop().wait()), timeout=10.0)
+        except asyncio.TimeoutError:
+            self.logger.warning("停止 MAA tasker 超时，会话中的 Tasker 将被丢弃")
+            self._session.drop_tasker()
         except Exception as e:
             self.logger.warning(f"停止 MAA tasker 时出错: {e}")
+            self._session.drop_tasker()
 
         # 2. 清理 Agent
         try:
@@ -195,249 +239,56 @@ class TaskExecutor(QObject):
             self.logger.warning("Agent清理被取消，但继续执行关键清理步骤")
             # 即使被取消，也要尝试完成基本的Agent清理
             try:
-                if self._agent_process:
-                    self._agent_process.kill()
-                if self._agent_job_handle:
-                    ctypes.windll.kernel32.CloseHandle(self._agent_job_handle)
-                    self._agent_job_handle = None
-                self._agent_process = None
+                agent_pool.discard_now(self._agent_lease)
+                self._agent_lease = None
             except Exception as e:
                 self.logger.error(f"紧急Agent清理失败: {e}")
             # 重新抛出取消异常，让调用方知道被取消了
             raise
 
-        # 3. 关闭线程池
-        if self._executor:
-            # Python 3.9+ 建议使用 cancel_futures=True 强制结束等待中的任务
-            try:
-                self._executor.shutdown(wait=False, cancel_futures=True)
-            except TypeError: # 兼容 3.9 以下版本
-                self._executor.shutdown(wait=False)
-            self._executor = None
-
-        # 4. 断开控制器
-        self._controller = None
-        self._resource = None
+        # 3. 私有会话随执行器一同关闭；共享会话保留控制器与 Tasker 供后续批次复用
+        if self._notification_handler is not None:
+            self._notification_handler.flush()
         self._notification_handler = None
-        self.device_manager.set_state(DeviceState.DISCONNECTED)
-
-        # 5. 强制一次 GC 回收
-        gc.collect()
+        if self._owns_session:
+            await self._disconnect()
+        if self._session.is_connected:
+            self.device_manager.set_state(DeviceState.CONNECTED)
+        else:
+            self.device_manager.set_state(DeviceState.DISCONNECTED)
+            # 5. 会话组件被释放时强制一次 GC 回收
+            gc.collect()
 
         self.logger.info("执行器资源已完全清理")
 
-    # -------------------------------------------------------------------------
-    # Windows Job Object Implementation
-    # -------------------------------------------------------------------------
-        # -------------------------------------------------------------------------
-        # Windows Job Object Implementation (Fixed)
-        # -------------------------------------------------------------------------
-    def _setup_agent_job_object(self, process: subprocess.Popen):
-        """
-        为 Agent 子进程配置 Windows Job Object。
-        修复：使用精确的结构体定义，并处理继承冲突。
-        """
-        if os.name != 'nt' or not process:
-            return
-
-        try:
-            # 1. 创建 Job Object
-            self._agent_job_handle = ctypes.windll.kernel32.CreateJobObjectW(None, None)
-            if not self._agent_job_handle:
-                self.logger.warning(f"Agent Job Object 创建失败: {ctypes.GetLastError()}")
-                return
-
-            # 2. 定义精确的结构体 (修复点：使用 IO_COUNTERS 而非 c_void_p)
-            JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE = 0x2000
-
-            class IO_COUNTERS(ctypes.Structure):
-                _fields_ = [
-                    ('ReadOperationCount', ctypes.c_ulonglong),
-                    ('WriteOperationCount', ctypes.c_ulonglong),
-                    ('OtherOperationCount', ctypes.c_ulonglong),
-                    ('ReadTransferCount', ctypes.c_ulonglong),
-                    ('WriteTransferCount', ctypes.c_ulonglong),
-                    ('OtherTransferCount', ctypes.c_ulonglong),
-                ]
-
-            class JOBOBJECT_BASIC_LIMIT_INFORMATION(ctypes.Structure):
-                _fields_ = [
-                    ('PerProcessUserTimeLimit', wintypes.LARGE_INTEGER),
-                    ('PerJobUserTimeLimit', wintypes.LARGE_INTEGER),
-                    ('LimitFlags', wintypes.DWORD),
-                    ('MinimumWorkingSetSize', ctypes.c_size_t),
-                    ('MaximumWorkingSetSize', ctypes.c_size_t),
-                    ('ActiveProcessLimit', wintypes.DWORD),
-                    ('Affinity', ctypes.c_size_t),
-                    ('PriorityClass', wintypes.DWORD),
-                    ('SchedulingClass', wintypes.DWORD),
-                ]
-
-            class JOBOBJECT_EXTENDED_LIMIT_INFORMATION(ctypes.Structure):
-                _fields_ = [
-                    ('BasicLimitInformation', JOBOBJECT_BASIC_LIMIT_INFORMATION),
-                    ('IoInfo', IO_COUNTERS),  # 这里必须是精确的 IO_COUNTERS 结构
-                    ('ProcessMemoryLimit', ctypes.c_size_t),
-                    ('JobMemoryLimit', ctypes.c_size_t),
-                    ('PeakProcessMemoryUsed', ctypes.c_size_t),
-                    ('PeakJobMemoryUsed', ctypes.c_size_t),
-                ]
-
-            # 3. 配置属性
-            info = JOBOBJECT_EXTENDED_LIMIT_INFORMATION()
-            info.BasicLimitInformation.LimitFlags = JOB_OBJECT_LIMIT_KILL_ON_JOB_CLOSE
-
-            res = ctypes.windll.kernel32.SetInformationJobObject(
-                self._agent_job_handle,
-                9,  # JobObjectExtendedLimitInformation
-                ctypes.pointer(info),
-                ctypes.sizeof(JOBOBJECT_EXTENDED_LIMIT_INFORMATION)
-            )
-
-            if not res:
-                err_code = ctypes.GetLastError()
-                self.logger.warning(f"无法设置 Agent Job Object 属性 (Error Code: {err_code})")
-                ctypes.windll.kernel32.CloseHandle(self._agent_job_handle)
-                self._agent_job_handle = None
-                return
-
-            # 4. 获取子进程句柄并绑定
-            PROCESS_ALL_ACCESS = 0x1FFFFF
-            process_handle = ctypes.windll.kernel32.OpenProcess(PROCESS_ALL_ACCESS, False, process.pid)
-
-            if not process_handle:
-                self.logger.warning(f"无法获取 Agent 进程句柄 (PID: {process.pid})")
-                return
+    async def _run_blocking(self, func, *args):
+        """在共享调度器的短调用通道中运行阻塞操作（截图、连接、查找进程等）"""
+        return await blocking_scheduler.run_short(self.device_name, func, *args)
 
-            try:
-                success = ctypes.windll.kernel32.AssignProcessToJobObject(self._agent_job_handle, process_handle)
-                if not success:
-                    # [修复] 处理 Job 冲突：
-                    # 如果返回 False (Error 5: Access Denied)，通常因为主程序 (main.py) 已经把这个子进程
-                    # 纳入了全局 Job Object。这是好事，说明主程序的防护生效了。
-                    # 我们不需要再创建一个独立的 Job，直接忽略即可。
-                    err = ctypes.GetLastError()
-                    if err == 5:  # ERROR_ACCESS_DENIED
-                        self.logger.info(
-                            f"Agent (PID: {process.pid}) 已由全局主程序 Job Object 管理 (跳过独立绑定)。")
-                        # 释放无用的 handle
-                        ctypes.windll.kernel32.CloseHandle(self._agent_job_handle)
-                        self._agent_job_handle = None
-                    else:
-                        self.logger.debug(f"绑定 Job Object 失败 (Code: {err})")
-                else:
-                    self.logger.info(f"Agent (PID: {process.pid}) 已成功绑定到独立 Job Object")
-            finally:
-                ctypes.windll.kernel32.CloseHandle(process_handle)
+    async def _run_long(self, func, *args):
+        """在共享调度器的长调用通道中运行阻塞操作（等待任务完成、加载资源、连接 Agent）"""
+        return await blocking_scheduler.run_long(self.device_name, func, *args)
 
-        except Exception as e:
-            self.logger.error(f"设置 Agent Job Object 时发生错误: {e}")
-
-    def _create_notification_handler(self):
-        """创建通知处理器"""
-
-        class Handler(ContextEventSink):
-            def __init__(self, executor):
-                super().__init__()
-                # 使用弱引用，避免循环引用阻止垃圾回收
-                self.executor_ref = weakref.ref(executor)
-                # 预编译正则：匹配 [info]消息内容，忽略大小写
-                self._log_pattern = re.compile(r"^\[(info|debug|warning|error|critical)\](.*)", re.IGNORECASE)
-
-            @property
-            def executor(self):
-                return self.executor_ref()
-
-            def _process_log_protocol(self, focus_data, key_map, noti_type):
-                exec_obj = self.executor
-                if not exec_obj or not focus_data or not isinstance(focus_data, dict):
-                    return False
-
-                protocol_key = key_map.get(noti_type)
-                if not protocol_key or protocol_key not in focus_data:
-                    return False
-
-                raw_content = focus_data[protocol_key]
-                messages = raw_content if isinstance(raw_content, list) else [str(raw_content)]
-
-                for msg in messages:
-                    match = self._log_pattern.match(msg)
-                    if match:
-                        level_str = match.group(1).lower()
-                        content = match.group(2)
-                        log_func = getattr(exec_obj.logger, level_str, exec_obj.logger.info)
-                        log_func(content)
-                    else:
-                        exec_obj.logger.info(msg)
-
-                return True
-
-            def on_node_recognition(self, context, noti_type: NotificationType,
-                                    detail: ContextEventSink.NodeRecognitionDetail):
-                recog_key_map = {
-                    NotificationType.Starting: 'Node.Recognition.Starting',
-                    NotificationType.Succeeded: 'Node.Recognition.Succeeded',
-                    NotificationType.Failed: 'Node.Recognition.Failed',
-                }
-                focus = getattr(detail, "focus", None)
-                if self._process_log_protocol(focus, recog_key_map, noti_type):
-                    return
-
-            def on_node_action(self, context, noti_type: NotificationType, detail: ContextEventSink.NodeActionDetail):
-                exec_obj = self.executor
-                if not exec_obj or not detail or not hasattr(detail, "focus") or not detail.focus:
-                    return
-                focus = detail.focus
-
-                action_key_map = {
-                    NotificationType.Starting: 'Node.Action.Starting',
-                    NotificationType.Succeeded: 'Node.Action.Succeeded',
-                    NotificationType.Failed: 'Node.Action.Failed',
-                }
-
-                if self._process_log_protocol(focus, action_key_map, noti_type):
-                    return
-
-                old_protocol_map = {
-                    NotificationType.Succeeded: ("succeeded", exec_obj.logger.info),
-                    NotificationType.Failed: ("failed", exec_obj.logger.error),
-                    NotificationType.Starting: ("start", exec_obj.logger.info),
-                }
-
-                if noti_type in old_protocol_map:
-                    key, default_log_func = old_protocol_map[noti_type]
-                    log_func = default_log_func
-                    level_config = focus.get("level")
-                    if isinstance(level_config, dict):
-                        log_level_str = level_config.get(key)
-                        if log_level_str:
-                            log_func = getattr(exec_obj.logger, log_level_str, default_log_func)
-
-                    if key in focus:
-                        values = focus[key]
-                        if isinstance(values, list):
-                            for v in values:
-                                log_func(str(v))
-                        else:
-                            log_func(str(values))
-
-        return Handler(self)
-
-    async def _run_in_executor(self, func, *args):
-        """在线程池中运行阻塞操作"""
-        loop = asyncio.get_event_loop()
-        return await loop.run_in_executor(self._executor, func, *args)
+    async def _run_control(self, func, *args):
+        """在共享调度器的控制通道中运行停止任务、断开 Agent 等调用，不与长调用争抢线程"""
+        return await blocking_scheduler.run_control(self.device_name, func, *args)
 
     async def _ensure_connection(self) -> bool:
-        """确保设备连接就绪，如果未连接则尝试连接"""
-        if self._controller and self._controller.connected:
-            self.logger.debug("控制器已连接，跳过连接步骤。")
-            return True
+        """确保设备连接就绪，如果会话中的控制器健康则直接复用"""
+        if self._session.controller is not None:
+            if self._session.controller_key != controller_fingerprint(self.device_config):
+                self._session.invalidate("设备控制器配置已变更")
+            elif await self._session.probe(self._run_blocking):
+                self._session.metrics.reconnects_avoided += 1
+                self.logger.info(f"复用会话中已连接的控制器 (已避免重连 {self._session.metrics.reconnects_avoided} 次)")
+                return True
+            else:
+                self._session.invalidate("控制器健康探测失败")
         self.logger.info("开始确保设备连接...")
         self.device_manager.set_state(DeviceState.CONNECTING)
         try:
             current_dir = os.getcwd()
-            await self._run_in_executor(Toolkit.init_option, os.path.join(current_dir, "assets"))
+            await self._run_blocking(Toolkit.init_option, os.path.join(current_dir, "assets"))
             if global_config.app_config.debug_model:
                 Tasker.set_debug_mode(True)
             pid = await self._manage_emulator_process()
@@ -461,17 +312,17 @@ class TaskExecutor(QObject):
             self.logger.info("未配置启动命令，跳过模拟器状态检查。")
             return None
         self.logger.info(f"正在为设备 '{self.device_name}' 检查模拟器状态...")
-        pid = await self._run_in_executor(find_emulator_pid, self.device_config.start_command)
+        pid = await self._run_blocking(find_emulator_pid, self.device_config.start_command)
         if pid:
             self.logger.info(f"检测到模拟器已在运行。PID: {pid}")
             return pid
         if getattr(self.device_config, 'auto_start_emulator', False):
             self.logger.info("模拟器未运行，将根据配置尝试启动...")
-            pid = await self._start_emulator_and_wait_for_pid(self.device_config.start_command)
-            if pid:
-                wait_time = global_config.get_app_config().emulator_start_wait_time
-                await self._wait_for_emulator_startup(wait_time)
-                return pid
+            async with self._boot_slot():
+                pid = await self._start_emulator_and_wait_for_pid(self.device_config.start_command)
+                if pid:
+                    await self._wait_for_emulator_ready()
+                    return pid
         else:
             self.logger.warning("模拟器未运行，且自动启动选项未开启。")
         return None
@@ -479,25 +330,29 @@ class TaskExecutor(QObject):
     async def _initialize_controller_with_retries(self, pid: Optional[int]) -> bool:
         """带重试逻辑的控制器初始化"""
         max_retries = 3
+        backoff = ExponentialBackoff(initial=1.0, factor=2.0, maximum=8.0)
         for attempt in range(1, max_retries + 1):
             self.logger.info(f"正在进行第 {attempt}/{max_retries} 次控制器初始化尝试...")
             if await self._initialize_controller():
+                self._record_boot_time()
                 return True
             self.logger.warning(f"第 {attempt} 次控制器初始化失败。")
             if attempt < max_retries:
                 if pid and self.device_config.start_command:
                     self.logger.info("将尝试重启模拟器后重试...")
                     await self._kill_emulator_process(pid)
-                    new_pid = await self._start_emulator_and_wait_for_pid(self.device_config.start_command)
+                    async with self._boot_slot():
+                        new_pid = await self._start_emulator_and_wait_for_pid(self.device_config.start_command)
+                        if new_pid:
+                            await self._wait_for_emulator_ready()
                     if not new_pid:
                         self.logger.error("重启模拟器失败，无法继续。")
                         break
                     pid = new_pid
-                    wait_time = global_config.get_app_config().emulator_start_wait_time
-                    await self._wait_for_emulator_startup(wait_time)
                 else:
-                    self.logger.warning("无法重启模拟器，将直接重试连接。")
-                    await asyncio.sleep(5)
+                    delay = backoff.next_delay()
+                    self.logger.warning(f"无法重启模拟器，将在 {delay:.0f} 秒后直接重试连接。")
+                    await asyncio.sleep(delay)
         self.logger.error(f"控制器在 {max_retries} 次尝试后仍初始化失败。请检查模拟器状态或ADB连接是否稳定。")
         self.device_manager.set_state(DeviceState.ERROR, error_message="控制器初始化失败")
         return False
@@ -505,7 +360,7 @@ class TaskExecutor(QObject):
     async def _disconnect(self):
         """断开控制器连接并清理"""
         self.logger.debug("正在断开控制器...")
-        self._controller = None
+        self._session.close("执行器私有会话结束")
 
     async def _kill_emulator_process(self, pid: int):
         """安全地终止指定PID的进程"""
@@ -527,7 +382,7 @@ class TaskExecutor(QObject):
                 except psutil.NoSuchProcess:
                     self.logger.info(f"在尝试终止时，进程 {p_id} 已消失。")
 
-            await self._run_in_executor(kill_sync, pid)
+            await self._run_blocking(kill_sync, pid)
         except Exception as e:
             self.logger.error(f"终止进程 {pid} 时发生错误: {e}", exc_info=True)
 
@@ -540,21 +395,52 @@ class TaskExecutor(QObject):
             subprocess.Popen(start_command, shell=True, creationflags=creationflags)
 
         try:
-            await self._run_in_executor(_launch)
+            await self._run_blocking(_launch)
         except Exception as e:
             self.logger.error(f"执行模拟器启动命令失败: {e}", exc_info=True)
             return None
+        self._boot_started_at = time.monotonic()
         self.logger.info("命令已执行，开始轮询等待进程 PID...")
         start_time = time.time()
+        backoff = ExponentialBackoff(initial=0.25, factor=1.5, maximum=2.0)
         while time.time() - start_time < timeout:
-            pid = await self._run_in_executor(find_emulator_pid, start_command)
+            pid = await self._run_blocking(find_emulator_pid, start_command)
             if pid:
                 self.logger.info(f"成功找到模拟器进程，PID: {pid}")
                 return pid
-            await asyncio.sleep(1)
+            await asyncio.sleep(backoff.next_delay())
         self.logger.error(f"等待模拟器启动超时（{timeout}秒）")
         return None
 
+    @asynccontextmanager
+    async def _boot_slot(self):
+        """持有主机级模拟器启动名额，避免大量模拟器同时冷启动"""
+        async with admission_controller.boot_slot(self.device_name):
+            self.device_manager.set_state(DeviceState.CONNECTING)
+            yield
+
+    async def _wait_for_emulator_ready(self):
+        """等待新启动的模拟器就绪：ADB 设备通过就绪探测尽早返回，其他设备等待固定时间"""
+        wait_time = global_config.get_app_config().emulator_start_wait_time
+        cfg = self.device_config.controller_config
+        if self.device_config.device_type != DeviceType.ADB or not getattr(cfg, 'adb_path', None):
+            await self._wait_for_emulator_startup(wait_time)
+            return
+        timeout = boot_time_history.timeout_for(self.device_name, wait_time)
+        expected = boot_time_history.expected(self.device_name, wait_time)
+        self.logger.info(f"模拟器已启动，开始探测就绪状态（预计 {expected:.0f} 秒，超时 {timeout:.0f} 秒）...")
+        prober = EmulatorReadinessProber(cfg.adb_path, cfg.address, self._run_blocking, self.logger)
+        await prober.wait_until_ready(timeout)
+
+    def _record_boot_time(self):
+        """控制器首次连接成功时记录本次模拟器启动耗时，用于后续启动的超时估算"""
+        if self._boot_started_at is None:
+            return
+        elapsed = time.monotonic() - self._boot_started_at
+        self._boot_started_at = None
+        boot_time_history.record(self.device_name, elapsed)
+        self.logger.info(f"模拟器从启动到可用耗时 {elapsed:.1f} 秒")
+
     async def _wait_for_emulator_startup(self, wait_time: int = 20):
         """等待固定的时间以确保模拟器完全启动"""
         self.logger.info(f"模拟器已启动，将等待 {wait_time} 秒以确保其服务完全可用...")
@@ -570,97 +456,191 @@ class TaskExecutor(QObject):
         try:
             if self.device_config.device_type == DeviceType.ADB:
                 cfg = self.device_config.controller_config
-                self._controller = AdbController(cfg.adb_path, cfg.address, cfg.screencap_methods,
-                                                 input_methods=cfg.input_methods, config=cfg.config)
+                controller = AdbController(cfg.adb_path, cfg.address, cfg.screencap_methods,
+                                           input_methods=cfg.input_methods, config=cfg.config)
             elif self.device_config.device_type == DeviceType.WIN32:
                 cfg = self.device_config.controller_config
-                self._controller = Win32Controller(cfg.hWnd)
+                controller = Win32Controller(cfg.hWnd)
             else:
                 raise ValueError(f"不支持的设备类型: {self.device_config.device_type}")
-            await self._run_in_executor(self._controller.post_connection().wait)
-            if not self._controller.connected:
+            await self._run_blocking(controller.post_connection().wait)
+            if not controller.connected:
                 self.logger.error("控制器连接失败")
                 return False
-            await self._run_in_executor(lambda: self._controller.post_screencap().wait().get())
+            await self._run_blocking(lambda: controller.post_screencap().wait().get())
+            self._session.attach_controller(controller, controller_fingerprint(self.device_config))
             self.logger.info("控制器连接和截图测试成功")
             return True
         except Exception as e:
             self.logger.error(f"控制器初始化过程中发生异常: {e}", exc_info=True)
             return False
 
-    async def _load_resource(self, resource_pack: Dict[str, Any], resource_path: str) -> Resource:
-        """加载资源"""
-        if self._current_resource_path == resource_path and self._current_resource:
-            return self._current_resource
+    async def _acquire_resource(self, resource_pack: Dict[str, Any], resource_path: str,
+                                exclusive: bool) -> ResourceLease:
+        """从进程级资源缓存获取资源租约，缓存未命中时加载资源"""
         try:
-            self.logger.info(f"开始加载资源，根路径: {resource_path}")
-            resource = Resource()
-            base_path = Path(resource_path)
-            paths_to_load = []
+            self.logger.info(f"开始获取资源，根路径: {resource_path}")
             if resource_pack and resource_pack.get('path'):
-                pack_name = resource_pack.get('name', 'Unknown')
-                self.logger.info(f"检测到资源包 '{pack_name}'，将按顺序加载其路径...")
-                relative_paths = resource_pack.get('path', [])
-                paths_to_load = [str(base_path / rel_path) for rel_path in relative_paths]
+                self.logger.info(f"检测到资源包 '{resource_pack.get('name', 'Unknown')}'，将按顺序加载其路径...")
             else:
                 self.logger.info("未检测到有效资源包，仅加载资源根路径。")
-                paths_to_load = [resource_path]
-            for i, path in enumerate(paths_to_load):
-                self.logger.debug(f"正在加载路径 ({i + 1}/{len(paths_to_load)}): {path}")
-                try:
-                    await self._run_in_executor(lambda p=path: resource.post_bundle(p).wait())
-                    self.logger.debug(f"成功加载路径: {path}")
-                except Exception as e:
-                    self.logger.error(f"加载路径 {path} 时发生错误: {e}")
-            self.logger.info("所有资源路径加载完成。")
-            self._current_resource = resource
-            self._current_resource_path = resource_path
-            return resource
+            return await resource_cache.acquire(resource_pack, resource_path, self._run_long,
+                                                logger=self.logger, exclusive=exclusive)
         except Exception as e:
             self.logger.error(f"资源加载过程中发生严重错误: {e}")
             raise
 
-    async def _create_tasker(self, resource_pack, resource_path: str):
-        """创建任务器"""
-        resource = await self._load_resource(resource_pack, resource_path)
-        resource.clear_custom_action()
-        resource.clear_custom_recognition()
-        self._tasker = Tasker()
-        self._tasker.add_context_sink(self._notification_handler)
-        self._tasker.bind(resource=resource, controller=self._controller)
-        if not self._tasker.inited:
-            raise RuntimeError("任务执行器初始化失败")
+    def _needs_agent(self, task: Task) -> bool:
+        """任务所属资源是否配置了 Agent"""
+        resource_config = global_config.get_resource_config(task.data.resource_name)
+        return bool(resource_config and resource_config.agent.agent_path)
+
+    async def _prepare_task(self, task: Task, connect: bool):
+        """按依赖图并行执行任务的准备阶段，并记录各阶段耗时与关键路径"""
+        pack, path = task.data.resource_pack, task.data.resource_path
+        exclusive = self._needs_agent(task)
+
+        graph = StageGraph(f"任务 {task.data.resource_name} 准备")
+        bind_deps = ("resource",)
+        if connect:
+            graph.add("connection", self._connect_device)
+            bind_deps = ("connection", "resource")
+        graph.add("resource", lambda: self._prepare_resource(pack, path, exclusive))
+        graph.add("agent_env", lambda: self._prepare_agent_process(task))
+        graph.add("bind", lambda resource, **_: self._bind_tasker(resource, pack, path, exclusive), deps=bind_deps)
+        graph.add("agent", lambda agent_env, **_: self._setup_agent_client(agent_env), deps=("bind", "agent_env"))
+
+        try:
+            await graph.run()
+        except Exception:
+            await self._cleanup_agent(force_kill=True)
+            raise
+        finally:
+            # 绑定阶段未能执行时归还已获取的资源租约
+            resource_cache.release(self._pending_lease)
+            self._pending_lease = None
+            self.logger.info(graph.summary())
+            task.state_manager.update_context(stage_timings=graph.timings(), critical_path=graph.critical_path())
+
+    async def _connect_device(self):
+        """连接阶段：确保设备连接就绪"""
+        if not await self._ensure_connection():
+            raise DeviceConnectionError("为任务准备设备连接失败，任务将标记为失败。")
+
+    async def _prepare_resource(self, resource_pack, resource_path: str,
+                                exclusive: bool) -> Tuple[Tuple, Optional[ResourceLease]]:
+        """
+        资源阶段：会话中已有绑定同一资源的 Tasker 时无需加载，否则获取资源租约。
+        需要绑定 Agent 的资源会注册自定义动作，因此使用独占的资源实例。
+        """
+        key, fingerprint, _ = await resource_cache.fingerprint(resource_pack, resource_path, self._run_blocking)
+        resource_key = (key, fingerprint)
+        if self._session.has_tasker_for(resource_key, exclusive):
+            return resource_key, None
+        self._pending_lease = await self._acquire_resource(resource_pack, resource_path, exclusive)
+        return resource_key, self._pending_lease
+
+    async def _bind_tasker(self, prepared: Tuple[Tuple, Optional[ResourceLease]], resource_pack, resource_path: str,
+                           exclusive: bool):
+        """绑定阶段：设备与资源均就绪后创建任务器；会话中已有绑定同一资源的 Tasker 时直接复用"""
+        resource_key, lease = prepared
+        self._pending_lease = None
+        if self._session.has_tasker_for(resource_key, exclusive):
+            resource_cache.release(lease)
+            if self._session.resource_lease.exclusive:
+                self._session.resource.clear_custom_action()
+                self._session.resource.clear_custom_recognition()
+            self._session.metrics.tasker_reuses += 1
+            self.logger.info("复用会话中的任务执行器与已加载资源")
+            return
+
+        if lease is None:
+            # 连接阶段使会话中的 Tasker 失效，需要重新获取资源
+            lease = await self._acquire_resource(resource_pack, resource_path, exclusive)
+        try:
+            if exclusive:
+                lease.resource.clear_custom_action()
+                lease.resource.clear_custom_recognition()
+            tasker = Tasker()
+            tasker.add_context_sink(self._notification_handler)
+            tasker.bind(resource=lease.resource, controller=self._controller)
+            if not tasker.inited:
+                raise RuntimeError("任务执行器初始化失败")
+        except BaseException:
+            resource_cache.release(lease)
+            raise
+        self._session.attach_tasker(tasker, lease, resource_key)
+        self._session.event_sink = self._notification_handler
         self.logger.info("任务执行器创建成功")
 
-    async def _setup_agent(self, task: Task) -> bool:
-        """设置Agent - 使用全局Python运行时管理器"""
+    async def _prepare_agent_process(self, task: Task) -> Optional[PooledAgent]:
+        """Agent环境阶段：准备Python环境并从进程池租用Agent进程，不依赖设备连接与资源加载"""
         resource_config = global_config.get_resource_config(task.data.resource_name)
         if not resource_config or not resource_config.agent.agent_path:
-            return True
+            return None
         try:
             self.device_manager.set_state(DeviceState.UPDATING)
-            if not self._agent:
-                self._agent = AgentClient()
-                self._agent.bind(self._current_resource)
             agent_config = resource_config.agent
             python_exe = await self._prepare_python_environment_global(task.data.resource_name, task.data.resource_path,
                                                                        agent_config.version, agent_config.use_venv,
                                                                        agent_config.requirements_path)
             if not python_exe:
                 raise Exception("Python环境准备失败")
-            await self._start_agent_process(task, agent_config, python_exe)
+            spec = AgentSpec.create(task.data.resource_name, python_exe, self.device_name,
+                                    task.data.resource_path, agent_config)
+            # 正常情况下上个任务结束时已归还；这里兜底，避免覆盖未归还的租约
+            await self._cleanup_agent()
+            self._agent_lease = await agent_pool.lease(spec, self.logger)
+            return self._agent_lease
+        except Exception as e:
+            self.logger.error(f"Agent设置失败: {e}")
+            self.device_manager.set_state(DeviceState.ERROR, error_message=str(e))
+            raise
+
+    async def _setup_agent_client(self, agent: Optional[PooledAgent]):
+        """Agent阶段：资源绑定完成后，将 AgentClient 绑定到资源并连接租用的Agent进程"""
+        if agent is None:
+            return
+        try:
+            self._agent = AgentClient(agent.identifier)
+            self._agent.bind(self._current_resource)
             self.logger.debug("尝试连接Agent...")
-            connected = await self._run_in_executor(self._agent.connect)
-            if not connected:
+            if not await self._connect_agent(agent):
                 raise Exception("无法连接到Agent")
             self.device_manager.set_state(DeviceState.PREPARING)
             self.logger.info("Agent连接成功")
-            return True
         except Exception as e:
             self.logger.error(f"Agent设置失败: {e}")
             self.device_manager.set_state(DeviceState.ERROR, error_message=str(e))
-            await self._cleanup_agent(force_kill=True)
-            return False
+            raise
+
+    async def _connect_agent(self, agent: PooledAgent, timeout: float = 60.0) -> bool:
+        """
+        连接Agent，同时监视进程状态：进程提前退出时立即失败，而不是固定等待后再连接。
+        超时或被取消时结束 Agent 进程，使阻塞中的 connect 尽快返回并释放长调用线程。
+        """
+        connect_future = asyncio.ensure_future(self._run_long(self._agent.connect))
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                done, _ = await asyncio.wait({connect_future}, timeout=0.2)
+                if done:
+                    return bool(connect_future.result())
+                if not agent.alive:
+                    raise Exception(f"Agent进程已退出 (退出码: {agent.returncode})")
+                if time.monotonic() > deadline:
+                    raise Exception(f"连接Agent超时 ({timeout:.0f} 秒)")
+        except BaseException:
+            if not connect_future.done():
+                try:
+                    if agent.alive:
+                        agent.process.kill()
+                except Exception as e:
+                    self.logger.debug(f"结束 Agent 进程时出错 (通常忽略): {e}")
+                connect_future.cancel()
+            # 取出连接调用的结果，避免"未检索的异常"警告
+            await asyncio.gather(connect_future, return_exceptions=True)
+            raise
 
     async def _prepare_python_environment_global(self, resource_name: str, resource_path: str, python_version: str,
                                                  use_venv: bool, requirements_path: str) -> Optional[str]:
@@ -698,146 +678,146 @@ class TaskExecutor(QObject):
             return None
 
     async def _run_tasks(self, task: Task) -> dict:
-        """执行任务列表"""
+        """执行任务列表；当天已完成的子任务会从检查点恢复并跳过"""
         task_list = task.data.task_list
         self.logger.info(f"当前资源版本: {task.data.resource_version}")
         task_manager = task.state_manager
         self.logger.info(f"执行任务列表，共 {len(task_list)} 个子任务")
+
+        checkpoint_key = task_checkpoints.make_key(self.device_name, task.data)
+        fingerprint = task_list_fingerprint(task.data)
+        if task.data.force_rerun:
+            self.logger.info("已要求完整重新执行，忽略当天的任务检查点")
+            await self._run_blocking(task_checkpoints.clear, checkpoint_key)
+            completed = set()
+        else:
+            completed = await self._run_blocking(task_checkpoints.load, checkpoint_key, fingerprint)
+        if completed:
+            first_pending = next((i for i in range(len(task_list)) if i not in completed), len(task_list))
+            self.logger.info(f"从检查点恢复：已完成 {len(completed)} 个子任务，从第 {first_pending + 1} 个子任务继续")
+
+        results: List[Dict[str, Any]] = [
+            {'index': i, 'task_name': t.task_name, 'status': 'skipped' if i in completed else 'pending',
+             'attempts': 0, 'error': None, 'duration': 0.0}
+            for i, t in enumerate(task_list)
+        ]
+        task_manager.update_context(subtask_results=[dict(r) for r in results])
+
+        failed: List[str] = []
         for i, sub_task in enumerate(task_list):
             if task_manager.get_state() == DeviceState.CANCELED:
                 raise asyncio.CancelledError()
             await asyncio.sleep(0)
 
-            self.logger.info(f"执行子任务 {i + 1}/{len(task_list)}: {sub_task.task_name}")
-
-            def run_sub_task():
-                self._tasker.resource.override_pipeline(sub_task.pipeline_override)
-                job = self._tasker.post_task(sub_task.task_entry)
-                job.wait()
-                if job.status == 4: raise Exception(f"子任务 {sub_task.task_name} 执行失败")
-                return job.get()
-
-            try:
-                await self._run_in_executor(run_sub_task)
-            except asyncio.CancelledError:
-                self.logger.warning(f"子任务 {sub_task.task_name} 在执行中被中断")
-                await self._run_in_executor(self._tasker.post_stop)
-                raise  # 将异常抛给 _execute_task 的上层 run_task_lifecycle 处理
+            if i in completed:
+                self.logger.debug(f"跳过已完成的子任务 {i + 1}/{len(task_list)}: {sub_task.task_name}")
+                continue
 
+            log_manager.context.bind(self.device_name, sub_task=sub_task.task_name)
+            self.logger.info(f"执行子任务 {i + 1}/{len(task_list)}: {sub_task.task_name}")
+            policy = RetryPolicy.resolve(global_config.app_config, sub_task.retry)
+            result = results[i]
+            started = time.monotonic()
+            result['status'] = 'running'
+
+            error = await self._run_sub_task_with_retry(sub_task, policy, result)
+            result['duration'] = round(time.monotonic() - started, 3)
+
+            if error is None:
+                result['status'] = 'success'
+                completed.add(i)
+                await self._run_blocking(task_checkpoints.mark_completed, checkpoint_key, fingerprint,
+                                            set(completed))
+                self.logger.info(f"子任务 {sub_task.task_entry} 执行完毕")
+            else:
+                result['status'] = 'failed'
+                result['error'] = str(error)
+                failed.append(sub_task.task_name)
+                if not policy.continue_on_failure:
+                    for pending in results[i + 1:]:
+                        if pending['status'] == 'pending':
+                            pending['status'] = 'not_run'
+                    task_manager.update_context(subtask_results=[dict(r) for r in results])
+                    raise error
+                self.logger.warning(f"子任务 {sub_task.task_name} 最终失败，按配置继续执行后续子任务")
+
+            task_manager.update_context(subtask_results=[dict(r) for r in results])
             progress = int((i + 1) / len(task_list) * 100)
             task_manager.set_progress(progress)
             self.device_manager.set_progress(progress)
-            self.logger.info(f"子任务 {sub_task.task_entry} 执行完毕")
-        return {"result": "success", "data": task.data}
-
-    async def _start_agent_process(self, task: Task, agent_config, python_exe: str):
-        """启动Agent进程"""
-        agent_full_path = Path(task.data.resource_path) / agent_config.agent_path
-        cmd = [python_exe, "-u", str(agent_full_path)]
-        if agent_config.agent_params: cmd.extend(agent_config.agent_params.split())
-        cmd.extend(["-device", self.device_name, "-id", self._agent.identifier])
-        self.logger.debug(f"Agent启动命令: {' '.join(cmd)}")
-
-        def start_process():
-            agent_env = os.environ.copy()
-            agent_env["PYTHONUTF8"] = "1"
-            common_kwargs = dict(cwd=os.getcwd(), stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=agent_env,
-                                 text=True, encoding="utf-8", errors="replace")
-            if os.name == 'nt':
-                # 注意：CREATE_NEW_PROCESS_GROUP 允许发送信号，但通常不影响 Job 继承
-                return subprocess.Popen(cmd,
-                                        creationflags=subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.CREATE_NO_WINDOW,
-                                        **common_kwargs)
-            else:
-                return subprocess.Popen(cmd, preexec_fn=os.setsid, **common_kwargs)
 
-        self._agent_process = await self._run_in_executor(start_process)
-        self.logger.info(f"Agent进程已启动，PID: {self._agent_process.pid}")
+        log_manager.context.bind(self.device_name, sub_task=None)
+        if failed:
+            # 保留检查点，再次提交时只会重新执行失败的子任务
+            raise Exception(f"{len(failed)} 个子任务执行失败: {', '.join(failed)}")
 
-        await self._run_in_executor(self._setup_agent_job_object, self._agent_process)
-
-        if not hasattr(global_config, "agent_processes"): global_config.agent_processes = []
-        global_config.agent_processes.append(self._agent_process)
-        self._start_log_threads()
-        await asyncio.sleep(1)
-        if self._agent_process.poll() is not None:
-            self.logger.error(f"Agent进程启动后立即退出了")
-
-    def _start_log_threads(self):
-        """启动日志捕获线程 - 优化版本，使用队列避免阻塞"""
+        # 整批完成后删除检查点，同一天再次提交时将完整执行
+        await self._run_blocking(task_checkpoints.clear, checkpoint_key)
+        return {"result": "success", "data": task.data}
 
-        def log_output(pipe, prefix):
+    async def _run_sub_task_with_retry(self, sub_task, policy: RetryPolicy,
+                                       result: Dict[str, Any]) -> Optional[Exception]:
+        """按重试策略执行单个子任务，成功返回 None，最终失败返回最后一次的异常"""
+
+        def run_sub_task():
+            # 覆盖参数随任务提交，不写入资源本身，避免污染会话中复用的资源
+            job = self._tasker.post_task(sub_task.task_entry, sub_task.pipeline_override)
+            job.wait()
+            if job.status == 4: raise Exception(f"子任务 {sub_task.task_name} 执行失败")
+            return job.get()
+
+        last_error: Optional[Exception] = None
+        for attempt in range(1, policy.max_attempts + 1):
+            # 重新连接失败的尝试同样计入尝试次数
+            result['attempts'] = attempt
+            if attempt > 1:
+                delay = policy.delay_before(attempt)
+                self.logger.warning(f"子任务 {sub_task.task_name} 第 {attempt - 1} 次执行失败: {last_error}，"
+                                    f"{delay:.1f} 秒后进行第 {attempt}/{policy.max_attempts} 次尝试")
+                await asyncio.sleep(delay)
+                if policy.reconnect and not await self._reconnect_controller():
+                    last_error = Exception(f"子任务 {sub_task.task_name} 第 {attempt} 次尝试前重新连接控制器失败")
+                    self.logger.warning(f"{last_error}，第 {attempt}/{policy.max_attempts} 次尝试记为失败")
+                    continue
             try:
-                buffer = []
-                buffer_size = 10  # 每10行批量处理一次
-
-                for line in iter(pipe.readline, ''):
-                    if line:
-                        buffer.append(f"[Agent {prefix}] {line.rstrip()}")
-
-                        # 达到缓冲区大小时批量记录
-                        if len(buffer) >= buffer_size:
-                            for buffered_line in buffer:
-                                self.logger.debug(buffered_line)
-                            buffer.clear()
-
-                            # 短暂休眠，避免过度占用CPU
-                            time.sleep(0.01)
-
-                # 处理剩余的缓冲区内容
-                for buffered_line in buffer:
-                    self.logger.debug(buffered_line)
-
+                await self._run_long(run_sub_task)
+                return None
+            except asyncio.CancelledError:
+                self.logger.warning(f"子任务 {sub_task.task_name} 在执行中被中断")
+                await self._run_control(self._tasker.post_stop)
+                raise  # 将异常抛给 _execute_task 的上层 run_task_lifecycle 处理
             except Exception as e:
-                self.logger.warning(f"日志线程 {prefix} 异常退出: {e}")
-            finally:
-                pipe.close()
-
-        for pipe, prefix in [(self._agent_process.stdout, 'stdout'), (self._agent_process.stderr, 'stderr')]:
-            thread = threading.Thread(target=log_output, args=(pipe, prefix), daemon=True)
-            thread.name = f"AgentLog_{self.device_name}_{prefix}"
-            thread.start()
+                last_error = e
+        self.logger.error(f"子任务 {sub_task.task_name} 执行失败（共尝试 {result['attempts']} 次）: {last_error}")
+        return last_error
+
+    async def _reconnect_controller(self) -> bool:
+        """重新连接当前会话的控制器，Tasker 仍绑定在同一个控制器上"""
+        controller = self._controller
+        if controller is None:
+            return False
+        try:
+            self.logger.info("重试前重新连接控制器...")
+            await self._run_blocking(controller.post_connection().wait)
+            return bool(controller.connected)
+        except Exception as e:
+            self.logger.error(f"重新连接控制器失败: {e}")
+            return False
 
     async def _cleanup_agent(self, force_kill: bool = False):
         """
-        清理Agent - 无论是否请求强制，此处均执行强制清理。
-        不会尝试 terminate() 等待，直接 kill 并关闭 Job 句柄。
+        清理Agent - 先断开客户端，再将进程归还进程池。
+        Agent 进程在客户端断开后即退出，进程池会直接回收该进程并在后台补充新的预热进程。
         """
-        if self._agent_process:
-            self.logger.warning(f"正在强制清理 Agent 进程 (PID: {self._agent_process.pid})...")
-            try:
-                self._agent_process.kill()
-                # 等待进程结束，避免竞争条件
-                try:
-                    await asyncio.wait_for(
-                        self._run_in_executor(self._agent_process.wait),
-                        timeout=5.0
-                    )
-                    self.logger.debug(f"Agent 进程 (PID: {self._agent_process.pid}) 已确认结束")
-                except asyncio.TimeoutError:
-                    self.logger.warning(f"等待 Agent 进程结束超时，继续清理")
-                except Exception as e:
-                    self.logger.debug(f"等待进程结束时出错 (通常忽略): {e}")
-            except Exception as e:
-                self.logger.error(f"Kill Agent 进程时出错 (通常忽略): {e}")
-
-            # 关闭 Job 句柄：如果进程因某种原因还活着，Job Object 会由操作系统层面进行收割
-            if self._agent_job_handle:
-                try:
-                    self.logger.debug("正在关闭 Agent Job Object 句柄 (这将触发内核级进程清理)")
-                    ctypes.windll.kernel32.CloseHandle(self._agent_job_handle)
-                except Exception as e:
-                    self.logger.error(f"关闭 Job Handle 失败: {e}")
-                self._agent_job_handle = None
-
-            if hasattr(global_config, "agent_processes") and self._agent_process in global_config.agent_processes:
-                global_config.agent_processes.remove(self._agent_process)
-            self._agent_process = None
-
         if self._agent:
             try:
                 # 尽力通知断开，但如果不成功也不阻塞
-                await self._run_in_executor(self._agent.disconnect)
+                await self._run_control(self._agent.disconnect)
             except Exception:
                 pass
-            self._agent = None
\ No newline at end of file
+            self._agent = None
+
+        if self._agent_lease:
+            lease, self._agent_lease = self._agent_lease, None
+            self.logger.debug(f"正在回收 Agent 进程 (PID: {lease.pid})...")
+            await agent_pool.release(lease)
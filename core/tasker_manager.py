@@ -4,11 +4,13 @@
 - 集中管理所有设备的任务队列。
 - 按需创建和销毁任务执行器 (TaskExecutor)。
 - 每个设备同时只运行一个任务处理器。
+- 设备会话 (DeviceSession) 跨批次保持连接，空闲超时后自动关闭。
+- 主机级准入控制限制同时运行的设备数量，超出时按先来先到排队。
+- 设备任务队列按优先级出队，并合并重复提交的相同资源/配置方案。
 """
 
-from typing import Dict, Optional, List, Union, DefaultDict
+from typing import Dict, Optional, List, Union, Any
 import asyncio
-from collections import defaultdict
 
 from PySide6.QtCore import QObject, Signal, Slot
 from qasync import asyncSlot
@@ -17,6 +19,11 @@ from app.models.config.app_config import DeviceConfig, Resource
 from app.models.config.global_config import RunTimeConfigs, global_config
 from app.models.logging.log_manager import log_manager
 from core.task_executor import TaskExecutor
+from core.device_session import device_session_manager
+from core.agent_pool import agent_pool
+from core.admission_controller import admission_controller
+from core.blocking_scheduler import blocking_scheduler
+from core.device_task_queue import DeviceTaskQueue, TaskPriority
 from core.device_state_machine import DeviceState
 from core.device_status_manager import device_status_manager
 
@@ -33,10 +40,11 @@ class TaskerManager(QObject):
     task_submitted = Signal(str, str)
     all_tasks_completed = Signal(str)
     error_occurred = Signal(str, str)
+    queue_changed = Signal(str)  # 设备任务队列内容变化 (device_name)
 
     def __init__(self, parent=None) -> None:
         super().__init__(parent)
-        self._device_queues: DefaultDict[str, asyncio.Queue] = defaultdict(asyncio.Queue)
+        self._device_queues: Dict[str, DeviceTaskQueue] = {}
         self._device_processors: Dict[str, asyncio.Task] = {}
         self._lock = asyncio.Lock()  # 用于保护 _device_processors 字典
         self.logger = log_manager.get_app_logger()
@@ -51,6 +59,12 @@ class TaskerManager(QObject):
         """连接状态管理器的信号"""
         device_status_manager.state_changed.connect(self._on_device_state_changed)
 
+    def _get_queue(self, device_name: str) -> DeviceTaskQueue:
+        queue = self._device_queues.get(device_name)
+        if queue is None:
+            queue = self._device_queues[device_name] = DeviceTaskQueue(device_name)
+        return queue
+
     @Slot(str, object, object, dict)
     def _on_device_state_changed(self, name: str, old_state: DeviceState, new_state: DeviceState, context: dict):
         """设备状态变化回调"""
@@ -68,16 +82,35 @@ class TaskerManager(QObject):
         self.logger.info(f"设备 {device_name} 的任务处理器已启动。")
         self.device_added.emit(device_name)
 
+        # 获取主机级运行名额，名额不足时设备以 WAITING 状态排队
+        try:
+            await admission_controller.acquire_run_slot(device_name)
+        except asyncio.CancelledError:
+            self.logger.warning(f"设备 {device_name} 在等待运行名额时被取消。")
+            session = device_session_manager.get_session(device_name)
+            device_status_manager.set_device_state(
+                device_name, DeviceState.CONNECTED if session and session.is_connected else DeviceState.DISCONNECTED,
+                queue_position=0, admission_queue_length=0, waiting_for=None)
+            async with self._lock:
+                if self._device_processors.get(device_name) is asyncio.current_task():
+                    del self._device_processors[device_name]
+            self.device_removed.emit(device_name)
+            raise
+
+        # 获取设备会话，控制器与 Tasker 在同一处理器的多个批次间保持
+        session = device_session_manager.acquire(device_name)
         try:
-            queue = self._device_queues[device_name]
+            queue = self._get_queue(device_name)
             while not queue.empty():
                 try:
-                    task_data = await queue.get()
-                    self.logger.info(f"设备 {device_name} 从队列中获取新任务，准备执行...")
+                    item = queue.pop()
+                    task_data = item.payload
+                    self.queue_changed.emit(device_name)
+                    self.logger.info(f"设备 {device_name} 从队列中获取新任务 (优先级 {item.priority})，准备执行...")
 
-                    # 每次都创建一个新的执行器实例
+                    # 每次都创建一个新的执行器实例，连接状态由设备会话保存
                     # 移除 parent=self。避免 executor 被 Manager 强引用。
-                    executor = TaskExecutor(device_config, parent=None)
+                    executor = TaskExecutor(device_config, session=session, parent=None)
 
                     # 连接信号，处理任务状态变化
                     executor.task_state_changed.connect(self._on_task_state_changed)
@@ -92,7 +125,6 @@ class TaskerManager(QObject):
                         executor = None
                         self.logger.debug(f"设备 {device_name} 的执行器已标记为待销毁 (deleteLater)")
 
-                    queue.task_done()
                     self.logger.info(f"设备 {device_name} 的一批任务已处理完毕。")
 
                 except asyncio.CancelledError:
@@ -113,11 +145,14 @@ class TaskerManager(QObject):
 
         finally:
             self.logger.info(f"设备 {device_name} 的任务处理器已停止。")
+            # 释放会话，进入空闲计时
+            device_session_manager.release(device_name)
+            admission_controller.release_run_slot(device_name)
             async with self._lock:
                 if device_name in self._device_processors:
                     del self._device_processors[device_name]
                 # 如果队列为空，也删除队列对象以释放资源
-                if self._device_queues[device_name].empty():
+                if device_name in self._device_queues and self._device_queues[device_name].empty():
                     del self._device_queues[device_name]
             self.device_removed.emit(device_name)
 
@@ -151,9 +186,11 @@ class TaskerManager(QObject):
             self.error_occurred.emit(device_name, f"任务 {task_id} 失败: {error_msg}")
 
     @asyncSlot(str, object)
-    async def submit_task(self, device_name: str, task_data: Union[RunTimeConfigs, List[RunTimeConfigs]]):
+    async def submit_task(self, device_name: str, task_data: Union[RunTimeConfigs, List[RunTimeConfigs]],
+                          priority: int = TaskPriority.NORMAL, source: str = ""):
         """
         异步向特定设备的队列提交任务。如果设备空闲，则启动任务处理器。
+        队列中已有相同 (资源, 配置方案) 的任务时合并，不会重复执行。
         """
         device_config = global_config.get_device_config(device_name)
         if not device_config:
@@ -165,10 +202,15 @@ class TaskerManager(QObject):
         task_count = len(task_data) if isinstance(task_data, list) else 1
         self.logger.info(f"向设备 {device_name} 提交 {task_count} 个任务到队列")
 
-        queue = self._device_queues[device_name]
-        await queue.put(task_data)
+        queue = self._get_queue(device_name)
+        item, coalesced = queue.put(task_data, priority, source)
+        if coalesced:
+            self.logger.info(f"设备 {device_name} 有 {coalesced} 个任务已在队列中，已与排队项合并")
+        if item is not None:
+            self.logger.debug(f"设备 {device_name} 新增队列项 {item.item_id}，当前排队 {queue.qsize()} 项")
+        self.queue_changed.emit(device_name)
 
-        self._total_tasks_submitted += task_count
+        self._total_tasks_submitted += task_count - coalesced
         # 注意: task_submitted 信号现在无法立即发出，因为 task_id 在执行器内部才生成。
         # 可以在TaskExecutor.run_task_lifecycle开始时发出信号。
 
@@ -201,13 +243,8 @@ class TaskerManager(QObject):
 
             # 清空队列
             if device_name in self._device_queues:
-                queue = self._device_queues[device_name]
-                while not queue.empty():
-                    try:
-                        queue.get_nowait()
-                    except asyncio.QueueEmpty:
-                        break
-                del self._device_queues[device_name]
+                self._device_queues.pop(device_name).clear()
+                self.queue_changed.emit(device_name)
                 self.logger.info(f"设备 {device_name} 的任务队列已清空。")
                 return True
         return False
@@ -225,6 +262,8 @@ class TaskerManager(QObject):
 
         tasks = [self.stop_device_processing(name) for name in device_names]
         await asyncio.gather(*tasks, return_exceptions=True)
+        device_session_manager.close_all("停止所有任务处理器")
+        await agent_pool.shutdown()
         self.logger.info("所有任务处理器已停止。")
 
     @asyncSlot(str)
@@ -280,6 +319,44 @@ class TaskerManager(QObject):
         """获取所有设备的队列长度信息"""
         return {name: queue.qsize() for name, queue in self._device_queues.items()}
 
+    def get_queue_snapshot(self, device_name: str) -> List[Dict[str, Any]]:
+        """获取设备任务队列的快照（按执行顺序，不含正在执行的批次）"""
+        queue = self._device_queues.get(device_name)
+        return queue.snapshot() if queue else []
+
+    def remove_queued_task(self, device_name: str, item_id: int) -> bool:
+        """从队列中移除尚未执行的任务，不影响正在执行的任务"""
+        queue = self._device_queues.get(device_name)
+        if queue and queue.remove(item_id):
+            self.logger.info(f"已从设备 {device_name} 的队列中移除任务 {item_id}")
+            self.queue_changed.emit(device_name)
+            return True
+        return False
+
+    def move_queued_task(self, device_name: str, item_id: int, new_index: int) -> bool:
+        """调整队列中尚未执行的任务的顺序"""
+        queue = self._device_queues.get(device_name)
+        if queue and queue.move(item_id, new_index):
+            self.queue_changed.emit(device_name)
+            return True
+        return False
+
+    def get_session_metrics(self) -> Dict[str, dict]:
+        """获取所有设备会话的统计指标（连接次数、避免的重连次数等）"""
+        return device_session_manager.get_metrics()
+
+    def get_admission_stats(self) -> Dict[str, dict]:
+        """获取准入控制的统计信息（当前运行/排队的设备、生效名额、主机压力）"""
+        return admission_controller.get_stats()
+
+    def get_blocking_stats(self) -> Dict[str, dict]:
+        """获取阻塞调用调度器的统计信息（各通道的排队深度、运行数量与等待时间）"""
+        return blocking_scheduler.get_stats()
+
+    def get_agent_pool_stats(self) -> Dict[str, int]:
+        """获取Agent进程池的统计信息（预热命中次数、当前预热进程数等）"""
+        return agent_pool.get_stats()
+
     def get_device_state(self, device_name: str) -> Optional[DeviceState]:
         """获取设备状态"""
         device_manager = device_status_manager.get_device_manager(device_name)
@@ -311,12 +388,12 @@ class TaskerManager(QObject):
             self.logger.warning(f"设备 {device_config.device_name} 没有找到可用的运行时配置")
             return False
 
-        await self.submit_task(device_config.device_name, runtime_configs)
+        await self.submit_task(device_config.device_name, runtime_configs, TaskPriority.MANUAL, "manual")
         return True
 
     @asyncSlot(str, str)
-    async def run_resource_task(self, device_config_name: str, resource_name: str) -> None:
-        """提交指定资源的任务"""
+    async def run_resource_task(self, device_config_name: str, resource_name: str, force_rerun: bool = False) -> None:
+        """提交指定资源的任务；force_rerun 为 True 时忽略当天的检查点，从头完整执行"""
         self.logger.info(f"为设备 {device_config_name} 提交资源 {resource_name} 的任务")
         runtime_config = global_config.get_runtime_configs_for_resource(resource_name, device_config_name)
         self.logger.info(f"当前任务的配置为:{runtime_config}")
@@ -325,8 +402,9 @@ class TaskerManager(QObject):
             self.logger.error(error_msg)
             self.error_occurred.emit(device_config_name, error_msg)
             return
+        runtime_config.force_rerun = force_rerun
 
-        await self.submit_task(device_config_name, runtime_config)
+        await self.submit_task(device_config_name, runtime_config, TaskPriority.MANUAL, "manual")
 
 
 # 单例模式